@@ -21,6 +21,67 @@ class Settings(BaseSettings):
     OMNIAGENTPAY_TX_LIMIT: float = 500.0
     OMNIAGENTPAY_RATE_LIMIT_PER_MIN: int = 5
     OMNIAGENTPAY_WHITELISTED_RECIPIENTS: List[str] = []
+    # Optional file of extra whitelisted recipients, one "address" or "CHAIN:address" per line
+    OMNIAGENTPAY_WHITELIST_FILE: str | None = None
+    # Optional JSON file overriding the limits above; hot-reloaded when it changes (0 disables polling)
+    OMNIAGENTPAY_GUARD_POLICY_FILE: str | None = None
+    OMNIAGENTPAY_GUARD_POLICY_POLL_SECONDS: float = 5.0
+    # Optional JSON file of org/team budgets shared by groups of wallets
+    OMNIAGENTPAY_BUDGET_TREE_FILE: str | None = None
+
+    # Wallet metadata cache (blockchain/address lookups)
+    OMNIAGENTPAY_WALLET_CACHE_SIZE: int = 1024
+    OMNIAGENTPAY_WALLET_CACHE_TTL_SECONDS: float = 300.0
+    OMNIAGENTPAY_WALLET_CACHE_NEGATIVE_TTL_SECONDS: float = 30.0
+
+    # USDC balance cache (max staleness; invalidated by Circle webhooks)
+    OMNIAGENTPAY_BALANCE_CACHE_SIZE: int = 1024
+    OMNIAGENTPAY_BALANCE_CACHE_TTL_SECONDS: float = 5.0
+
+    # Local index of payment intents created through this server (list_payment_intents, confirm diagnostics)
+    OMNIAGENTPAY_INTENT_INDEX_SIZE: int = 10000
+    # Longest an unconfirmed intent holds its amount reserved against the wallet balance
+    # (unless the SDK reports an earlier expiry)
+    OMNIAGENTPAY_INTENT_TTL_SECONDS: float = 3600.0
+    # Background sweep that cancels expired intents (0 disables)
+    OMNIAGENTPAY_INTENT_SWEEP_INTERVAL_SECONDS: float = 5.0
+    OMNIAGENTPAY_INTENT_SWEEP_BATCH_SIZE: int = 100
+
+    # Batch tools
+    OMNIAGENTPAY_BATCH_CONCURRENCY: int = 10
+    OMNIAGENTPAY_BATCH_MAX_ITEMS: int = 1000
+
+    # Warm wallet pool (pre-created, pre-guarded wallets)
+    OMNIAGENTPAY_WALLET_POOL_ENABLED: bool = False
+    OMNIAGENTPAY_WALLET_POOL_TARGET_SIZE: int = 20
+    OMNIAGENTPAY_WALLET_POOL_LOW_WATER: int = 5
+    OMNIAGENTPAY_WALLET_POOL_REFILL_CONCURRENCY: int = 4
+    OMNIAGENTPAY_WALLET_POOL_STATE_FILE: str = ".wallet_pool.json"
+
+    # Idempotent pay_recipient results (SQLite file backend when a path is set)
+    OMNIAGENTPAY_IDEMPOTENCY_STORE_SIZE: int = 10000
+    OMNIAGENTPAY_IDEMPOTENCY_TTL_SECONDS: float = 86400.0
+    OMNIAGENTPAY_IDEMPOTENCY_DB_PATH: str | None = None
+
+    # Lifetime of simulation tokens that let pay_recipient skip re-simulation
+    OMNIAGENTPAY_SIMULATION_TOKEN_TTL_SECONDS: int = 60
+
+    # Per-wallet payment lanes: longest a payment may queue for its turn/rate budget
+    OMNIAGENTPAY_LANE_MAX_WAIT_SECONDS: float = 30.0
+
+    # Background job that re-applies the guard policy to every wallet after settings change
+    OMNIAGENTPAY_GUARD_RECONCILE_ENABLED: bool = False
+    OMNIAGENTPAY_GUARD_RECONCILE_CONCURRENCY: int = 4
+    OMNIAGENTPAY_GUARD_RECONCILE_RATE_PER_SECOND: float = 5.0
+    OMNIAGENTPAY_GUARD_RECONCILE_STATE_FILE: str = ".guard_reconcile.json"
+
+    # Per-wallet rate limit token buckets; "redis" shares them across instances
+    OMNIAGENTPAY_RATE_LIMIT_BACKEND: Literal["memory", "redis"] = "memory"
+    # Same variable the SDK reads for its redis storage backend
+    OMNIAGENTPAY_REDIS_URL: str | None = None
+    # Wallet guard configs: "sdk" keeps them in the SDK's storage (per process by default),
+    # "redis" shares them across instances
+    OMNIAGENTPAY_GUARD_STATE_BACKEND: Literal["sdk", "redis"] = "sdk"
 
     @field_validator("CIRCLE_API_KEY", "ENTITY_SECRET")
     @classmethod
@@ -1,7 +1,8 @@
 import structlog
 from fastapi import FastAPI
 from app.core.config import settings
-from app.payments.guards import get_default_guards
+from app.payments.guards import get_guard_engine
+from app.payments.omni_client import OmniAgentPaymentClient
 
 logger = structlog.get_logger(__name__)
 
@@ -20,15 +21,21 @@ async def startup_event(app: FastAPI):
             logger.error("ENTITY_SECRET is missing in production!")
             raise RuntimeError("Missing ENTITY_SECRET")
 
-    # Validate default guards (Fail-fast)
+    # Validate default guards and load the recipient whitelist (Fail-fast)
     try:
-        guards = get_default_guards()
-        if not guards:
+        engine = get_guard_engine()
+        if not engine.guards:
             raise RuntimeError("No default guards configured")
-        logger.info("Default guards validated", count=len(guards))
+        logger.info("Default guards validated", count=len(engine.guards), whitelist_size=len(engine.default_whitelist()))
+        engine.start_policy_watcher(settings.OMNIAGENTPAY_GUARD_POLICY_POLL_SECONDS)
     except Exception as e:
         logger.error("guards_initialization_failed", error=str(e))
         raise RuntimeError(f"Failed to initialize payment guards: {e}")
+
+    if settings.OMNIAGENTPAY_WALLET_POOL_ENABLED or settings.OMNIAGENTPAY_GUARD_RECONCILE_ENABLED:
+        client = await OmniAgentPaymentClient.get_instance()
+        await client.start_background_tasks()
+        logger.info("Background payment tasks started")
     
     logger.info("Startup validation complete.")
 
@@ -36,4 +43,7 @@ async def shutdown_event(app: FastAPI):
     """Actions to run on application shutdown."""
     logger.info("Cleaning up MCP Server resources...")
     # Add cleanup logic here (e.g., closing DB pools, SDK clients)
+    await get_guard_engine().stop_policy_watcher()
+    if OmniAgentPaymentClient._instance is not None:
+        await OmniAgentPaymentClient._instance.stop_background_tasks()
     logger.info("Shutdown complete.")
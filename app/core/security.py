@@ -1,12 +1,15 @@
+import uuid
 from datetime import datetime, timedelta
-from typing import Any, Union
-from jose import jwt
+from typing import Any, Optional, Union
+from jose import jwt, JWTError
 from passlib.context import CryptContext
 from app.core.config import settings
+from app.payments.money import to_micros
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 ALGORITHM = "HS256"
+SIMULATION_TOKEN_TYPE = "simulation"
 
 def create_access_token(subject: Union[str, Any], expires_delta: timedelta = None) -> str:
     if expires_delta:
@@ -25,3 +28,46 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+
+
+def _normalize_amount(amount: str) -> str:
+    try:
+        return str(to_micros(amount))
+    except ValueError:
+        return str(amount)
+
+def create_simulation_token(
+    wallet_id: str, recipient: str, amount: str, currency: str, expires_delta: timedelta = None
+) -> str:
+    """Signs a short-lived token proving a payment with these parameters passed simulation."""
+    expire = datetime.utcnow() + (
+        expires_delta or timedelta(seconds=settings.OMNIAGENTPAY_SIMULATION_TOKEN_TTL_SECONDS)
+    )
+    to_encode = {
+        "typ": SIMULATION_TOKEN_TYPE,
+        "jti": uuid.uuid4().hex,
+        "exp": expire,
+        "wlt": wallet_id,
+        "rcp": recipient,
+        "amt": _normalize_amount(amount),
+        "cur": currency.upper(),
+    }
+    return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=ALGORITHM)
+
+def verify_simulation_token(
+    token: str, wallet_id: str, recipient: str, amount: str, currency: str
+) -> Optional[str]:
+    """Returns the token ID if the token is valid, unexpired and bound to these parameters."""
+    try:
+        claims = jwt.decode(token, settings.SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    if (
+        claims.get("typ") != SIMULATION_TOKEN_TYPE
+        or claims.get("wlt") != wallet_id
+        or claims.get("rcp") != recipient
+        or claims.get("amt") != _normalize_amount(amount)
+        or claims.get("cur") != currency.upper()
+    ):
+        return None
+    return claims.get("jti")
@@ -1,12 +1,13 @@
 """FastMCP server implementation for OmniAgentPay SDK."""
 from typing import Any, Dict, List, Optional
 import structlog
-from fastmcp import FastMCP
+from fastmcp import Context, FastMCP
 from fastmcp.exceptions import ToolError
 from app.core.config import settings
 from app.mcp.auth import get_auth_provider
+from app.payments.guards import get_guard_engine
 from app.payments.omni_client import OmniAgentPaymentClient
-from app.payments.service import get_payment_orchestrator
+from app.payments.service import get_payment_orchestrator, get_payment_metrics
 from app.utils.exceptions import PaymentError, GuardValidationError
 
 logger = structlog.get_logger(__name__)
@@ -41,6 +42,43 @@ async def create_agent_wallet(agent_name: str) -> Dict[str, Any]:
         raise ToolError(f"Failed to create wallet: {str(e)}")
 
 
+@mcp.tool()
+async def create_agent_wallets_batch(
+    agent_names: List[str],
+    concurrency: Optional[int] = None,
+    ctx: Optional[Context] = None
+) -> Dict[str, Any]:
+    """
+    Create guarded wallets for many agents at once with bounded concurrency.
+    
+    Each wallet is provisioned independently; failures are reported per item
+    and progress is reported as wallets complete.
+    
+    Args:
+        agent_names: Names of the agents to create wallets for
+        concurrency: Maximum wallets provisioned in parallel (default from server config)
+        
+    Returns:
+        Totals plus a per-item result array in input order
+    """
+    logger.info("mcp_tool_call", tool="create_agent_wallets_batch", count=len(agent_names), concurrency=concurrency)
+    completed = 0
+
+    async def report(item: Dict[str, Any]) -> None:
+        nonlocal completed
+        completed += 1
+        if ctx:
+            await ctx.report_progress(completed, len(agent_names), f"{item['agent_name']}: {item['status']}")
+
+    try:
+        client = await OmniAgentPaymentClient.get_instance()
+        result = await client.create_agent_wallets_batch(agent_names, concurrency=concurrency, on_result=report)
+        return {"status": "success", **result}
+    except Exception as e:
+        logger.error("create_wallets_batch_tool_failed", error=str(e))
+        raise ToolError(f"Failed to create wallets: {str(e)}")
+
+
 @mcp.tool()
 async def simulate_payment(
     from_wallet_id: str,
@@ -58,7 +96,8 @@ async def simulate_payment(
         currency: Currency code (default: USD)
         
     Returns:
-        Simulation result with validation status and estimated fees
+        Simulation result with validation status and estimated fees. Passing
+        simulations include a short-lived simulation_token for pay_recipient.
     """
     logger.info("mcp_tool_call", tool="simulate_payment", from_wallet_id=from_wallet_id, amount=amount)
     try:
@@ -83,21 +122,31 @@ async def pay_recipient(
     from_wallet_id: str,
     to_address: str,
     amount: str,
-    currency: str = "USD"
+    currency: str = "USD",
+    idempotency_key: Optional[str] = None,
+    simulation_token: Optional[str] = None,
+    max_wait_seconds: Optional[float] = None
 ) -> Dict[str, Any]:
     """
     Send a payment to a recipient address. Requires a prior simulation.
     
     This tool executes a guarded payment flow:
     1. Validates input
-    2. Runs simulation (required)
+    2. Runs simulation (required; skipped if simulation_token is still valid)
     3. Executes payment if simulation passes
     
+    Retrying with the same idempotency_key returns the original result
+    instead of paying again. Payments from one wallet are queued and paced to
+    its per-minute rate budget rather than rejected.
+    
     Args:
         from_wallet_id: Source wallet ID
         to_address: Recipient blockchain address
         amount: Amount to send (numeric string)
         currency: Currency code (default: USD)
+        idempotency_key: Optional client-supplied key that makes retries safe
+        simulation_token: Token returned by simulate_payment for this exact payment
+        max_wait_seconds: Longest the payment may queue behind its wallet's earlier payments
         
     Returns:
         Payment result with transaction ID and status
@@ -109,7 +158,10 @@ async def pay_recipient(
             "from_wallet_id": from_wallet_id,
             "to_address": to_address,
             "amount": amount,
-            "currency": currency
+            "currency": currency,
+            "idempotency_key": idempotency_key,
+            "simulation_token": simulation_token,
+            "max_wait_seconds": max_wait_seconds
         })
         return result
     except GuardValidationError as e:
@@ -123,6 +175,67 @@ async def pay_recipient(
         raise ToolError(f"Payment execution failed: {str(e)}")
 
 
+@mcp.tool()
+async def pay_recipients_batch(
+    payments: List[Dict[str, Any]],
+    concurrency: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Send many payments at once with per-item results.
+    
+    All items are validated before any payment starts. Payments from the same
+    source wallet run in input order; different wallets run in parallel.
+    
+    Args:
+        payments: Payments to execute, each with from_wallet_id, to_address, amount
+            and optional currency, idempotency_key and simulation_token
+        concurrency: Maximum payments in flight across all wallets (default from server config)
+        
+    Returns:
+        Totals plus a per-item result array in input order
+    """
+    logger.info("mcp_tool_call", tool="pay_recipients_batch", count=len(payments), concurrency=concurrency)
+    try:
+        orchestrator = await get_payment_orchestrator()
+        result = await orchestrator.pay_batch(payments, concurrency=concurrency)
+        return {"status": "success", **result}
+    except PaymentError as e:
+        logger.error("payment_batch_error", error=str(e))
+        raise ToolError(f"Batch payment rejected: {str(e)}")
+    except Exception as e:
+        logger.error("pay_recipients_batch_tool_failed", error=str(e))
+        raise ToolError(f"Batch payment failed: {str(e)}")
+
+
+@mcp.tool()
+async def simulate_payments(
+    payments: List[Dict[str, Any]],
+    concurrency: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Simulate many candidate payments at once with per-item results.
+    
+    Local guard checks run over the whole batch first; each source wallet is
+    looked up once and only payments that pass are simulated by Circle.
+    
+    Args:
+        payments: Candidate payments, each with from_wallet_id, to_address, amount
+            and optional currency
+        concurrency: Maximum simulations in flight (default from server config)
+        
+    Returns:
+        Totals plus a per-item result array in input order (same fields as simulate_payment)
+    """
+    logger.info("mcp_tool_call", tool="simulate_payments", count=len(payments), concurrency=concurrency)
+    try:
+        client = await OmniAgentPaymentClient.get_instance()
+        result = await client.simulate_payments(payments, concurrency=concurrency)
+        return {"status": "success", **result}
+    except Exception as e:
+        logger.error("simulate_payments_tool_failed", error=str(e))
+        raise ToolError(f"Batch simulation failed: {str(e)}")
+
+
 @mcp.tool()
 async def create_payment_intent(
     wallet_id: str,
@@ -155,6 +268,9 @@ async def create_payment_intent(
             metadata=metadata
         )
         return {"status": "success", "intent": result}
+    except GuardValidationError as e:
+        logger.warn("intent_guard_violation", error=str(e))
+        raise ToolError(f"Payment intent blocked by security policy: {str(e)}")
     except Exception as e:
         logger.error("create_intent_tool_failed", error=str(e))
         raise ToolError(f"Failed to create payment intent: {str(e)}")
@@ -176,33 +292,140 @@ async def confirm_payment_intent(intent_id: str) -> Dict[str, Any]:
         client = await OmniAgentPaymentClient.get_instance()
         result = await client.confirm_intent(intent_id)
         return {"status": "success", "confirmation": result}
+    except GuardValidationError as e:
+        logger.warn("intent_guard_violation", error=str(e))
+        raise ToolError(f"Payment intent confirmation blocked by security policy: {str(e)}")
     except Exception as e:
         logger.error("confirm_intent_tool_failed", error=str(e))
         raise ToolError(f"Failed to confirm payment intent: {str(e)}")
 
 
+@mcp.tool()
+async def confirm_payment_intents(
+    intent_ids: List[str],
+    concurrency: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Confirm many payment intents at once with per-item results.
+    
+    Intents from the same source wallet are confirmed in input order; different
+    wallets run in parallel. Each failed item carries the same error
+    classification as confirm_payment_intent.
+    
+    Args:
+        intent_ids: IDs of the payment intents to confirm
+        concurrency: Maximum confirms in flight across all wallets (default from server config)
+        
+    Returns:
+        Totals plus a per-intent result array in input order
+    """
+    logger.info("mcp_tool_call", tool="confirm_payment_intents", count=len(intent_ids), concurrency=concurrency)
+    try:
+        client = await OmniAgentPaymentClient.get_instance()
+        result = await client.confirm_intents_batch(intent_ids, concurrency=concurrency)
+        return {"status": "success", **result}
+    except Exception as e:
+        logger.error("confirm_payment_intents_tool_failed", error=str(e))
+        raise ToolError(f"Batch confirmation failed: {str(e)}")
+
+
 # Read-Only Tools
 @mcp.tool()
-async def check_balance(wallet_id: str) -> Dict[str, Any]:
+async def check_balance(wallet_id: str, fresh: bool = False) -> Dict[str, Any]:
     """
     Check the current USDC balance of a Circle wallet (the actual balance used for payments).
     
     Args:
         wallet_id: Circle wallet ID to check
+        fresh: Bypass the short-lived balance cache and query Circle directly
         
     Returns:
         Balance information including USDC balance and currency
     """
-    logger.info("mcp_tool_call", tool="check_balance", wallet_id=wallet_id)
+    logger.info("mcp_tool_call", tool="check_balance", wallet_id=wallet_id, fresh=fresh)
     try:
         client = await OmniAgentPaymentClient.get_instance()
-        result = await client.get_wallet_usdc_balance(wallet_id)
+        result = await client.get_wallet_usdc_balance(wallet_id, fresh=fresh)
         return {"status": "success", **result}
     except Exception as e:
         logger.error("check_balance_tool_failed", error=str(e))
         raise ToolError(f"Failed to check balance: {str(e)}")
 
 
+@mcp.tool()
+async def get_server_metrics() -> Dict[str, Any]:
+    """
+    Report in-process cache, wallet pool and other payment subsystem metrics.
+    
+    Returns:
+        Metrics grouped by subsystem (e.g. wallet_cache, balance_cache, wallet_pool)
+    """
+    logger.info("mcp_tool_call", tool="get_server_metrics")
+    try:
+        client = await OmniAgentPaymentClient.get_instance()
+        metrics = {**client.get_metrics(), "payments": get_payment_metrics()}
+        return {"status": "success", "metrics": metrics}
+    except Exception as e:
+        logger.error("get_server_metrics_tool_failed", error=str(e))
+        raise ToolError(f"Failed to get server metrics: {str(e)}")
+
+
+@mcp.tool()
+async def get_budget_status(node_id: Optional[str] = None, wallet_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Show remaining hourly/daily budget of an org/team budget node and its ancestors.
+    
+    Args:
+        node_id: Budget node ID (e.g. an org or team)
+        wallet_id: Wallet ID whose budget node to inspect (used if node_id is not given)
+        
+    Returns:
+        Limit, spent and remaining amounts for the node and every ancestor up to the root
+    """
+    logger.info("mcp_tool_call", tool="get_budget_status", node_id=node_id, wallet_id=wallet_id)
+    tree = get_guard_engine().budget_tree
+    if tree is None:
+        raise ToolError("No budget hierarchy is configured")
+    if not node_id and not wallet_id:
+        raise ToolError("Provide node_id or wallet_id")
+    try:
+        budget = tree.status(node_id) if node_id else tree.wallet_status(wallet_id)
+        return {"status": "success", "budget": budget}
+    except Exception as e:
+        logger.error("get_budget_status_tool_failed", error=str(e))
+        raise ToolError(f"Failed to get budget status: {str(e)}")
+
+
+@mcp.tool()
+async def list_payment_intents(
+    wallet_id: Optional[str] = None,
+    status: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = 50
+) -> Dict[str, Any]:
+    """
+    List payment intents created through this server, newest first.
+    Served from the local intent index without calling Circle.
+    
+    Args:
+        wallet_id: Only intents from this wallet
+        status: Only intents in this status (e.g. requires_confirmation, succeeded, failed)
+        cursor: next_cursor from the previous page
+        limit: Maximum intents per page (default: 50, clamped to 1-500)
+        
+    Returns:
+        Intents (wallet, recipient, amount, status, created_at) and next_cursor, null on the last page
+    """
+    logger.info("mcp_tool_call", tool="list_payment_intents", wallet_id=wallet_id, status=status, cursor=cursor)
+    try:
+        client = await OmniAgentPaymentClient.get_instance()
+        result = client.list_payment_intents(wallet_id=wallet_id, status=status, cursor=cursor, limit=limit)
+        return {"status": "success", **result}
+    except Exception as e:
+        logger.error("list_payment_intents_tool_failed", error=str(e))
+        raise ToolError(f"Failed to list payment intents: {str(e)}")
+
+
 # Guard Management Tools
 @mcp.tool()
 async def remove_recipient_guard(wallet_id: str) -> Dict[str, Any]:
@@ -248,3 +471,44 @@ async def add_recipient_to_whitelist(
     except Exception as e:
         logger.error("add_recipient_to_whitelist_tool_failed", error=str(e))
         raise ToolError(f"Failed to update recipient whitelist: {str(e)}")
+
+
+@mcp.tool()
+async def reconcile_wallet_guards(restart: bool = False, status_only: bool = False) -> Dict[str, Any]:
+    """
+    Start (or report on) a background pass that applies the current guard policy to every managed wallet.
+    
+    Args:
+        restart: Ignore the saved checkpoint and revisit every wallet
+        status_only: Only report progress of the current or last pass
+        
+    Returns:
+        Progress of the pass (processed, changed, failed, remaining, wallets_per_second)
+    """
+    logger.info("mcp_tool_call", tool="reconcile_wallet_guards", restart=restart, status_only=status_only)
+    try:
+        client = await OmniAgentPaymentClient.get_instance()
+        if status_only:
+            return {"status": "success", "reconciliation": client.get_guard_reconciliation_status()}
+        return {"status": "success", "reconciliation": client.start_guard_reconciliation(restart=restart)}
+    except Exception as e:
+        logger.error("reconcile_wallet_guards_tool_failed", error=str(e))
+        raise ToolError(f"Failed to reconcile wallet guards: {str(e)}")
+
+
+@mcp.tool()
+async def reload_guard_policy() -> Dict[str, Any]:
+    """
+    Recompile the guard policy file and swap it in without a restart.
+    Payments already in flight finish under the policy they started with.
+    
+    Returns:
+        Version, fingerprint and reload latency of the active policy
+    """
+    logger.info("mcp_tool_call", tool="reload_guard_policy")
+    try:
+        policy = await get_guard_engine().reload()
+        return {"status": "success", "policy": policy}
+    except Exception as e:
+        logger.error("reload_guard_policy_tool_failed", error=str(e))
+        raise ToolError(f"Failed to reload guard policy: {str(e)}")
@@ -2,7 +2,9 @@ import uuid
 from typing import Any, Dict, List, Optional
 import structlog
 from app.mcp.registry import registry, BaseTool
-from app.payments.service import get_payment_orchestrator
+from app.payments.guards import get_guard_engine
+from app.payments.intents import MAX_PAGE_SIZE
+from app.payments.service import get_payment_orchestrator, get_payment_metrics
 from app.payments.omni_client import OmniAgentPaymentClient
 
 logger = structlog.get_logger(__name__)
@@ -37,6 +39,41 @@ class CreateAgentWalletTool(BaseTool):
             logger.error("create_wallet_tool_failed", error=str(e))
             return {"status": "error", "message": str(e)}
 
+@registry.register
+class CreateAgentWalletsBatchTool(BaseTool):
+    @property
+    def name(self) -> str:
+        return "create_agent_wallets_batch"
+
+    @property
+    def description(self) -> str:
+        return "Create guarded wallets for many agents at once with bounded concurrency"
+
+    @property
+    def input_schema(self) -> Dict[str, Any]:
+        return {
+            "type": "object",
+            "properties": {
+                "agent_names": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "Names of the agents to create wallets for"
+                },
+                "concurrency": {"type": "integer", "description": "Maximum wallets provisioned in parallel (default from server config)"}
+            },
+            "required": ["agent_names"]
+        }
+
+    async def execute(self, agent_names: List[str], concurrency: Optional[int] = None) -> Dict[str, Any]:
+        logger.info("mcp_tool_call", tool=self.name, count=len(agent_names), concurrency=concurrency)
+        client = await OmniAgentPaymentClient.get_instance()
+        try:
+            result = await client.create_agent_wallets_batch(agent_names, concurrency=concurrency)
+            return {"status": "success", **result}
+        except Exception as e:
+            logger.error("create_wallets_batch_tool_failed", error=str(e))
+            return {"status": "error", "message": str(e)}
+
 @registry.register
 class PayRecipientTool(BaseTool):
     @property
@@ -45,7 +82,7 @@ class PayRecipientTool(BaseTool):
 
     @property
     def description(self) -> str:
-        return "Send a payment to a recipient address. Requires a prior simulation."
+        return "Send a payment to a recipient address. Requires a prior simulation (pass its simulation_token to avoid re-simulating)."
 
     @property
     def input_schema(self) -> Dict[str, Any]:
@@ -55,7 +92,10 @@ class PayRecipientTool(BaseTool):
                 "from_wallet_id": {"type": "string", "description": "Source wallet ID"},
                 "to_address": {"type": "string", "description": "Recipient blockchain address"},
                 "amount": {"type": "string", "description": "Amount to send as a numeric string"},
-                "currency": {"type": "string", "description": "Currency code (default: USD)", "default": "USD"}
+                "currency": {"type": "string", "description": "Currency code (default: USD)", "default": "USD"},
+                "idempotency_key": {"type": "string", "description": "Optional client key; retries with the same key return the original result"},
+                "simulation_token": {"type": "string", "description": "Token returned by simulate_payment for this exact payment; skips re-simulation while valid"},
+                "max_wait_seconds": {"type": "number", "description": "Longest the payment may queue behind earlier payments from the same wallet"}
             },
             "required": ["from_wallet_id", "to_address", "amount"]
         }
@@ -70,6 +110,53 @@ class PayRecipientTool(BaseTool):
             logger.error("pay_recipient_tool_failed", error=str(e))
             return {"status": "error", "message": str(e)}
 
+@registry.register
+class PayRecipientsBatchTool(BaseTool):
+    @property
+    def name(self) -> str:
+        return "pay_recipients_batch"
+
+    @property
+    def description(self) -> str:
+        return "Send many payments at once; payments from one wallet run in order, different wallets run in parallel"
+
+    @property
+    def input_schema(self) -> Dict[str, Any]:
+        return {
+            "type": "object",
+            "properties": {
+                "payments": {
+                    "type": "array",
+                    "description": "Payments to execute, each with the same fields as pay_recipient",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "from_wallet_id": {"type": "string"},
+                            "to_address": {"type": "string"},
+                            "amount": {"type": "string"},
+                            "currency": {"type": "string", "default": "USD"},
+                            "idempotency_key": {"type": "string"},
+                            "simulation_token": {"type": "string"},
+                            "max_wait_seconds": {"type": "number"}
+                        },
+                        "required": ["from_wallet_id", "to_address", "amount"]
+                    }
+                },
+                "concurrency": {"type": "integer", "description": "Maximum payments in flight across all wallets (default from server config)"}
+            },
+            "required": ["payments"]
+        }
+
+    async def execute(self, payments: List[Dict[str, Any]], concurrency: Optional[int] = None) -> Dict[str, Any]:
+        logger.info("mcp_tool_call", tool=self.name, count=len(payments), concurrency=concurrency)
+        orchestrator = await get_payment_orchestrator()
+        try:
+            result = await orchestrator.pay_batch(payments, concurrency=concurrency)
+            return {"status": "success", **result}
+        except Exception as e:
+            logger.error("pay_recipients_batch_tool_failed", error=str(e))
+            return {"status": "error", "message": str(e)}
+
 @registry.register
 class SimulatePaymentTool(BaseTool):
     @property
@@ -108,6 +195,50 @@ class SimulatePaymentTool(BaseTool):
             logger.error("simulate_payment_tool_failed", error=str(e))
             return {"status": "error", "message": str(e)}
 
+@registry.register
+class SimulatePaymentsTool(BaseTool):
+    @property
+    def name(self) -> str:
+        return "simulate_payments"
+
+    @property
+    def description(self) -> str:
+        return "Simulate many candidate payments at once; guard checks run locally first and only passing payments reach Circle"
+
+    @property
+    def input_schema(self) -> Dict[str, Any]:
+        return {
+            "type": "object",
+            "properties": {
+                "payments": {
+                    "type": "array",
+                    "description": "Candidate payments, each with the same fields as simulate_payment",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "from_wallet_id": {"type": "string"},
+                            "to_address": {"type": "string"},
+                            "amount": {"type": "string"},
+                            "currency": {"type": "string", "default": "USD"}
+                        },
+                        "required": ["from_wallet_id", "to_address", "amount"]
+                    }
+                },
+                "concurrency": {"type": "integer", "description": "Maximum simulations in flight (default from server config)"}
+            },
+            "required": ["payments"]
+        }
+
+    async def execute(self, payments: List[Dict[str, Any]], concurrency: Optional[int] = None) -> Dict[str, Any]:
+        logger.info("mcp_tool_call", tool=self.name, count=len(payments), concurrency=concurrency)
+        client = await OmniAgentPaymentClient.get_instance()
+        try:
+            result = await client.simulate_payments(payments, concurrency=concurrency)
+            return {"status": "success", **result}
+        except Exception as e:
+            logger.error("simulate_payments_tool_failed", error=str(e))
+            return {"status": "error", "message": str(e)}
+
 @registry.register
 class CreatePaymentIntentTool(BaseTool):
     @property
@@ -178,6 +309,41 @@ class ConfirmPaymentIntentTool(BaseTool):
             logger.error("confirm_intent_tool_failed", error=str(e))
             return {"status": "error", "message": str(e)}
 
+@registry.register
+class ConfirmPaymentIntentsTool(BaseTool):
+    @property
+    def name(self) -> str:
+        return "confirm_payment_intents"
+
+    @property
+    def description(self) -> str:
+        return "Confirm many payment intents at once; intents from one wallet run in order, different wallets run in parallel"
+
+    @property
+    def input_schema(self) -> Dict[str, Any]:
+        return {
+            "type": "object",
+            "properties": {
+                "intent_ids": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "IDs of the payment intents to confirm"
+                },
+                "concurrency": {"type": "integer", "description": "Maximum confirms in flight across all wallets (default from server config)"}
+            },
+            "required": ["intent_ids"]
+        }
+
+    async def execute(self, intent_ids: List[str], concurrency: Optional[int] = None) -> Dict[str, Any]:
+        logger.info("mcp_tool_call", tool=self.name, count=len(intent_ids), concurrency=concurrency)
+        client = await OmniAgentPaymentClient.get_instance()
+        try:
+            result = await client.confirm_intents_batch(intent_ids, concurrency=concurrency)
+            return {"status": "success", **result}
+        except Exception as e:
+            logger.error("confirm_payment_intents_tool_failed", error=str(e))
+            return {"status": "error", "message": str(e)}
+
 @registry.register
 class CheckBalanceTool(BaseTool):
     @property
@@ -193,21 +359,88 @@ class CheckBalanceTool(BaseTool):
         return {
             "type": "object",
             "properties": {
-                "wallet_id": {"type": "string", "description": "Circle wallet ID to check"}
+                "wallet_id": {"type": "string", "description": "Circle wallet ID to check"},
+                "fresh": {"type": "boolean", "description": "Bypass the balance cache and query Circle directly", "default": False}
             },
             "required": ["wallet_id"]
         }
 
-    async def execute(self, wallet_id: str) -> Dict[str, Any]:
-        logger.info("mcp_tool_call", tool=self.name, wallet_id=wallet_id)
+    async def execute(self, wallet_id: str, fresh: bool = False) -> Dict[str, Any]:
+        logger.info("mcp_tool_call", tool=self.name, wallet_id=wallet_id, fresh=fresh)
         client = await OmniAgentPaymentClient.get_instance()
         try:
-            result = await client.get_wallet_usdc_balance(wallet_id)
+            result = await client.get_wallet_usdc_balance(wallet_id, fresh=fresh)
             return {"status": "success", **result}
         except Exception as e:
             logger.error("check_balance_tool_failed", error=str(e))
             return {"status": "error", "message": str(e)}
 
+@registry.register
+class GetServerMetricsTool(BaseTool):
+    @property
+    def name(self) -> str:
+        return "get_server_metrics"
+
+    @property
+    def description(self) -> str:
+        return "Report in-process cache, wallet pool and other payment subsystem metrics"
+
+    @property
+    def input_schema(self) -> Dict[str, Any]:
+        return {
+            "type": "object",
+            "properties": {},
+            "required": []
+        }
+
+    async def execute(self) -> Dict[str, Any]:
+        logger.info("mcp_tool_call", tool=self.name)
+        client = await OmniAgentPaymentClient.get_instance()
+        try:
+            metrics = {**client.get_metrics(), "payments": get_payment_metrics()}
+            return {"status": "success", "metrics": metrics}
+        except Exception as e:
+            logger.error("get_server_metrics_tool_failed", error=str(e))
+            return {"status": "error", "message": str(e)}
+
+@registry.register
+class GetBudgetStatusTool(BaseTool):
+    @property
+    def name(self) -> str:
+        return "get_budget_status"
+
+    @property
+    def description(self) -> str:
+        return "Show remaining hourly/daily budget of an org/team budget node (or a wallet's node) and its ancestors"
+
+    @property
+    def input_schema(self) -> Dict[str, Any]:
+        return {
+            "type": "object",
+            "properties": {
+                "node_id": {"type": "string", "description": "Budget node ID (e.g. an org or team)"},
+                "wallet_id": {"type": "string", "description": "Wallet ID whose budget node to inspect"}
+            },
+            "required": []
+        }
+
+    async def execute(self, node_id: Optional[str] = None, wallet_id: Optional[str] = None) -> Dict[str, Any]:
+        logger.info("mcp_tool_call", tool=self.name, node_id=node_id, wallet_id=wallet_id)
+        try:
+            tree = get_guard_engine().budget_tree
+            if tree is None:
+                return {"status": "error", "message": "No budget hierarchy is configured"}
+            if node_id:
+                budget = tree.status(node_id)
+            elif wallet_id:
+                budget = tree.wallet_status(wallet_id)
+            else:
+                return {"status": "error", "message": "Provide node_id or wallet_id"}
+            return {"status": "success", "budget": budget}
+        except Exception as e:
+            logger.error("get_budget_status_tool_failed", error=str(e))
+            return {"status": "error", "message": str(e)}
+
 @registry.register
 class RemoveRecipientGuardTool(BaseTool):
     @property
@@ -272,3 +505,115 @@ class AddRecipientToWhitelistTool(BaseTool):
         except Exception as e:
             logger.error("add_recipient_to_whitelist_tool_failed", error=str(e))
             return {"status": "error", "message": str(e)}
+
+@registry.register
+class ReconcileWalletGuardsTool(BaseTool):
+    @property
+    def name(self) -> str:
+        return "reconcile_wallet_guards"
+
+    @property
+    def description(self) -> str:
+        return "Start (or report on) a background pass that applies the current guard policy to every managed wallet"
+
+    @property
+    def input_schema(self) -> Dict[str, Any]:
+        return {
+            "type": "object",
+            "properties": {
+                "restart": {
+                    "type": "boolean",
+                    "description": "Ignore the saved checkpoint and revisit every wallet",
+                    "default": False
+                },
+                "status_only": {
+                    "type": "boolean",
+                    "description": "Only report progress of the current or last pass",
+                    "default": False
+                }
+            },
+            "required": []
+        }
+
+    async def execute(self, restart: bool = False, status_only: bool = False) -> Dict[str, Any]:
+        logger.info("mcp_tool_call", tool=self.name, restart=restart, status_only=status_only)
+        client = await OmniAgentPaymentClient.get_instance()
+        try:
+            if status_only:
+                return {"status": "success", "reconciliation": client.get_guard_reconciliation_status()}
+            return {"status": "success", "reconciliation": client.start_guard_reconciliation(restart=restart)}
+        except Exception as e:
+            logger.error("reconcile_wallet_guards_tool_failed", error=str(e))
+            return {"status": "error", "message": str(e)}
+
+@registry.register
+class ReloadGuardPolicyTool(BaseTool):
+    @property
+    def name(self) -> str:
+        return "reload_guard_policy"
+
+    @property
+    def description(self) -> str:
+        return "Recompile the guard policy file and swap it in without a restart; payments in flight keep the previous policy"
+
+    @property
+    def input_schema(self) -> Dict[str, Any]:
+        return {
+            "type": "object",
+            "properties": {},
+            "required": []
+        }
+
+    async def execute(self) -> Dict[str, Any]:
+        logger.info("mcp_tool_call", tool=self.name)
+        try:
+            policy = await get_guard_engine().reload()
+            return {"status": "success", "policy": policy}
+        except Exception as e:
+            logger.error("reload_guard_policy_tool_failed", error=str(e))
+            return {"status": "error", "message": str(e)}
+
+@registry.register
+class ListPaymentIntentsTool(BaseTool):
+    @property
+    def name(self) -> str:
+        return "list_payment_intents"
+
+    @property
+    def description(self) -> str:
+        return "List payment intents created through this server, newest first, with cursor pagination"
+
+    @property
+    def input_schema(self) -> Dict[str, Any]:
+        return {
+            "type": "object",
+            "properties": {
+                "wallet_id": {"type": "string", "description": "Only intents from this wallet"},
+                "status": {"type": "string", "description": "Only intents in this status (e.g. requires_confirmation)"},
+                "cursor": {"type": "string", "description": "next_cursor from the previous page"},
+                "limit": {
+                    "type": "integer",
+                    "description": f"Maximum intents per page (1-{MAX_PAGE_SIZE})",
+                    "default": 50,
+                    "minimum": 1,
+                    "maximum": MAX_PAGE_SIZE
+                }
+            },
+            "required": []
+        }
+
+    async def execute(
+        self,
+        wallet_id: Optional[str] = None,
+        status: Optional[str] = None,
+        cursor: Optional[str] = None,
+        limit: int = 50
+    ) -> Dict[str, Any]:
+        logger.info("mcp_tool_call", tool=self.name, wallet_id=wallet_id, status=status, cursor=cursor)
+        client = await OmniAgentPaymentClient.get_instance()
+        try:
+            result = client.list_payment_intents(wallet_id=wallet_id, status=status, cursor=cursor, limit=limit)
+            return {"status": "success", **result}
+        except Exception as e:
+            logger.error("list_payment_intents_tool_failed", error=str(e))
+            return {"status": "error", "message": str(e)}
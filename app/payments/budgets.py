@@ -0,0 +1,201 @@
+import json
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import structlog
+from app.payments.ledger import SpendWindow
+from app.payments.money import Micros, format_micros, to_micros
+from app.utils.exceptions import BudgetExceededError
+
+logger = structlog.get_logger(__name__)
+
+class BudgetNode:
+    """One budget in the hierarchy (org, team or agent) with its own rolling spend."""
+
+    def __init__(
+        self,
+        node_id: str,
+        parent: Optional["BudgetNode"] = None,
+        daily_limit: Micros = 0,
+        hourly_limit: Micros = 0
+    ):
+        self.node_id = node_id
+        self.parent = parent
+        self.daily_limit = daily_limit
+        self.hourly_limit = hourly_limit
+        self.hourly = SpendWindow(3600, 60)
+        self.daily = SpendWindow(86400, 144)
+        # Held by payments that passed the check but have not completed yet
+        self.reserved: Micros = 0
+
+    def status(self, now: float) -> Dict[str, Any]:
+        return {
+            "node_id": self.node_id,
+            "parent": self.parent.node_id if self.parent else None,
+            "hourly": self._window_status(self.hourly_limit, self.hourly.total(now), self.reserved),
+            "daily": self._window_status(self.daily_limit, self.daily.total(now), self.reserved),
+            "reserved": format_micros(self.reserved)
+        }
+
+    @staticmethod
+    def _window_status(limit: Micros, spent: Micros, reserved: Micros) -> Dict[str, Optional[str]]:
+        # Held amounts are not spent yet, but they are not available either
+        return {
+            "limit": format_micros(limit) if limit else None,
+            "spent": format_micros(spent),
+            "remaining": format_micros(max(0, limit - spent - reserved)) if limit else None
+        }
+
+class BudgetTree:
+    """
+    Org -> team -> agent budget hierarchy. Wallets are assigned to a node and a
+    payment must fit the remaining budget of that node and every ancestor.
+    Each node keeps its own incremental spend counters, so checking and
+    recording a payment is O(depth) rather than a sum over member wallets.
+
+    A check made with a hold key also reserves the amount on every node of
+    the path, so sibling wallets paying concurrently cannot all pass against
+    the same remaining budget. The hold is released once the payment has been
+    recorded, or when it fails.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.time):
+        self._clock = clock
+        self._nodes: Dict[str, BudgetNode] = {}
+        self._wallets: Dict[str, str] = {}
+        # hold key -> (nodes on the path, amount)
+        self._holds: Dict[str, Tuple[List[BudgetNode], Micros]] = {}
+        self.rejections = 0
+
+    def add_node(
+        self,
+        node_id: str,
+        parent: Optional[str] = None,
+        daily_limit: Micros = 0,
+        hourly_limit: Micros = 0
+    ) -> BudgetNode:
+        if node_id in self._nodes:
+            raise ValueError(f"Duplicate budget node: {node_id}")
+        parent_node = None
+        if parent is not None:
+            parent_node = self._nodes.get(parent)
+            if parent_node is None:
+                raise ValueError(f"Budget node {node_id} has unknown parent {parent}")
+        node = self._nodes[node_id] = BudgetNode(node_id, parent_node, daily_limit, hourly_limit)
+        return node
+
+    def assign_wallet(self, wallet_id: str, node_id: str) -> None:
+        if node_id not in self._nodes:
+            raise ValueError(f"Unknown budget node: {node_id}")
+        self._wallets[wallet_id] = node_id
+
+    def node_for_wallet(self, wallet_id: str) -> Optional[str]:
+        return self._wallets.get(wallet_id)
+
+    def path(self, node_id: str) -> List[BudgetNode]:
+        """The node followed by its ancestors up to the root."""
+        node = self._nodes.get(node_id)
+        if node is None:
+            raise ValueError(f"Unknown budget node: {node_id}")
+        path = []
+        while node is not None:
+            path.append(node)
+            node = node.parent
+        return path
+
+    def check(self, wallet_id: str, amount: Micros, hold: Optional[str] = None) -> None:
+        """
+        Raises BudgetExceededError if the payment does not fit every ancestor's
+        budget, counting amounts other payments hold. With a hold key the amount
+        is reserved on the whole path (replacing an earlier hold under that key)
+        until release().
+        """
+        if hold is not None:
+            self.release(hold)
+        node_id = self._wallets.get(wallet_id)
+        if node_id is None:
+            return
+        now = self._clock()
+        path = self.path(node_id)
+        for node in path:
+            for label, limit, window in (
+                ("Hourly", node.hourly_limit, node.hourly),
+                ("Daily", node.daily_limit, node.daily)
+            ):
+                if limit and window.total(now) + node.reserved + amount > limit:
+                    self.rejections += 1
+                    raise BudgetExceededError(
+                        f"{label} budget of {format_micros(limit)} for {node.node_id} would be exceeded "
+                        f"(spent {format_micros(window.total(now))}, reserved {format_micros(node.reserved)})"
+                    )
+        if hold is not None:
+            for node in path:
+                node.reserved += amount
+            self._holds[hold] = (path, amount)
+
+    def release(self, hold: str) -> None:
+        """Drops a hold taken by check(); a no-op for unknown keys."""
+        entry = self._holds.pop(hold, None)
+        if entry is None:
+            return
+        path, amount = entry
+        for node in path:
+            node.reserved -= amount
+
+    def record(self, wallet_id: str, amount: Micros, at: Optional[float] = None) -> None:
+        """Adds a wallet's spend to its node and every ancestor."""
+        node_id = self._wallets.get(wallet_id)
+        if node_id is None:
+            return
+        now = self._clock()
+        for node in self.path(node_id):
+            for window in (node.hourly, node.daily):
+                if at is None:
+                    window.add(amount, now)
+                else:
+                    window.add_at(amount, at, now)
+
+    def status(self, node_id: str) -> Dict[str, Any]:
+        """Remaining budget of a node and each of its ancestors."""
+        now = self._clock()
+        return {"node_id": node_id, "path": [node.status(now) for node in self.path(node_id)]}
+
+    def wallet_status(self, wallet_id: str) -> Dict[str, Any]:
+        node_id = self._wallets.get(wallet_id)
+        if node_id is None:
+            raise ValueError(f"Wallet {wallet_id} is not assigned to a budget node")
+        return {"wallet_id": wallet_id, **self.status(node_id)}
+
+    def stats(self) -> Dict[str, Any]:
+        return {"nodes": len(self._nodes), "wallets": len(self._wallets), "rejections": self.rejections}
+
+    @classmethod
+    def from_dict(cls, config: Dict[str, Any], clock: Callable[[], float] = time.time) -> "BudgetTree":
+        """
+        Builds a tree from {"nodes": {id: {"parent", "daily_limit", "hourly_limit"}},
+        "wallets": {wallet_id: node_id}}. Parents may be declared in any order.
+        """
+        tree = cls(clock=clock)
+        pending = dict(config.get("nodes", {}))
+        while pending:
+            ready = [node_id for node_id, spec in pending.items()
+                     if spec.get("parent") is None or spec["parent"] in tree._nodes]
+            if not ready:
+                raise ValueError(f"Budget nodes with unknown or cyclic parents: {sorted(pending)}")
+            for node_id in ready:
+                spec = pending.pop(node_id)
+                tree.add_node(
+                    node_id,
+                    parent=spec.get("parent"),
+                    daily_limit=to_micros(spec.get("daily_limit") or 0),
+                    hourly_limit=to_micros(spec.get("hourly_limit") or 0)
+                )
+        for wallet_id, node_id in config.get("wallets", {}).items():
+            tree.assign_wallet(wallet_id, node_id)
+        return tree
+
+    @classmethod
+    def load_file(cls, path: str) -> "BudgetTree":
+        with open(path) as f:
+            tree = cls.from_dict(json.load(f))
+        logger.info("budget_tree_loaded", path=path, **tree.stats())
+        return tree
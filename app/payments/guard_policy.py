@@ -0,0 +1,173 @@
+import hashlib
+import json
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+from omniagentpay.guards.manager import GuardConfig, GuardType
+from app.core.config import settings
+from app.payments.money import to_micros
+from app.payments.whitelist import normalize_address
+
+# Parameters that define each guard type; anything else (e.g. the config id) is ignored when diffing
+GUARD_FIELDS = {
+    GuardType.BUDGET.value: ("daily_limit", "hourly_limit", "total_limit"),
+    GuardType.SINGLE_TX.value: ("max_amount", "min_amount"),
+    GuardType.RATE_LIMIT.value: ("max_per_minute", "max_per_hour", "max_per_day"),
+    GuardType.RECIPIENT.value: ("recipient_mode",),
+}
+
+class GuardPolicy:
+    """The default guard set every managed wallet should carry, as SDK guard configs."""
+
+    def __init__(
+        self,
+        daily_limit: float,
+        hourly_limit: float,
+        tx_limit: float,
+        rate_limit_per_min: int,
+        whitelist: List[str]
+    ):
+        self.daily_limit = daily_limit
+        self.hourly_limit = hourly_limit
+        self.tx_limit = tx_limit
+        self.rate_limit_per_min = rate_limit_per_min
+        self.whitelist = whitelist
+
+    @classmethod
+    def from_settings(cls, whitelist: List[str]) -> "GuardPolicy":
+        return cls(
+            daily_limit=settings.OMNIAGENTPAY_DAILY_BUDGET,
+            hourly_limit=settings.OMNIAGENTPAY_HOURLY_BUDGET,
+            tx_limit=settings.OMNIAGENTPAY_TX_LIMIT,
+            rate_limit_per_min=settings.OMNIAGENTPAY_RATE_LIMIT_PER_MIN,
+            whitelist=whitelist
+        )
+
+    def desired(self) -> Dict[str, Dict[str, Any]]:
+        """Guard name -> SDK guard config dict."""
+        configs = [
+            GuardConfig(
+                guard_type=GuardType.BUDGET,
+                name="budget",
+                daily_limit=Decimal(str(self.daily_limit)),
+                hourly_limit=Decimal(str(self.hourly_limit))
+            ),
+            GuardConfig(guard_type=GuardType.RATE_LIMIT, name="rate_limit", max_per_minute=self.rate_limit_per_min),
+            GuardConfig(guard_type=GuardType.SINGLE_TX, name="single_tx", max_amount=Decimal(str(self.tx_limit))),
+        ]
+        # Only add recipient guard if whitelist is not empty
+        # Empty whitelist would block all payments
+        if self.whitelist:
+            configs.append(GuardConfig(
+                guard_type=GuardType.RECIPIENT,
+                name="recipient",
+                recipient_mode="whitelist",
+                recipient_addresses=list(self.whitelist)
+            ))
+        return {config.name: config.to_dict() for config in configs}
+
+    def fingerprint(self) -> str:
+        """Stable hash of the policy parameters (config ids excluded)."""
+        desired = {
+            name: {k: v for k, v in config.items() if k != "id"}
+            for name, config in self.desired().items()
+        }
+        return hashlib.sha256(json.dumps(desired, sort_keys=True).encode()).hexdigest()[:16]
+
+class GuardDiff:
+    """Minimal set of changes that brings a wallet's guards in line with a policy."""
+
+    def __init__(self):
+        self.added: List[Dict[str, Any]] = []
+        self.replaced: List[Dict[str, Any]] = []
+        self.unchanged: List[str] = []
+        # Recipient addresses missing from an otherwise matching whitelist guard
+        self.whitelist_additions: List[str] = []
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.added or self.replaced or self.whitelist_additions)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "added": [config["name"] for config in self.added],
+            "replaced": [config["name"] for config in self.replaced],
+            "unchanged": self.unchanged,
+            "whitelist_additions": len(self.whitelist_additions)
+        }
+
+def _same_value(current: Any, desired: Any) -> bool:
+    if current in (None, "") or desired in (None, ""):
+        return current in (None, "") and desired in (None, "")
+    if isinstance(desired, str):
+        # Amounts are stored as decimal strings; "1000.0" and "1000" are the same limit
+        try:
+            return to_micros(current) == to_micros(desired)
+        except ValueError:
+            return str(current) == desired
+    return current == desired
+
+def _same_params(current: Dict[str, Any], desired: Dict[str, Any]) -> bool:
+    if current.get("guard_type") != desired["guard_type"]:
+        return False
+    return all(
+        _same_value(current.get(field), desired.get(field))
+        for field in GUARD_FIELDS.get(desired["guard_type"], ())
+    )
+
+def diff_guards(current: List[Dict[str, Any]], desired: Dict[str, Dict[str, Any]]) -> GuardDiff:
+    """
+    Compares stored guard configs with the desired ones by name. Guards not in
+    the policy are left alone, and a whitelist guard that already contains
+    every desired address (plus any added per wallet) is kept as is.
+    """
+    by_name: Dict[str, List[Dict[str, Any]]] = {}
+    for config in current:
+        by_name.setdefault(config.get("name"), []).append(config)
+
+    diff = GuardDiff()
+    for name, config in desired.items():
+        existing = by_name.get(name)
+        if not existing:
+            diff.added.append(config)
+        elif len(existing) > 1 or not _same_params(existing[0], config):
+            diff.replaced.append(config)
+        elif config["guard_type"] == GuardType.RECIPIENT.value:
+            present = {normalize_address(a) for a in existing[0].get("recipient_addresses", [])}
+            missing = [a for a in config["recipient_addresses"] if normalize_address(a) not in present]
+            if missing:
+                diff.whitelist_additions.extend(missing)
+            else:
+                diff.unchanged.append(name)
+        else:
+            diff.unchanged.append(name)
+    return diff
+
+def apply_diff(current: List[Dict[str, Any]], diff: GuardDiff) -> List[Dict[str, Any]]:
+    """Returns the new guard config list; unrelated guards keep their position."""
+    replaced = {config["name"]: config for config in diff.replaced}
+    updated: List[Dict[str, Any]] = []
+    for config in current:
+        name = config.get("name")
+        if name in replaced:
+            # Duplicates of a replaced guard collapse into the single new config
+            if replaced[name] is not None:
+                updated.append(replaced[name])
+                replaced[name] = None
+            continue
+        if diff.whitelist_additions and config.get("guard_type") == GuardType.RECIPIENT.value and name == "recipient":
+            config = {**config, "recipient_addresses": config.get("recipient_addresses", []) + diff.whitelist_additions}
+        updated.append(config)
+    return updated + diff.added
+
+def add_addresses(config: Optional[Dict[str, Any]], addresses: List[str]) -> Dict[str, Any]:
+    """Recipient whitelist config with the addresses appended (created if missing)."""
+    if config is None:
+        return GuardConfig(
+            guard_type=GuardType.RECIPIENT,
+            name="recipient",
+            recipient_mode="whitelist",
+            recipient_addresses=list(dict.fromkeys(addresses))
+        ).to_dict()
+    present = {normalize_address(a) for a in config.get("recipient_addresses", [])}
+    new = [a for a in dict.fromkeys(addresses) if normalize_address(a) not in present]
+    return {**config, "recipient_addresses": config.get("recipient_addresses", []) + new}
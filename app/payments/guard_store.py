@@ -0,0 +1,149 @@
+import asyncio
+import json
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, Optional
+import structlog
+from omniagentpay.guards.manager import GuardManager
+from omniagentpay.storage.base import StorageBackend
+from app.core.config import settings
+
+logger = structlog.get_logger(__name__)
+
+# Receives the wallet's current guard configs; returns the new list, or None to leave them as they are
+GuardMutation = Callable[[List[Dict[str, Any]]], Optional[List[Dict[str, Any]]]]
+
+class GuardStore(ABC):
+    """
+    Wallet guard configs in the SDK GuardManager layout ({"guards": [...]}
+    per wallet). Every change is a read-modify-write applied with a single
+    write, so attaching several guards at once costs one round trip instead
+    of one per guard.
+    """
+
+    def __init__(self, storage: StorageBackend):
+        # SDK storage the GuardManager must use so payments see the same guards
+        self.storage = storage
+        self.reads = 0
+        self.writes = 0
+        self.conflicts = 0
+
+    @staticmethod
+    def key(wallet_id: str) -> str:
+        return f"wallet:{wallet_id}"
+
+    @abstractmethod
+    async def load(self, wallet_id: str) -> List[Dict[str, Any]]:
+        pass
+
+    @abstractmethod
+    async def update(self, wallet_id: str, mutate: GuardMutation) -> List[Dict[str, Any]]:
+        """Applies a mutation atomically with respect to other writers; returns the resulting configs."""
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.backend, "reads": self.reads, "writes": self.writes, "conflicts": self.conflicts}
+
+class SDKGuardStore(GuardStore):
+    """
+    Uses the SDK storage backend directly. Writers are serialized per wallet
+    within this process only; with the default in-memory SDK storage the
+    guards are invisible to other instances.
+    """
+    backend = "sdk"
+
+    def __init__(self, storage: StorageBackend, lock_stripes: int = 64):
+        super().__init__(storage)
+        self._locks = [asyncio.Lock() for _ in range(lock_stripes)]
+
+    async def load(self, wallet_id: str) -> List[Dict[str, Any]]:
+        self.reads += 1
+        data = await self.storage.get(GuardManager.COLLECTION, self.key(wallet_id))
+        return list((data or {}).get("guards", []))
+
+    async def update(self, wallet_id: str, mutate: GuardMutation) -> List[Dict[str, Any]]:
+        async with self._locks[hash(wallet_id) % len(self._locks)]:
+            current = await self.load(wallet_id)
+            updated = mutate(current)
+            if updated is None:
+                return current
+            await self.storage.save(GuardManager.COLLECTION, self.key(wallet_id), {"guards": updated})
+            self.writes += 1
+            return updated
+
+class RedisGuardStore(GuardStore):
+    """
+    Guard configs shared by every server instance through a Redis-protocol
+    store, under the same keys the SDK's RedisStorage uses. Updates are
+    optimistic: WATCH the wallet key, read, then write the document and its
+    index entry in one MULTI/EXEC pipeline, retrying if another writer
+    changed the key in between.
+    """
+    backend = "redis"
+
+    def __init__(self, client: Any, storage: StorageBackend, prefix: str = "omniagentpay", max_retries: int = 10):
+        super().__init__(storage)
+        self._redis = client
+        self.prefix = prefix
+        self.max_retries = max_retries
+
+    def _redis_key(self, wallet_id: str) -> str:
+        return f"{self.prefix}:{GuardManager.COLLECTION}:{self.key(wallet_id)}"
+
+    @property
+    def _index_key(self) -> str:
+        return f"{self.prefix}:{GuardManager.COLLECTION}:_index"
+
+    @staticmethod
+    def _decode(raw: Any) -> List[Dict[str, Any]]:
+        return list(json.loads(raw).get("guards", [])) if raw else []
+
+    async def load(self, wallet_id: str) -> List[Dict[str, Any]]:
+        self.reads += 1
+        return self._decode(await self._redis.get(self._redis_key(wallet_id)))
+
+    async def update(self, wallet_id: str, mutate: GuardMutation) -> List[Dict[str, Any]]:
+        from redis.exceptions import WatchError
+
+        key = self._redis_key(wallet_id)
+        for _ in range(self.max_retries):
+            async with self._redis.pipeline(transaction=True) as pipe:
+                try:
+                    await pipe.watch(key)
+                    self.reads += 1
+                    current = self._decode(await pipe.get(key))
+                    updated = mutate(current)
+                    if updated is None:
+                        await pipe.unwatch()
+                        return current
+                    pipe.multi()
+                    pipe.set(key, json.dumps({"guards": updated}))
+                    pipe.sadd(self._index_key, self.key(wallet_id))
+                    await pipe.execute()
+                    self.writes += 1
+                    return updated
+                except WatchError:
+                    self.conflicts += 1
+        raise RuntimeError(f"Guard update for wallet {wallet_id} kept conflicting with other writers")
+
+def build_guard_store(sdk: Any) -> GuardStore:
+    """
+    Creates the configured guard-state backend for an OmniAgentPay client and
+    points the SDK's guard evaluation at the same storage.
+
+    The SDK (0.0.2) has no public hook for either: its storage backend is only
+    reachable as `_storage`, and `guards` is a read-only property over
+    `_guard_manager`. This is the one place the server touches those private
+    attributes; replace it once the SDK exposes them.
+    """
+    if settings.OMNIAGENTPAY_GUARD_STATE_BACKEND == "redis":
+        if not settings.OMNIAGENTPAY_REDIS_URL:
+            raise RuntimeError("OMNIAGENTPAY_REDIS_URL is required for the redis guard state backend")
+        import redis.asyncio as redis_asyncio
+        from omniagentpay.storage.redis import RedisStorage
+        client = redis_asyncio.Redis.from_url(settings.OMNIAGENTPAY_REDIS_URL)
+        store = RedisGuardStore(client, RedisStorage(redis_url=settings.OMNIAGENTPAY_REDIS_URL))
+        # Payments evaluate guards (and their spend counters) from the shared storage
+        sdk._guard_manager = GuardManager(store.storage)
+        logger.info("guard_store_initialized", backend="redis")
+        return store
+    return SDKGuardStore(sdk._storage)
@@ -1,7 +1,18 @@
+import asyncio
+import json
+import os
+import time
 from abc import ABC, abstractmethod
-from typing import Set, Optional, Dict, Any, List
+from typing import Set, Optional, Dict, Any, Awaitable, Callable, List, NamedTuple, Sequence, Tuple
 import structlog
 from app.core.config import settings
+from app.payments.budgets import BudgetTree
+from app.payments.cache import MISSING, TTLCache
+from app.payments.guard_policy import GuardPolicy
+from app.payments.ledger import SpendLedger
+from app.payments.money import Micros, format_micros, to_micros
+from app.payments.ratelimit import InMemoryRateLimiter, RateLimitDecision, RateLimiter, build_rate_limiter
+from app.payments.whitelist import WhitelistIndex
 from app.utils.exceptions import (
     BudgetExceededError, 
     UnauthorizedRecipientError, 
@@ -11,10 +22,39 @@ from app.utils.exceptions import (
 
 logger = structlog.get_logger(__name__)
 
+# (amount in micro-USDC, wallet_id, recipient) of a payment to check
+PaymentCheck = Tuple[Micros, str, Optional[str]]
+
+# Reads a wallet's stored recipient whitelist (None if it has no recipient guard)
+WalletWhitelistLoader = Callable[[str], Awaitable[Optional[List[str]]]]
+
 class PaymentGuard(ABC):
-    """Base class for all payment security guardrails."""
+    """Base class for all payment security guardrails. Amounts are micro-USDC."""
+    # Violations that clear up by waiting (rate limits) are paced by the
+    # orchestrator's wallet lanes rather than rejected before queueing
+    queueable: bool = False
+
     @abstractmethod
-    async def validate(self, amount: float, wallet_id: str, recipient: Optional[str] = None):
+    async def validate(self, amount: Micros, wallet_id: str, recipient: Optional[str] = None):
+        pass
+
+    async def validate_many(self, payments: Sequence[PaymentCheck]) -> List[Optional[str]]:
+        """Rejection reason (or None) for each payment, each judged on its own against current state."""
+        reasons: List[Optional[str]] = []
+        for amount, wallet_id, recipient in payments:
+            try:
+                await self.validate(amount, wallet_id, recipient)
+                reasons.append(None)
+            except GuardValidationError as e:
+                reasons.append(e.detail)
+        return reasons
+
+    async def validate_and_hold(self, amount: Micros, wallet_id: str, recipient: Optional[str], hold: str):
+        """Like validate, but also reserves the amount under the hold key (only shared budgets need this)."""
+        await self.validate(amount, wallet_id, recipient)
+
+    def release(self, hold: str):
+        """Drops anything reserved under the hold key."""
         pass
 
     @abstractmethod
@@ -22,16 +62,54 @@ class PaymentGuard(ABC):
         """Convert guard configuration to a dictionary for SDK registration."""
         pass
 
+    def record(self, amount: Micros, wallet_id: str):
+        """Account for a completed payment (only stateful guards need this)."""
+        self.record_spend(amount, wallet_id)
+
+    def record_spend(self, amount: Micros, wallet_id: str, at: Optional[float] = None):
+        """Account for spend, possibly made at an earlier time (only budget guards need this)."""
+        pass
+
 class BudgetGuard(PaymentGuard):
     """Enforces daily and hourly spending limits."""
-    def __init__(self, daily_limit: float = settings.OMNIAGENTPAY_DAILY_BUDGET, hourly_limit: float = settings.OMNIAGENTPAY_HOURLY_BUDGET):
-        self.daily_limit = daily_limit
-        self.hourly_limit = hourly_limit
+    def __init__(self, daily_limit: Optional[float] = None, hourly_limit: Optional[float] = None, ledger: Optional[SpendLedger] = None):
+        # Limits left unset are read from settings when the guard is built, not at import
+        self.daily_limit = settings.OMNIAGENTPAY_DAILY_BUDGET if daily_limit is None else daily_limit
+        self.hourly_limit = settings.OMNIAGENTPAY_HOURLY_BUDGET if hourly_limit is None else hourly_limit
+        self.daily_limit_micros = to_micros(self.daily_limit)
+        self.hourly_limit_micros = to_micros(self.hourly_limit)
+        self.ledger = ledger or SpendLedger()
 
-    async def validate(self, amount: float, wallet_id: str, recipient: Optional[str] = None):
-        # Implementation would check against ledger/cache
-        # For now, it defines the policy to be enforced by OmniAgentPay
-        pass
+    async def validate(self, amount: Micros, wallet_id: str, recipient: Optional[str] = None):
+        violation = self._violation(amount, wallet_id, {})
+        if violation:
+            raise BudgetExceededError(violation)
+
+    async def validate_many(self, payments: Sequence[PaymentCheck]) -> List[Optional[str]]:
+        # Each wallet's ledger windows are read once for the whole batch
+        spent: Dict[Tuple[str, str], Micros] = {}
+        return [
+            BudgetExceededError(violation).detail if violation else None
+            for violation in (self._violation(amount, wallet_id, spent) for amount, wallet_id, _ in payments)
+        ]
+
+    def _violation(self, amount: Micros, wallet_id: str, spent: Dict[Tuple[str, str], Micros]) -> Optional[str]:
+        if self.hourly_limit_micros:
+            hourly = spent.get(("hourly", wallet_id))
+            if hourly is None:
+                hourly = spent[("hourly", wallet_id)] = self.ledger.hourly(wallet_id)
+            if hourly + amount > self.hourly_limit_micros:
+                return f"Hourly budget of {self.hourly_limit} would be exceeded (spent {format_micros(hourly)})"
+        if self.daily_limit_micros:
+            daily = spent.get(("daily", wallet_id))
+            if daily is None:
+                daily = spent[("daily", wallet_id)] = self.ledger.daily(wallet_id)
+            if daily + amount > self.daily_limit_micros:
+                return f"Daily budget of {self.daily_limit} would be exceeded (spent {format_micros(daily)})"
+        return None
+
+    def record_spend(self, amount: Micros, wallet_id: str, at: Optional[float] = None):
+        self.ledger.record(wallet_id, amount, at)
 
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -42,11 +120,12 @@ class BudgetGuard(PaymentGuard):
 
 class SingleTransactionGuard(PaymentGuard):
     """Limits the maximum amount for any single transaction."""
-    def __init__(self, tx_limit: float = settings.OMNIAGENTPAY_TX_LIMIT):
-        self.tx_limit = tx_limit
+    def __init__(self, tx_limit: Optional[float] = None):
+        self.tx_limit = settings.OMNIAGENTPAY_TX_LIMIT if tx_limit is None else tx_limit
+        self.tx_limit_micros = to_micros(self.tx_limit)
 
-    async def validate(self, amount: float, wallet_id: str, recipient: Optional[str] = None):
-        if amount > self.tx_limit:
+    async def validate(self, amount: Micros, wallet_id: str, recipient: Optional[str] = None):
+        if amount > self.tx_limit_micros:
             raise BudgetExceededError(f"Transaction exceeds limit of {self.tx_limit}")
 
     def to_dict(self) -> Dict[str, Any]:
@@ -57,11 +136,35 @@ class SingleTransactionGuard(PaymentGuard):
 
 class RateLimitGuard(PaymentGuard):
     """Limits the number of transactions per minute."""
-    def __init__(self, requests_per_min: int = settings.OMNIAGENTPAY_RATE_LIMIT_PER_MIN):
-        self.requests_per_min = requests_per_min
+    queueable = True
 
-    async def validate(self, amount: float, wallet_id: str, recipient: Optional[str] = None):
-        pass
+    def __init__(self, requests_per_min: Optional[int] = None, limiter: Optional[RateLimiter] = None):
+        self.requests_per_min = settings.OMNIAGENTPAY_RATE_LIMIT_PER_MIN if requests_per_min is None else requests_per_min
+        # Tokens are taken when a payment is admitted to its wallet lane; this guard only peeks
+        self.limiter = limiter or InMemoryRateLimiter(self.requests_per_min)
+
+    async def validate(self, amount: Micros, wallet_id: str, recipient: Optional[str] = None):
+        if not self.requests_per_min:
+            return
+        decision = await self.limiter.peek(wallet_id)
+        if not decision.allowed:
+            raise self._exceeded(decision)
+
+    async def validate_many(self, payments: Sequence[PaymentCheck]) -> List[Optional[str]]:
+        if not self.requests_per_min:
+            return [None] * len(payments)
+        # One bucket peek per distinct wallet
+        wallets = list(dict.fromkeys(wallet_id for _, wallet_id, _ in payments))
+        decisions = dict(zip(wallets, await asyncio.gather(*(self.limiter.peek(w) for w in wallets))))
+        return [
+            None if decisions[wallet_id].allowed else self._exceeded(decisions[wallet_id]).detail
+            for _, wallet_id, _ in payments
+        ]
+
+    def _exceeded(self, decision: RateLimitDecision) -> RateLimitExceededError:
+        return RateLimitExceededError(
+            f"{self.requests_per_min} payments per minute, next slot in {decision.retry_after:.1f}s"
+        )
 
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -69,26 +172,449 @@ class RateLimitGuard(PaymentGuard):
             "requests_per_minute": self.requests_per_min
         }
 
+class HierarchicalBudgetGuard(PaymentGuard):
+    """Enforces org/team budgets shared by groups of wallets."""
+    def __init__(self, tree: BudgetTree):
+        self.tree = tree
+
+    async def validate(self, amount: Micros, wallet_id: str, recipient: Optional[str] = None):
+        self.tree.check(wallet_id, amount)
+
+    async def validate_and_hold(self, amount: Micros, wallet_id: str, recipient: Optional[str], hold: str):
+        self.tree.check(wallet_id, amount, hold=hold)
+
+    def release(self, hold: str):
+        self.tree.release(hold)
+
+    def record_spend(self, amount: Micros, wallet_id: str, at: Optional[float] = None):
+        self.tree.record(wallet_id, amount, at)
+
+    def to_dict(self) -> Dict[str, Any]:
+        # Enforced locally only; the SDK has no notion of shared budgets
+        return {
+            "type": "hierarchical_budget",
+            **self.tree.stats()
+        }
+
 class RecipientWhitelistGuard(PaymentGuard):
     """Restricts payments to a pre-approved list of addresses."""
-    def __init__(self, whitelisted_addresses: List[str] = settings.OMNIAGENTPAY_WHITELISTED_RECIPIENTS):
-        self.whitelisted_addresses = whitelisted_addresses
+    def __init__(
+        self,
+        whitelisted_addresses: Optional[List[str]] = None,
+        whitelist_file: Optional[str] = None,
+        wallet_overrides: Optional[Dict[str, Optional[WhitelistIndex]]] = None,
+        whitelist: Optional[WhitelistIndex] = None,
+        wallet_loader: Optional[WalletWhitelistLoader] = None
+    ):
+        # What the index is built from, so a policy reload can reuse an unchanged one
+        self.source = self.source_of(whitelisted_addresses, whitelist_file)
+        addresses, whitelist_file, _ = self.source
+        if whitelist is None:
+            whitelist = WhitelistIndex(addresses)
+            if whitelist_file:
+                whitelist.load_file(whitelist_file)
+            scoped = whitelist.scoped_addresses()
+            if scoped:
+                # Payments carry no source chain here and the SDK recipient guard is not
+                # chain-aware, so a scoped entry would silently approve the address everywhere
+                raise ValueError(
+                    f"Chain-scoped whitelist entries (CHAIN:address) are not supported yet: {scoped[:5]}"
+                )
+        self.whitelist = whitelist
+        # Per-wallet whitelists changed through this server; None means the guard was removed
+        self._wallet_overrides: Dict[str, Optional[WhitelistIndex]] = {} if wallet_overrides is None else wallet_overrides
+        # Per-wallet changes made before a restart or on another instance are only in the
+        # guard store, so a local rejection is confirmed against it (the SDK stays authoritative)
+        self.wallet_loader = wallet_loader
+
+    @staticmethod
+    def source_of(whitelisted_addresses: Optional[List[str]], whitelist_file: Optional[str]) -> Tuple:
+        """Unset values come from settings; an empty file name means no file."""
+        if whitelisted_addresses is None:
+            whitelisted_addresses = settings.OMNIAGENTPAY_WHITELISTED_RECIPIENTS
+        if whitelist_file is None:
+            whitelist_file = settings.OMNIAGENTPAY_WHITELIST_FILE
+        mtime = os.stat(whitelist_file).st_mtime if whitelist_file else None
+        return tuple(whitelisted_addresses), whitelist_file or None, mtime
 
-    async def validate(self, amount: float, wallet_id: str, recipient: Optional[str] = None):
-        if self.whitelisted_addresses and recipient not in self.whitelisted_addresses:
-            raise UnauthorizedRecipientError(recipient or "Unknown")
+    async def validate(self, amount: Micros, wallet_id: str, recipient: Optional[str] = None):
+        whitelist = self._wallet_overrides.get(wallet_id, self.whitelist)
+        if not whitelist or whitelist.contains(recipient):
+            return
+        if self.wallet_loader is not None:
+            try:
+                self.set_wallet_addresses(wallet_id, await self.wallet_loader(wallet_id))
+            except Exception as e:
+                logger.warning("wallet_whitelist_load_failed", wallet_id=wallet_id, error=str(e))
+                return
+            whitelist = self._wallet_overrides[wallet_id]
+            if not whitelist or whitelist.contains(recipient):
+                return
+        raise UnauthorizedRecipientError(recipient or "Unknown")
+
+    def set_wallet_addresses(self, wallet_id: str, addresses: Optional[List[str]]):
+        self._wallet_overrides[wallet_id] = None if addresses is None else WhitelistIndex(addresses)
 
     def to_dict(self) -> Dict[str, Any]:
         return {
             "type": "recipient_whitelist",
-            "addresses": self.whitelisted_addresses
+            "addresses": self.whitelist.addresses()
         }
 
+# Keys a guard policy file may set; anything left out falls back to settings
+POLICY_FIELDS = ("daily_limit", "hourly_limit", "tx_limit", "rate_limit_per_min", "whitelisted_recipients", "whitelist_file")
+
+def load_policy_file(path: str) -> Dict[str, Any]:
+    """Reads a JSON guard policy file (see POLICY_FIELDS)."""
+    with open(path) as f:
+        policy = json.load(f)
+    if not isinstance(policy, dict):
+        raise ValueError("Guard policy file must contain a JSON object")
+    unknown = sorted(set(policy) - set(POLICY_FIELDS))
+    if unknown:
+        raise ValueError(f"Unknown guard policy fields: {unknown}")
+    return policy
+
+def compile_guards(policy: Dict[str, Any], previous: Sequence[PaymentGuard] = ()) -> List[PaymentGuard]:
+    """
+    Builds the default guard set from policy values. State that must outlive
+    a reload (spend ledger, rate-limit buckets, per-wallet whitelists, budget
+    tree) is carried over from the previous guards.
+    """
+    prev = {type(guard): guard for guard in previous}
+    budget = prev.get(BudgetGuard)
+    rate = prev.get(RateLimitGuard)
+    recipient = prev.get(RecipientWhitelistGuard)
+    rate_limit_per_min = policy.get("rate_limit_per_min")
+    if rate_limit_per_min is None:
+        rate_limit_per_min = settings.OMNIAGENTPAY_RATE_LIMIT_PER_MIN
+    guards: List[PaymentGuard] = [
+        BudgetGuard(policy.get("daily_limit"), policy.get("hourly_limit"), ledger=budget.ledger if budget else None),
+        SingleTransactionGuard(policy.get("tx_limit")),
+        # A carried-over limiter is resized by GuardEngine.reload once the new snapshot is in
+        RateLimitGuard(rate_limit_per_min, limiter=rate.limiter if rate else build_rate_limiter(rate_limit_per_min)),
+    ]
+
+    addresses, whitelist_file = policy.get("whitelisted_recipients"), policy.get("whitelist_file")
+    unchanged = recipient is not None and recipient.source == RecipientWhitelistGuard.source_of(addresses, whitelist_file)
+    guards.append(RecipientWhitelistGuard(
+        addresses,
+        whitelist_file,
+        wallet_overrides=recipient._wallet_overrides if recipient else None,
+        whitelist=recipient.whitelist if unchanged else None,
+        wallet_loader=recipient.wallet_loader if recipient else None
+    ))
+
+    tree = prev.get(HierarchicalBudgetGuard)
+    if tree:
+        guards.append(tree)
+    elif settings.OMNIAGENTPAY_BUDGET_TREE_FILE:
+        guards.append(HierarchicalBudgetGuard(BudgetTree.load_file(settings.OMNIAGENTPAY_BUDGET_TREE_FILE)))
+    return guards
+
 def get_default_guards() -> List[PaymentGuard]:
     """Returns the set of default guards as configured in the environment."""
-    return [
-        BudgetGuard(),
-        SingleTransactionGuard(),
-        RateLimitGuard(),
-        RecipientWhitelistGuard()
-    ]
+    return compile_guards({})
+
+def policy_from_guards(guards: Sequence[PaymentGuard]) -> GuardPolicy:
+    """The SDK-side guard policy matching a local guard set (settings for guards it lacks)."""
+    policy = GuardPolicy.from_settings(settings.OMNIAGENTPAY_WHITELISTED_RECIPIENTS)
+    for guard in guards:
+        if isinstance(guard, BudgetGuard):
+            policy.daily_limit, policy.hourly_limit = guard.daily_limit, guard.hourly_limit
+        elif isinstance(guard, SingleTransactionGuard):
+            policy.tx_limit = guard.tx_limit
+        elif isinstance(guard, RateLimitGuard):
+            policy.rate_limit_per_min = guard.requests_per_min
+        elif isinstance(guard, RecipientWhitelistGuard):
+            policy.whitelist = guard.whitelist.addresses()
+    return policy
+
+class GuardSnapshot(NamedTuple):
+    """Immutable compiled guard set; the engine swaps whole snapshots on reload."""
+    version: int
+    guards: Tuple[PaymentGuard, ...]
+    policy: GuardPolicy
+    fingerprint: str
+    source: str
+    loaded_at: float
+
+class GuardEngine:
+    """
+    Local fast-path evaluation of payment guards.
+    Runs in-process before any upstream call so obviously violating payments
+    are rejected without a round trip; the SDK guards remain authoritative.
+
+    The guards live in an immutable snapshot. Reloading the policy file
+    compiles a new snapshot off the event loop and swaps it in with a single
+    assignment; callers holding the previous snapshot keep evaluating it.
+    """
+
+    def __init__(self, guards: List[PaymentGuard], source: str = "settings", policy_file: Optional[str] = None):
+        self._snapshot = self._make_snapshot(0, guards, source)
+        self.policy_file = policy_file
+        self._policy_mtime = os.stat(policy_file).st_mtime if policy_file else None
+        self._reload_lock = asyncio.Lock()
+        self._watch_task: Optional[asyncio.Task] = None
+        # References (transfer/transaction IDs) already recorded, so a payment
+        # reported both by its result and by a webhook is only counted once
+        self._recorded_refs = TTLCache(maxsize=100000, ttl=86400)
+        self.checks = 0
+        self.rejections = 0
+        self.duplicates = 0
+        self.reloads = 0
+        self.reload_failures = 0
+        self.last_reload_ms: Optional[float] = None
+        self.last_reload_error: Optional[str] = None
+
+    @classmethod
+    def from_policy_file(cls, path: str) -> "GuardEngine":
+        return cls(compile_guards(load_policy_file(path)), source=path, policy_file=path)
+
+    @staticmethod
+    def _make_snapshot(version: int, guards: Sequence[PaymentGuard], source: str) -> GuardSnapshot:
+        policy = policy_from_guards(guards)
+        return GuardSnapshot(version + 1, tuple(guards), policy, policy.fingerprint(), source, time.time())
+
+    @property
+    def snapshot(self) -> GuardSnapshot:
+        """The current compiled guard set; hold on to it to evaluate one request consistently."""
+        return self._snapshot
+
+    @property
+    def guards(self) -> List[PaymentGuard]:
+        return list(self._snapshot.guards)
+
+    async def reload(self) -> Dict[str, Any]:
+        """Recompiles the policy file and swaps the new snapshot in; the old one stays on failure."""
+        if not self.policy_file:
+            raise ValueError("No guard policy file is configured (OMNIAGENTPAY_GUARD_POLICY_FILE)")
+        async with self._reload_lock:
+            started = time.perf_counter()
+            previous = self._snapshot
+            try:
+                mtime = os.stat(self.policy_file).st_mtime
+                # Compiling (and fingerprinting) a large whitelist must not stall the event loop
+                snapshot = await asyncio.to_thread(
+                    lambda: self._make_snapshot(
+                        previous.version,
+                        compile_guards(load_policy_file(self.policy_file), previous.guards),
+                        self.policy_file
+                    )
+                )
+            except Exception as e:
+                self.reload_failures += 1
+                self.last_reload_error = str(e)
+                logger.error("guard_policy_reload_failed", path=self.policy_file, error=str(e))
+                raise
+            for guard in snapshot.guards:
+                if isinstance(guard, RateLimitGuard) and guard.requests_per_min:
+                    guard.limiter.reconfigure(guard.requests_per_min)
+            self._snapshot = snapshot
+            self._policy_mtime = mtime
+            self.reloads += 1
+            self.last_reload_ms = round((time.perf_counter() - started) * 1000, 3)
+            self.last_reload_error = None
+        logger.info("guard_policy_reloaded", **self.policy_stats())
+        return self.policy_stats()
+
+    def start_policy_watcher(self, interval: float) -> None:
+        """Polls the policy file and reloads it whenever its modification time changes."""
+        if self.policy_file and interval > 0 and (self._watch_task is None or self._watch_task.done()):
+            self._watch_task = asyncio.create_task(self._watch_policy_file(interval))
+
+    async def stop_policy_watcher(self) -> None:
+        if self._watch_task and not self._watch_task.done():
+            self._watch_task.cancel()
+            try:
+                await self._watch_task
+            except asyncio.CancelledError:
+                pass
+
+    async def _watch_policy_file(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                mtime = os.stat(self.policy_file).st_mtime
+            except OSError as e:
+                logger.warning("guard_policy_stat_failed", path=self.policy_file, error=str(e))
+                continue
+            if mtime == self._policy_mtime:
+                continue
+            # Remember the attempt so a broken file is reported once, not on every poll
+            self._policy_mtime = mtime
+            try:
+                await self.reload()
+            except Exception:
+                pass
+
+    def policy_stats(self) -> Dict[str, Any]:
+        snapshot = self._snapshot
+        return {
+            "version": snapshot.version,
+            "fingerprint": snapshot.fingerprint,
+            "source": snapshot.source,
+            "loaded_at": snapshot.loaded_at,
+            "reloads": self.reloads,
+            "reload_failures": self.reload_failures,
+            "last_reload_ms": self.last_reload_ms,
+            "last_reload_error": self.last_reload_error
+        }
+
+    async def check(
+        self,
+        amount: Micros,
+        wallet_id: str,
+        recipient: Optional[str] = None,
+        include_queueable: bool = True,
+        snapshot: Optional[GuardSnapshot] = None,
+        hold: Optional[str] = None
+    ):
+        """
+        Raises a GuardValidationError subclass for the first violated guard (amount in micro-USDC).
+        Evaluates the given snapshot, or the current one. With a hold key, shared
+        budgets reserve the amount until release(hold), so concurrent payments
+        from sibling wallets cannot overspend them; a failed check holds nothing.
+        """
+        self.checks += 1
+        for guard in (snapshot or self._snapshot).guards:
+            if guard.queueable and not include_queueable:
+                continue
+            try:
+                if hold is None:
+                    await guard.validate(amount, wallet_id, recipient)
+                else:
+                    await guard.validate_and_hold(amount, wallet_id, recipient, hold)
+            except BaseException as e:
+                if isinstance(e, GuardValidationError):
+                    self.rejections += 1
+                    logger.info("local_guard_rejected", guard=type(guard).__name__, wallet_id=wallet_id, reason=e.detail)
+                if hold is not None:
+                    self.release(hold, snapshot)
+                raise
+
+    def release(self, hold: str, snapshot: Optional[GuardSnapshot] = None):
+        """Drops what a check() with this hold key reserved; call it once the payment is recorded or has failed."""
+        for guard in (snapshot or self._snapshot).guards:
+            guard.release(hold)
+
+    async def check_many(
+        self,
+        payments: Sequence[PaymentCheck],
+        include_queueable: bool = True,
+        snapshot: Optional[GuardSnapshot] = None
+    ) -> List[Optional[str]]:
+        """
+        Pre-checks many independent payments in one pass per guard and returns
+        the first violation's reason for each payment (None if it passes).
+        Each payment is judged as check() would judge it on its own.
+        """
+        reasons: List[Optional[str]] = [None] * len(payments)
+        pending = list(range(len(payments)))
+        self.checks += len(payments)
+        for guard in (snapshot or self._snapshot).guards:
+            if not pending:
+                break
+            if guard.queueable and not include_queueable:
+                continue
+            verdicts = await guard.validate_many([payments[i] for i in pending])
+            survivors = []
+            for index, reason in zip(pending, verdicts):
+                if reason is None:
+                    survivors.append(index)
+                else:
+                    reasons[index] = reason
+                    self.rejections += 1
+            pending = survivors
+        return reasons
+
+    def record(self, amount: Micros, wallet_id: str, ref: Optional[str] = None):
+        """Feeds a payment completed through this server to the stateful guards."""
+        if self._seen(ref):
+            return
+        for guard in self.guards:
+            guard.record(amount, wallet_id)
+
+    def record_spend(self, amount: Micros, wallet_id: str, ref: Optional[str] = None, at: Optional[float] = None):
+        """Adds spend reported out of band (e.g. webhooks) to the budget ledgers only."""
+        if self._seen(ref):
+            return
+        for guard in self.guards:
+            guard.record_spend(amount, wallet_id, at)
+
+    def _seen(self, ref: Optional[str]) -> bool:
+        if not ref:
+            return False
+        if self._recorded_refs.get(ref) is not MISSING:
+            self.duplicates += 1
+            return True
+        self._recorded_refs.set(ref, True)
+        return False
+
+    def set_wallet_whitelist(self, wallet_id: str, addresses: Optional[List[str]]):
+        """Mirrors a per-wallet recipient guard change made through the SDK."""
+        for guard in self.guards:
+            if isinstance(guard, RecipientWhitelistGuard):
+                guard.set_wallet_addresses(wallet_id, addresses)
+
+    def set_wallet_whitelist_loader(self, loader: Optional[WalletWhitelistLoader]):
+        """Where the recipient guard confirms a rejection against the wallet's stored whitelist."""
+        for guard in self.guards:
+            if isinstance(guard, RecipientWhitelistGuard):
+                guard.wallet_loader = loader
+
+    @property
+    def budget_tree(self) -> Optional[BudgetTree]:
+        """The org/team budget hierarchy, if one is configured."""
+        for guard in self.guards:
+            if isinstance(guard, HierarchicalBudgetGuard):
+                return guard.tree
+        return None
+
+    @property
+    def rate_limiter(self) -> Optional[RateLimiter]:
+        """Token buckets of the rate-limit guard, used to admit payments to wallet lanes."""
+        return self.rate_limit()[1]
+
+    def rate_limit(self) -> Tuple[int, Optional[RateLimiter]]:
+        """Payments per minute and their token buckets under the current policy; (0, None) if unlimited."""
+        for guard in self._snapshot.guards:
+            if isinstance(guard, RateLimitGuard) and guard.requests_per_min:
+                return guard.requests_per_min, guard.limiter
+        return 0, None
+
+    def default_whitelist(self) -> List[str]:
+        """Normalized addresses of the default recipient whitelist (empty if none)."""
+        for guard in self.guards:
+            if isinstance(guard, RecipientWhitelistGuard):
+                return guard.whitelist.addresses()
+        return []
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {
+            "guards": len(self.guards),
+            "policy": self.policy_stats(),
+            "checks": self.checks,
+            "rejections": self.rejections,
+            "duplicates": self.duplicates
+        }
+        for guard in self.guards:
+            if isinstance(guard, BudgetGuard):
+                stats["ledger"] = guard.ledger.stats()
+            elif isinstance(guard, RateLimitGuard):
+                stats["rate_limiter"] = guard.limiter.stats()
+            elif isinstance(guard, HierarchicalBudgetGuard):
+                stats["budget_tree"] = guard.tree.stats()
+        return stats
+
+_engine: Optional[GuardEngine] = None
+
+def get_guard_engine() -> GuardEngine:
+    """Process-wide guard engine built from the default guards."""
+    global _engine
+    if _engine is None:
+        if settings.OMNIAGENTPAY_GUARD_POLICY_FILE:
+            _engine = GuardEngine.from_policy_file(settings.OMNIAGENTPAY_GUARD_POLICY_FILE)
+        else:
+            _engine = GuardEngine(get_default_guards())
+    return _engine
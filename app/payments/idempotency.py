@@ -0,0 +1,88 @@
+import json
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Optional
+from app.payments.cache import MISSING, TTLCache
+
+class IdempotencyStore(ABC):
+    """Bounded store of completed payment results keyed by idempotency key."""
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Returns {"fingerprint": ..., "result": ...} for a completed key, or None."""
+        pass
+
+    @abstractmethod
+    def put(self, key: str, fingerprint: str, result: Dict[str, Any]) -> None:
+        pass
+
+    @abstractmethod
+    def stats(self) -> Dict[str, Any]:
+        pass
+
+class InMemoryIdempotencyStore(IdempotencyStore):
+    """Per-process LRU store; results are lost on restart."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        record = self._cache.get(key)
+        return None if record is MISSING else record
+
+    def put(self, key: str, fingerprint: str, result: Dict[str, Any]) -> None:
+        self._cache.set(key, {"fingerprint": fingerprint, "result": result})
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "memory", **self._cache.stats()}
+
+class SQLiteIdempotencyStore(IdempotencyStore):
+    """File-backed store that survives restarts; oldest records are pruned beyond maxsize."""
+
+    def __init__(self, path: str, maxsize: int, ttl: float, clock: Callable[[], float] = time.time):
+        self.path = path
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS idempotency ("
+            "key TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, result TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idempotency_created_at ON idempotency (created_at)")
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        row = self._conn.execute(
+            "SELECT fingerprint, result FROM idempotency WHERE key = ? AND created_at > ?",
+            (key, self._clock() - self.ttl)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return {"fingerprint": row[0], "result": json.loads(row[1])}
+
+    def put(self, key: str, fingerprint: str, result: Dict[str, Any]) -> None:
+        now = self._clock()
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO idempotency (key, fingerprint, result, created_at) VALUES (?, ?, ?, ?)",
+                (key, fingerprint, json.dumps(result), now)
+            )
+            self._conn.execute("DELETE FROM idempotency WHERE created_at <= ?", (now - self.ttl,))
+            self._conn.execute(
+                "DELETE FROM idempotency WHERE key IN ("
+                "SELECT key FROM idempotency ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                (self.maxsize,)
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        size = self._conn.execute("SELECT COUNT(*) FROM idempotency").fetchone()[0]
+        return {"backend": "sqlite", "size": size, "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+    def close(self) -> None:
+        self._conn.close()
@@ -0,0 +1,141 @@
+import bisect
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+# Intent statuses after which nothing more happens to an intent
+TERMINAL_STATUSES = frozenset({"succeeded", "canceled", "failed", "expired"})
+
+# Largest page list() returns; bigger requests are clamped to it
+MAX_PAGE_SIZE = 500
+
+class IntentIndex:
+    """
+    Bounded local index of payment intents created through this server, so
+    listing intents and composing confirm diagnostics need no SDK lookups.
+    Entries are ordered by creation; cursors are opaque sequence numbers and
+    pages run newest first. When full, the oldest intent is dropped.
+    """
+
+    def __init__(self, maxsize: int, clock: Callable[[], float] = time.time):
+        self.maxsize = maxsize
+        self._clock = clock
+        self._records: Dict[str, Dict[str, Any]] = {}
+        self._seq_ids: Dict[int, str] = {}
+        # Ascending sequence numbers, overall and per wallet
+        self._seqs: List[int] = []
+        self._wallet_seqs: Dict[str, List[int]] = {}
+        self._by_transaction: Dict[str, str] = {}
+        self._next_seq = 1
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def add(
+        self,
+        intent_id: str,
+        wallet_id: str,
+        recipient: str,
+        amount: str,
+        status: str,
+        currency: str = "USD",
+        created_at: Optional[float] = None
+    ) -> Dict[str, Any]:
+        if intent_id in self._records:
+            self.remove(intent_id)
+        now = self._clock()
+        seq = self._next_seq
+        self._next_seq += 1
+        record = {
+            "intent_id": intent_id,
+            "wallet_id": wallet_id,
+            "recipient": recipient,
+            "amount": amount,
+            "currency": currency,
+            "status": status,
+            "created_at": now if created_at is None else created_at,
+            "updated_at": now,
+            "transaction_id": None,
+            "_seq": seq
+        }
+        self._records[intent_id] = record
+        self._seq_ids[seq] = intent_id
+        self._seqs.append(seq)
+        self._wallet_seqs.setdefault(wallet_id, []).append(seq)
+        while len(self._records) > self.maxsize:
+            self.remove(self._seq_ids[self._seqs[0]])
+            self.evictions += 1
+        return self._public(record)
+
+    def get(self, intent_id: str) -> Optional[Dict[str, Any]]:
+        record = self._records.get(intent_id)
+        return self._public(record) if record else None
+
+    def update(self, intent_id: str, status: str, transaction_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        record = self._records.get(intent_id)
+        if record is None:
+            return None
+        record["status"] = status
+        record["updated_at"] = self._clock()
+        if transaction_id:
+            record["transaction_id"] = transaction_id
+            self._by_transaction[transaction_id] = intent_id
+        return self._public(record)
+
+    def update_by_transaction(self, transaction_id: str, status: str) -> Optional[Dict[str, Any]]:
+        """Applies a status reported for a transaction (e.g. by a webhook) to its intent."""
+        intent_id = self._by_transaction.get(transaction_id)
+        return self.update(intent_id, status) if intent_id else None
+
+    def remove(self, intent_id: str) -> Optional[Dict[str, Any]]:
+        record = self._records.pop(intent_id, None)
+        if record is None:
+            return None
+        seq = record["_seq"]
+        del self._seq_ids[seq]
+        self._discard(self._seqs, seq)
+        wallet_seqs = self._wallet_seqs[record["wallet_id"]]
+        self._discard(wallet_seqs, seq)
+        if not wallet_seqs:
+            del self._wallet_seqs[record["wallet_id"]]
+        if record["transaction_id"]:
+            self._by_transaction.pop(record["transaction_id"], None)
+        return self._public(record)
+
+    def list(
+        self,
+        wallet_id: Optional[str] = None,
+        status: Optional[str] = None,
+        cursor: Optional[str] = None,
+        limit: int = 50
+    ) -> Dict[str, Any]:
+        """One page of intents, newest first; pass next_cursor back to continue. limit is clamped to 1..MAX_PAGE_SIZE."""
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        seqs = self._wallet_seqs.get(wallet_id, []) if wallet_id else self._seqs
+        try:
+            end = bisect.bisect_left(seqs, int(cursor)) if cursor else len(seqs)
+        except ValueError:
+            raise ValueError(f"Invalid cursor: {cursor}")
+
+        page: List[Dict[str, Any]] = []
+        position = end - 1
+        while position >= 0 and len(page) < limit:
+            record = self._records[self._seq_ids[seqs[position]]]
+            if status is None or record["status"] == status:
+                page.append(self._public(record))
+            position -= 1
+        next_cursor = str(seqs[position + 1]) if position >= 0 and page else None
+        return {"intents": page, "next_cursor": next_cursor}
+
+    def stats(self) -> Dict[str, Any]:
+        return {"size": len(self._records), "maxsize": self.maxsize, "evictions": self.evictions}
+
+    @staticmethod
+    def _discard(seqs: List[int], seq: int) -> None:
+        position = bisect.bisect_left(seqs, seq)
+        if position < len(seqs) and seqs[position] == seq:
+            del seqs[position]
+
+    @staticmethod
+    def _public(record: Dict[str, Any]) -> Dict[str, Any]:
+        return {k: v for k, v in record.items() if k != "_seq"}
@@ -20,9 +20,14 @@ class AbstractPaymentClient(ABC):
         from_wallet_id: str, 
         to_address: str, 
         amount: str, 
-        currency: str = "USD"
+        currency: str = "USD",
+        include_queueable: bool = True,
+        hold: Optional[str] = None
     ) -> Dict[str, Any]:
-        """Simulates a payment without moving real funds."""
+        """
+        Simulates a payment without moving real funds (include_queueable=False skips
+        rate-limit checks; hold is the guard hold the caller already took for it).
+        """
         pass
 
     @abstractmethod
@@ -31,7 +36,8 @@ class AbstractPaymentClient(ABC):
         from_wallet_id: str, 
         to_address: str, 
         amount: str, 
-        currency: str = "USD"
+        currency: str = "USD",
+        idempotency_key: Optional[str] = None
     ) -> Dict[str, Any]:
         """Executes a real payment transfer."""
         pass
@@ -54,6 +60,6 @@ class AbstractPaymentClient(ABC):
         pass
 
     @abstractmethod
-    async def get_wallet_usdc_balance(self, wallet_id: str) -> Dict[str, Any]:
+    async def get_wallet_usdc_balance(self, wallet_id: str, fresh: bool = False) -> Dict[str, Any]:
         """Gets the actual Circle wallet USDC balance."""
         pass
@@ -0,0 +1,151 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Optional, Tuple
+import structlog
+from app.payments.ratelimit import RateLimiter
+from app.utils.exceptions import RateLimitExceededError
+
+logger = structlog.get_logger(__name__)
+
+WINDOW_SECONDS = 60.0
+
+class WalletLane:
+    """FIFO execution lane for one wallet plus its recent start times."""
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.starts: Deque[float] = deque()
+        self.waiting = 0
+
+    def idle(self, now: float) -> bool:
+        return not self.lock.locked() and self.waiting == 0 and (
+            not self.starts or self.starts[-1] <= now - WINDOW_SECONDS
+        )
+
+class LaneScheduler:
+    """
+    Serializes payments per wallet and paces them to a per-minute budget.
+    Payments that would exceed the budget wait in their lane instead of being
+    bounced by the SDK rate-limit guard; they are only rejected when the wait
+    would exceed the caller's deadline. Different wallets never block each other.
+    With a shared rate limiter, admission also takes a token from the wallet's
+    fleet-wide bucket so several server instances cannot overspend the budget.
+    If `pacing` is given it is asked for (max_per_minute, limiter) on every
+    dispatch instead, so a reloaded guard policy takes effect immediately.
+    """
+
+    def __init__(
+        self,
+        max_per_minute: int,
+        max_wait: float,
+        max_idle_lanes: int = 10000,
+        limiter: Optional[RateLimiter] = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+        pacing: Optional[Callable[[], Tuple[int, Optional[RateLimiter]]]] = None
+    ):
+        self.max_per_minute = max_per_minute
+        self.max_wait = max_wait
+        self.max_idle_lanes = max_idle_lanes
+        self.limiter = limiter
+        self._clock = clock
+        self._sleep = sleep
+        self._pacing = pacing
+        self._lanes: Dict[str, WalletLane] = {}
+        self.admitted = 0
+        self.paced = 0
+        self.rejected = 0
+        self.total_wait_seconds = 0.0
+
+    @asynccontextmanager
+    async def slot(self, wallet_id: str, max_wait: Optional[float] = None) -> AsyncIterator[None]:
+        """Waits for this wallet's turn (and pacing budget), then holds the lane."""
+        started = self._clock()
+        wait_budget = self.max_wait if max_wait is None else max(0.0, min(max_wait, self.max_wait))
+        deadline = started + wait_budget
+        lane = self._get_lane(wallet_id)
+
+        lane.waiting += 1
+        try:
+            if wait_budget <= 0 and lane.lock.locked():
+                raise asyncio.TimeoutError()
+            await asyncio.wait_for(lane.lock.acquire(), timeout=wait_budget or None)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            logger.warning("wallet_lane_wait_exceeded", wallet_id=wallet_id, max_wait=wait_budget)
+            raise RateLimitExceededError(f"wallet {wallet_id} queue wait exceeded {wait_budget:.1f}s")
+        finally:
+            lane.waiting -= 1
+
+        try:
+            max_per_minute, limiter = self._pacing() if self._pacing else (self.max_per_minute, self.limiter)
+            delay = self._pacing_delay(lane, max_per_minute)
+            if delay > 0:
+                if self._clock() + delay > deadline:
+                    self.rejected += 1
+                    logger.warning("wallet_lane_pacing_exceeds_deadline", wallet_id=wallet_id, delay=delay)
+                    raise RateLimitExceededError(
+                        f"wallet {wallet_id} budget of {max_per_minute}/min frees up in {delay:.1f}s"
+                    )
+                self.paced += 1
+                logger.info("wallet_lane_paced", wallet_id=wallet_id, delay=round(delay, 3))
+                await self._sleep(delay)
+
+            if limiter is not None:
+                await self._take_token(limiter, wallet_id, deadline)
+
+            now = self._clock()
+            lane.starts.append(now)
+            self.admitted += 1
+            self.total_wait_seconds += now - started
+            yield
+        finally:
+            lane.lock.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "lanes": len(self._lanes),
+            "queued": sum(lane.waiting for lane in self._lanes.values()),
+            "admitted": self.admitted,
+            "paced": self.paced,
+            "rejected": self.rejected,
+            "avg_wait_seconds": round(self.total_wait_seconds / self.admitted, 4) if self.admitted else 0.0
+        }
+
+    async def _take_token(self, limiter: RateLimiter, wallet_id: str, deadline: float) -> None:
+        while True:
+            decision = await limiter.take(wallet_id)
+            if decision.allowed:
+                return
+            if self._clock() + decision.retry_after > deadline:
+                self.rejected += 1
+                logger.warning("wallet_lane_token_wait_exceeds_deadline", wallet_id=wallet_id,
+                               retry_after=decision.retry_after)
+                raise RateLimitExceededError(
+                    f"wallet {wallet_id} shared budget frees up in {decision.retry_after:.1f}s"
+                )
+            self.paced += 1
+            logger.info("wallet_lane_paced", wallet_id=wallet_id, delay=round(decision.retry_after, 3), shared=True)
+            await self._sleep(decision.retry_after)
+
+    def _pacing_delay(self, lane: WalletLane, max_per_minute: int) -> float:
+        if max_per_minute <= 0:
+            return 0.0
+        now = self._clock()
+        while lane.starts and lane.starts[0] <= now - WINDOW_SECONDS:
+            lane.starts.popleft()
+        if len(lane.starts) < max_per_minute:
+            return 0.0
+        return lane.starts[0] + WINDOW_SECONDS - now
+
+    def _get_lane(self, wallet_id: str) -> WalletLane:
+        lane = self._lanes.get(wallet_id)
+        if lane is None:
+            if len(self._lanes) >= self.max_idle_lanes:
+                now = self._clock()
+                for key in [k for k, v in self._lanes.items() if v.idle(now)]:
+                    del self._lanes[key]
+            lane = self._lanes[wallet_id] = WalletLane()
+        return lane
@@ -0,0 +1,101 @@
+import time
+from typing import Any, Callable, Dict, List, Optional
+from app.payments.money import Micros
+
+class SpendWindow:
+    """
+    Rolling spend total over a fixed span, kept in a ring of time buckets.
+    Adding spend and reading the total are O(1) amortized: each bucket is
+    cleared once per rotation as the clock advances. A bucket drops out as
+    soon as its start leaves the span, so the total can only under-count the
+    exact rolling window, never over-count it.
+    """
+
+    def __init__(self, span: float, buckets: int):
+        self.span = span
+        self.width = span / buckets
+        self._amounts: List[Micros] = [0] * buckets
+        self._epoch: Optional[int] = None
+        self._total = 0
+
+    def add(self, amount: Micros, now: float) -> None:
+        epoch = self._advance(now)
+        self._amounts[epoch % len(self._amounts)] += amount
+        self._total += amount
+
+    def add_at(self, amount: Micros, at: float, now: float) -> None:
+        """Counts spend that happened at an earlier time (e.g. a delayed webhook)."""
+        current = self._advance(now)
+        epoch = int(at // self.width)
+        if epoch <= current - len(self._amounts):
+            # Already outside the window
+            return
+        epoch = min(epoch, current)
+        self._amounts[epoch % len(self._amounts)] += amount
+        self._total += amount
+
+    def total(self, now: float) -> Micros:
+        self._advance(now)
+        return self._total
+
+    def _advance(self, now: float) -> int:
+        epoch = int(now // self.width)
+        if self._epoch is None:
+            self._epoch = epoch
+        elif epoch < self._epoch:
+            # Clock went backwards; keep counting into the newest bucket
+            return self._epoch
+        elif epoch - self._epoch >= len(self._amounts):
+            self._amounts = [0] * len(self._amounts)
+            self._total = 0
+            self._epoch = epoch
+        else:
+            while self._epoch < epoch:
+                self._epoch += 1
+                slot = self._epoch % len(self._amounts)
+                self._total -= self._amounts[slot]
+                self._amounts[slot] = 0
+        return self._epoch
+
+class SpendLedger:
+    """Per-wallet hourly and daily spend totals (micro-USDC) for local budget checks."""
+
+    def __init__(
+        self,
+        hourly_buckets: int = 60,
+        daily_buckets: int = 144,
+        clock: Callable[[], float] = time.time
+    ):
+        self.hourly_buckets = hourly_buckets
+        self.daily_buckets = daily_buckets
+        self._clock = clock
+        self._hourly: Dict[str, SpendWindow] = {}
+        self._daily: Dict[str, SpendWindow] = {}
+        self.recorded = 0
+
+    def record(self, wallet_id: str, amount: Micros, at: Optional[float] = None) -> None:
+        """Adds completed spend for a wallet (at an earlier time if given)."""
+        now = self._clock()
+        for windows, span, buckets in (
+            (self._hourly, 3600, self.hourly_buckets),
+            (self._daily, 86400, self.daily_buckets)
+        ):
+            window = windows.get(wallet_id)
+            if window is None:
+                window = windows[wallet_id] = SpendWindow(span, buckets)
+            if at is None:
+                window.add(amount, now)
+            else:
+                window.add_at(amount, at, now)
+        self.recorded += 1
+
+    def hourly(self, wallet_id: str) -> Micros:
+        window = self._hourly.get(wallet_id)
+        return window.total(self._clock()) if window else 0
+
+    def daily(self, wallet_id: str) -> Micros:
+        window = self._daily.get(wallet_id)
+        return window.total(self._clock()) if window else 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {"wallets": len(self._daily), "recorded": self.recorded}
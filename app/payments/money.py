@@ -0,0 +1,29 @@
+from decimal import Decimal, InvalidOperation
+from typing import Union
+
+# USDC has 6 decimals; amounts are handled as integer micro-USDC so that
+# validation, guard limits and spend accounting are exact integer math
+MICROS_PER_USDC = 1_000_000
+
+Micros = int
+
+def to_micros(value: Union[str, int, float, Decimal]) -> Micros:
+    """Parses an amount into micro-USDC, rejecting anything finer than 6 decimals."""
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value * MICROS_PER_USDC
+    try:
+        amount = Decimal(str(value).strip())
+    except InvalidOperation:
+        raise ValueError(f"Invalid amount: {value!r}")
+    if not amount.is_finite():
+        raise ValueError(f"Invalid amount: {value!r}")
+    micros = amount * MICROS_PER_USDC
+    if micros != micros.to_integral_value():
+        raise ValueError(f"Amount {value} has more than 6 decimal places")
+    return int(micros)
+
+def format_micros(micros: Micros) -> str:
+    """Canonical decimal string for a micro-USDC amount (e.g. 10500000 -> "10.5")."""
+    whole, frac = divmod(abs(micros), MICROS_PER_USDC)
+    text = f"{whole}.{frac:06d}".rstrip("0").rstrip(".")
+    return f"-{text}" if micros < 0 else text
@@ -1,14 +1,37 @@
 import asyncio
+import time
+import uuid
 import structlog
-from decimal import Decimal
-from typing import Any, Dict, List, Optional
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 from omniagentpay import OmniAgentPay
 from omniagentpay.core.types import Network
 from app.core.config import settings
+from app.core.security import create_simulation_token
+from app.payments.cache import MISSING, NOT_FOUND, TTLCache
+from app.payments.guard_policy import GuardPolicy, add_addresses, apply_diff, diff_guards
+from app.payments.guard_store import build_guard_store
+from app.payments.guards import get_guard_engine
+from app.payments.money import Micros, format_micros, to_micros
+from app.payments.intents import TERMINAL_STATUSES, IntentIndex
 from app.payments.interfaces import AbstractPaymentClient
+from app.payments.pool import WalletPool
+from app.payments.reconciler import GuardReconciler
+from app.payments.reservations import ReservationLedger
+from app.payments.sweeper import IntentSweeper
+from app.payments.singleflight import SingleFlight
+from app.utils.exceptions import GuardValidationError
 
 logger = structlog.get_logger(__name__)
 
+def _status_value(status: Any) -> str:
+    """Plain string of an SDK status enum (or of an already plain status)."""
+    return getattr(status, "value", status)
+
+def _intent_expiry(intent: Any) -> Optional[float]:
+    expires_at = getattr(intent, "expires_at", None)
+    return expires_at.timestamp() if isinstance(expires_at, datetime) else None
+
 class OmniAgentPaymentClient(AbstractPaymentClient):
     """
     Production-ready wrapper for the OmniAgentPay SDK.
@@ -30,43 +53,157 @@ class OmniAgentPaymentClient(AbstractPaymentClient):
         )
         logger.info("OmniAgentPay SDK initialized")
 
+        # Local mirror of the default guards, evaluated before any SDK round trip
+        self._guard_engine = get_guard_engine()
+
+        # Wallet metadata (blockchain/address) is effectively immutable, cache it
+        self._wallet_cache = TTLCache(
+            maxsize=settings.OMNIAGENTPAY_WALLET_CACHE_SIZE,
+            ttl=settings.OMNIAGENTPAY_WALLET_CACHE_TTL_SECONDS,
+            negative_ttl=settings.OMNIAGENTPAY_WALLET_CACHE_NEGATIVE_TTL_SECONDS
+        )
+        # Balances change, so keep them only for a short staleness bound
+        self._balance_cache = TTLCache(
+            maxsize=settings.OMNIAGENTPAY_BALANCE_CACHE_SIZE,
+            ttl=settings.OMNIAGENTPAY_BALANCE_CACHE_TTL_SECONDS
+        )
+        # Intents created here, so listing and confirm diagnostics stay local
+        self.intent_index = IntentIndex(maxsize=settings.OMNIAGENTPAY_INTENT_INDEX_SIZE)
+        # Balance held by outstanding intents, so concurrent intents cannot over-commit a wallet
+        self.reservations = ReservationLedger()
+        # Cancels intents left unconfirmed past their deadline and frees their local state
+        self._intent_sweeper = IntentSweeper(
+            expire=self._expire_intents,
+            interval=settings.OMNIAGENTPAY_INTENT_SWEEP_INTERVAL_SECONDS,
+            batch_size=settings.OMNIAGENTPAY_INTENT_SWEEP_BATCH_SIZE
+        )
+        # Concurrent identical read-only lookups share one upstream call
+        self._single_flight = SingleFlight()
+        self._wallet_pool: Optional[WalletPool] = None
+        if settings.OMNIAGENTPAY_WALLET_POOL_ENABLED:
+            self._wallet_pool = WalletPool(
+                provision=self._provision_guarded_wallet,
+                target_size=settings.OMNIAGENTPAY_WALLET_POOL_TARGET_SIZE,
+                low_water=settings.OMNIAGENTPAY_WALLET_POOL_LOW_WATER,
+                refill_concurrency=settings.OMNIAGENTPAY_WALLET_POOL_REFILL_CONCURRENCY,
+                state_path=settings.OMNIAGENTPAY_WALLET_POOL_STATE_FILE
+            )
+        # Wallet guard configs; a shared backend makes them visible to every instance
+        self._guard_store = build_guard_store(self._client)
+        # Per-wallet whitelists changed elsewhere are read back before the local guard rejects
+        self._guard_engine.set_wallet_whitelist_loader(self._stored_wallet_whitelist)
+
+        # Re-applies the guard policy to existing wallets, resuming from a checkpoint
+        self._guard_reconciler = GuardReconciler(
+            list_wallets=self._list_managed_wallet_ids,
+            reconcile=self.reconcile_guards,
+            policy_fingerprint=lambda: self._guard_engine.snapshot.fingerprint,
+            concurrency=settings.OMNIAGENTPAY_GUARD_RECONCILE_CONCURRENCY,
+            rate_per_second=settings.OMNIAGENTPAY_GUARD_RECONCILE_RATE_PER_SECOND,
+            state_path=settings.OMNIAGENTPAY_GUARD_RECONCILE_STATE_FILE
+        )
+
     @classmethod
     async def get_instance(cls) -> "OmniAgentPaymentClient":
         if cls._instance is None:
             async with cls._lock:
                 if cls._instance is None:
                     cls._instance = cls()
+                    # Intents can only be created once the client exists, so the expiry
+                    # sweeper starts with it rather than forcing an SDK client at app startup
+                    cls._instance._intent_sweeper.start()
         return cls._instance
 
+    async def get_wallet_info(self, wallet_id: str) -> Any:
+        """Resolve wallet metadata, served from the wallet cache when possible."""
+        cached = self._wallet_cache.get(wallet_id)
+        if cached is NOT_FOUND:
+            raise Exception(f"Wallet not found: {wallet_id} (cached)")
+        if cached is not MISSING:
+            return cached
+
+        try:
+            wallet_info = await self._single_flight.do(
+                ("wallet", wallet_id), lambda: self._client.get_wallet(wallet_id)
+            )
+        except Exception as e:
+            if "not found" in str(e).lower() or "404" in str(e):
+                self._wallet_cache.set_negative(wallet_id)
+            raise
+        self._wallet_cache.set(wallet_id, wallet_info)
+        return wallet_info
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Snapshot of in-process cache and pool counters."""
+        metrics = {
+            "wallet_cache": self._wallet_cache.stats(),
+            "balance_cache": self._balance_cache.stats(),
+            "single_flight": self._single_flight.stats()
+        }
+        if self._wallet_pool:
+            metrics["wallet_pool"] = self._wallet_pool.stats()
+        metrics["intent_index"] = self.intent_index.stats()
+        metrics["reservations"] = self.reservations.stats()
+        metrics["intent_sweeper"] = self._intent_sweeper.stats()
+        metrics["guard_store"] = self._guard_store.stats()
+        metrics["guard_reconciler"] = self._guard_reconciler.stats()
+        return metrics
+
+    async def start_background_tasks(self) -> None:
+        """Starts background work owned by the client (wallet pool refill, guard reconciliation, intent expiry)."""
+        if self._wallet_pool:
+            self._wallet_pool.schedule_refill()
+        if settings.OMNIAGENTPAY_GUARD_RECONCILE_ENABLED:
+            self._guard_reconciler.start()
+        self._intent_sweeper.start()
+
+    async def stop_background_tasks(self) -> None:
+        if self._wallet_pool:
+            await self._wallet_pool.stop()
+        await self._guard_reconciler.stop()
+        await self._intent_sweeper.stop()
+
+    def start_guard_reconciliation(self, restart: bool = False) -> Dict[str, Any]:
+        """Starts a fleet-wide guard reconciliation pass unless one is running; returns its progress."""
+        started = self._guard_reconciler.start(restart=restart)
+        return {"started": started, **self._guard_reconciler.stats()}
+
+    def get_guard_reconciliation_status(self) -> Dict[str, Any]:
+        return self._guard_reconciler.stats()
+
+    async def _list_managed_wallet_ids(self) -> List[str]:
+        wallets = await self._client.list_wallets()
+        return [wallet.id for wallet in wallets]
+
+    def invalidate_balance(self, wallet_id: str) -> bool:
+        """Drop the cached balance for a wallet (e.g. after a transfer event)."""
+        return self._balance_cache.invalidate(wallet_id)
+
     async def create_agent_wallet(self, agent_name: str) -> Dict[str, Any]:
         """Creates a wallet and automatically applies all configured guard policies."""
+        if self._wallet_pool:
+            pooled = self._wallet_pool.claim(agent_name)
+            if pooled:
+                return pooled
+        return await self._provision_guarded_wallet(agent_name)
+
+    async def _provision_guarded_wallet(self, agent_name: str) -> Dict[str, Any]:
+        """Creates a wallet upstream and attaches the default guards."""
         logger.info("creating_guarded_wallet", agent=agent_name)
         
         # 1. Create wallet
         wallet = await self._client.create_wallet(name=agent_name)
         wallet_id = wallet.id # Fix: SDK uses .id
+        self._wallet_cache.set(wallet_id, wallet)
 
-        # 2. Attach security guards using SDK methods
-        await self._client.add_budget_guard(
-            wallet_id=wallet_id,
-            daily_limit=settings.OMNIAGENTPAY_DAILY_BUDGET,
-            hourly_limit=settings.OMNIAGENTPAY_HOURLY_BUDGET
-        )
-        await self._client.add_rate_limit_guard(
-            wallet_id=wallet_id,
-            max_per_minute=settings.OMNIAGENTPAY_RATE_LIMIT_PER_MIN
-        )
-        await self._client.add_single_tx_guard(
-            wallet_id=wallet_id,
-            max_amount=settings.OMNIAGENTPAY_TX_LIMIT
-        )
-        # Only add recipient guard if whitelist is not empty
-        # Empty whitelist would block all payments
-        if settings.OMNIAGENTPAY_WHITELISTED_RECIPIENTS:
-            await self._client.add_recipient_guard(
-                wallet_id=wallet_id,
-                addresses=settings.OMNIAGENTPAY_WHITELISTED_RECIPIENTS
-            )
+        # 2. Attach security guards (all in one write to the guard store)
+        try:
+            await self._attach_default_guards(wallet_id)
+        except Exception as e:
+            raise Exception(
+                f"Wallet {wallet_id} was created but is not guarded: {str(e)}. "
+                f"Retry guard attachment with 'add_default_guards' before using it."
+            ) from e
 
         return {
             "wallet_id": wallet_id,
@@ -75,40 +212,129 @@ class OmniAgentPaymentClient(AbstractPaymentClient):
             "status": wallet.state
         }
 
-    async def add_default_guards(self, wallet_id: str) -> Dict[str, Any]:
-        """Helper to re-apply default guards if needed."""
-        # Attach security guards using SDK methods
-        await self._client.add_budget_guard(
-            wallet_id=wallet_id,
-            daily_limit=settings.OMNIAGENTPAY_DAILY_BUDGET,
-            hourly_limit=settings.OMNIAGENTPAY_HOURLY_BUDGET
-        )
-        await self._client.add_rate_limit_guard(
-            wallet_id=wallet_id,
-            max_per_minute=settings.OMNIAGENTPAY_RATE_LIMIT_PER_MIN
-        )
-        await self._client.add_single_tx_guard(
-            wallet_id=wallet_id,
-            max_amount=settings.OMNIAGENTPAY_TX_LIMIT
-        )
-        # Only add recipient guard if whitelist is not empty
-        if settings.OMNIAGENTPAY_WHITELISTED_RECIPIENTS:
-            await self._client.add_recipient_guard(
-                wallet_id=wallet_id,
-                addresses=settings.OMNIAGENTPAY_WHITELISTED_RECIPIENTS
+    async def create_agent_wallets_batch(
+        self,
+        agent_names: List[str],
+        concurrency: Optional[int] = None,
+        on_result: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None
+    ) -> Dict[str, Any]:
+        """
+        Provisions guarded wallets for many agents with bounded concurrency.
+        Each item succeeds or fails independently; results keep input order and
+        are also passed to on_result as soon as each one completes.
+        """
+        if not agent_names:
+            raise ValueError("agent_names must not be empty")
+        if len(agent_names) > settings.OMNIAGENTPAY_BATCH_MAX_ITEMS:
+            raise ValueError(
+                f"Batch too large: {len(agent_names)} items, maximum is {settings.OMNIAGENTPAY_BATCH_MAX_ITEMS}"
             )
-        return {"status": "guards_applied", "wallet_id": wallet_id}
+        limit = max(1, concurrency or settings.OMNIAGENTPAY_BATCH_CONCURRENCY)
+        semaphore = asyncio.Semaphore(limit)
+        logger.info("creating_guarded_wallets_batch", count=len(agent_names), concurrency=limit)
+
+        async def provision(index: int, agent_name: str) -> Dict[str, Any]:
+            async with semaphore:
+                try:
+                    wallet = await self.create_agent_wallet(agent_name)
+                    item = {"index": index, "agent_name": agent_name, "status": "success", "wallet": wallet}
+                except Exception as e:
+                    logger.error("batch_wallet_creation_failed", agent=agent_name, error=str(e))
+                    item = {"index": index, "agent_name": agent_name, "status": "error", "message": str(e)}
+            if on_result:
+                await on_result(item)
+            return item
+
+        results = await asyncio.gather(*(provision(i, name) for i, name in enumerate(agent_names)))
+        succeeded = sum(1 for item in results if item["status"] == "success")
+        return {
+            "total": len(results),
+            "succeeded": succeeded,
+            "failed": len(results) - succeeded,
+            "results": list(results)
+        }
+
+    async def add_default_guards(self, wallet_id: str) -> Dict[str, Any]:
+        """Brings a wallet's guards in line with the default policy, changing only what differs."""
+        diff = await self.reconcile_guards(wallet_id)
+        return {
+            "status": "guards_applied",
+            "wallet_id": wallet_id,
+            "guards": list(self._default_policy().desired()),
+            "changed": diff.changed,
+            **diff.summary()
+        }
+
+    def _default_policy(self) -> GuardPolicy:
+        return self._guard_engine.snapshot.policy
+
+    async def reconcile_guards(self, wallet_id: str, policy: Optional[GuardPolicy] = None):
+        """
+        Diffs the wallet's stored guards against the policy and writes the
+        result back in a single update, only when something actually differs.
+        Guards the policy does not manage are left untouched.
+        """
+        desired = (policy or self._default_policy()).desired()
+        diffs = []
+
+        def mutate(current: List[Dict[str, Any]]) -> Optional[List[Dict[str, Any]]]:
+            # May run more than once if another instance wrote concurrently
+            diffs.append(diff_guards(current, desired))
+            return apply_diff(current, diffs[-1]) if diffs[-1].changed else None
+
+        configs = await self._guard_store.update(wallet_id, mutate)
+        # Keep the local pre-check in step with the whitelist the SDK now enforces
+        self._guard_engine.set_wallet_whitelist(wallet_id, self._recipient_whitelist(configs))
+        logger.info("guards_reconciled", wallet_id=wallet_id, **diffs[-1].summary())
+        return diffs[-1]
+
+    async def _stored_wallet_whitelist(self, wallet_id: str) -> Optional[List[str]]:
+        """The recipient whitelist the SDK enforces for a wallet, or None if it enforces none."""
+        return self._recipient_whitelist(await self._guard_store.load(wallet_id))
+
+    @staticmethod
+    def _recipient_whitelist(configs: List[Dict[str, Any]]) -> Optional[List[str]]:
+        recipient = next((c for c in configs if c.get("name") == "recipient"), None)
+        if recipient is None or recipient.get("recipient_mode", "whitelist") != "whitelist":
+            return None
+        return list(recipient.get("recipient_addresses", []))
+
+    async def _attach_default_guards(self, wallet_id: str) -> List[str]:
+        """
+        Attaches the configured guards with a single write to the guard store,
+        so a failure leaves the wallet with none of them rather than a subset.
+        """
+        diff = await self.reconcile_guards(wallet_id)
+        return [config["name"] for config in diff.added + diff.replaced] + diff.unchanged
 
     async def simulate_payment(
         self, 
         from_wallet_id: str, 
         to_address: str, 
         amount: str, 
-        currency: str = "USD"
+        currency: str = "USD",
+        include_queueable: bool = True,
+        hold: Optional[str] = None
     ) -> Dict[str, Any]:
+        # Obvious guard violations are answered locally without touching the SDK.
+        # Callers that already hold a rate-limit token (wallet lanes) skip the queueable guards,
+        # and callers holding shared budget pass their hold so it is not counted against itself.
+        try:
+            await self._guard_engine.check(
+                to_micros(amount), from_wallet_id, to_address, include_queueable=include_queueable, hold=hold
+            )
+        except GuardValidationError as e:
+            return {
+                "status": "success",
+                "validation_passed": False,
+                "estimated_fee": "0",
+                "reason": e.detail,
+                "checked_locally": True
+            }
+
         # Ensure wallet exists - router needs it for network detection
         try:
-            wallet_info = await self._client.get_wallet(from_wallet_id)
+            wallet_info = await self.get_wallet_info(from_wallet_id)
             logger.info("wallet_found", 
                        wallet_id=from_wallet_id, 
                        blockchain=wallet_info.blockchain,
@@ -127,27 +353,138 @@ class OmniAgentPaymentClient(AbstractPaymentClient):
             amount=amount,
             currency=currency
         )
+        return self._simulation(from_wallet_id, to_address, amount, currency, result)
+
+    @staticmethod
+    def _simulation(from_wallet_id: str, to_address: str, amount: str, currency: str, result: Any) -> Dict[str, Any]:
         # Fix: Use correct attributes for SimulationResult
-        return {
+        simulation = {
             "status": "success",
             "validation_passed": result.would_succeed,
             "estimated_fee": str(result.estimated_fee) if result.estimated_fee else "0",
             "reason": result.reason if not result.would_succeed else None
         }
+        if result.would_succeed:
+            # Lets pay_recipient skip re-simulating this exact payment for a short while
+            simulation["simulation_token"] = create_simulation_token(from_wallet_id, to_address, amount, currency)
+            simulation["simulation_token_expires_in"] = settings.OMNIAGENTPAY_SIMULATION_TOKEN_TTL_SECONDS
+        return simulation
+
+    async def simulate_payments(self, payments: List[Dict[str, Any]], concurrency: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Simulates many candidate payments at once. Local guard pre-checks run
+        in a single pass over the whole batch, each distinct source wallet is
+        resolved once, and only payments that pass go to the SDK, concurrently.
+        Results keep input order; each item is judged on its own, as
+        simulate_payment would judge it.
+        """
+        if not payments:
+            raise ValueError("payments must not be empty")
+        if len(payments) > settings.OMNIAGENTPAY_BATCH_MAX_ITEMS:
+            raise ValueError(
+                f"Batch too large: {len(payments)} items, maximum is {settings.OMNIAGENTPAY_BATCH_MAX_ITEMS}"
+            )
+        limit = max(1, concurrency or settings.OMNIAGENTPAY_BATCH_CONCURRENCY)
+        semaphore = asyncio.Semaphore(limit)
+        results: List[Optional[Dict[str, Any]]] = [None] * len(payments)
+
+        # 1. Parse, then pre-check every well-formed payment against the local guards
+        checks: List[int] = []
+        amounts: Dict[int, Micros] = {}
+        for index, item in enumerate(payments):
+            try:
+                amount = to_micros(item["amount"])
+                if not item.get("from_wallet_id") or not item.get("to_address"):
+                    raise ValueError("from_wallet_id and to_address are required")
+            except (KeyError, TypeError, ValueError) as e:
+                results[index] = {"index": index, "status": "error", "message": f"Invalid input: {e}"}
+                continue
+            amounts[index] = amount
+            checks.append(index)
+        reasons = await self._guard_engine.check_many(
+            [(amounts[i], payments[i]["from_wallet_id"], payments[i]["to_address"]) for i in checks]
+        )
+        survivors: List[int] = []
+        for index, reason in zip(checks, reasons):
+            if reason is None:
+                survivors.append(index)
+            else:
+                results[index] = {
+                    "index": index,
+                    "status": "success",
+                    "validation_passed": False,
+                    "estimated_fee": "0",
+                    "reason": reason,
+                    "checked_locally": True
+                }
+
+        # 2. Resolve each distinct source wallet once
+        wallet_ids = list(dict.fromkeys(payments[i]["from_wallet_id"] for i in survivors))
+
+        async def resolve(wallet_id: str) -> Optional[Exception]:
+            async with semaphore:
+                try:
+                    await self.get_wallet_info(wallet_id)
+                    return None
+                except Exception as e:
+                    return e
+
+        lookups = dict(zip(wallet_ids, await asyncio.gather(*(resolve(w) for w in wallet_ids))))
+
+        # 3. Simulate the survivors concurrently
+        async def simulate(index: int) -> None:
+            item = payments[index]
+            wallet_id, to_address = item["from_wallet_id"], item["to_address"]
+            amount, currency = str(item["amount"]), item.get("currency", "USD")
+            if lookups[wallet_id] is not None:
+                results[index] = {
+                    "index": index,
+                    "status": "error",
+                    "message": f"Wallet not found: {wallet_id}. Please verify the wallet_id is correct."
+                }
+                return
+            async with semaphore:
+                try:
+                    result = await self._client.simulate(
+                        wallet_id=wallet_id, recipient=to_address, amount=amount, currency=currency
+                    )
+                    results[index] = {"index": index, **self._simulation(wallet_id, to_address, amount, currency, result)}
+                except Exception as e:
+                    logger.error("batch_simulation_failed", index=index, wallet_id=wallet_id, error=str(e))
+                    results[index] = {"index": index, "status": "error", "message": str(e)}
+
+        logger.info(
+            "simulating_payments_batch",
+            count=len(payments), survivors=len(survivors), wallets=len(wallet_ids), concurrency=limit
+        )
+        await asyncio.gather(*(simulate(index) for index in survivors))
+
+        passed = sum(1 for item in results if item.get("validation_passed"))
+        failed = sum(1 for item in results if item["status"] == "error")
+        return {
+            "total": len(results),
+            "passed": passed,
+            "rejected": len(results) - passed - failed,
+            "failed": failed,
+            "results": results
+        }
 
     async def execute_payment(
         self, 
         from_wallet_id: str, 
         to_address: str, 
         amount: str, 
-        currency: str = "USD"
+        currency: str = "USD",
+        idempotency_key: Optional[str] = None
     ) -> Dict[str, Any]:
         result = await self._client.pay(
             wallet_id=from_wallet_id,
             recipient=to_address,
             amount=amount,
-            currency=currency
+            currency=currency,
+            idempotency_key=idempotency_key
         )
+        self.invalidate_balance(from_wallet_id)
         # Fix: Use correct attributes for PaymentResult
         return {
             "transfer_id": result.transaction_id,
@@ -164,24 +501,22 @@ class OmniAgentPaymentClient(AbstractPaymentClient):
         currency: str = "USD", 
         metadata: Optional[Dict[str, Any]] = None
     ) -> Dict[str, Any]:
-        # Pre-check balance before creating intent for faster failure and clearer errors
+        # Reject malformed amounts before anything is checked or reserved
         try:
-            balance_info = await self.get_wallet_usdc_balance(wallet_id)
-            balance = Decimal(balance_info.get('usdc_balance', '0'))
-            amount_decimal = Decimal(str(amount))
-            
-            if balance < amount_decimal:
-                raise Exception(
-                    f"Insufficient balance: Wallet has {balance} USDC, but {amount_decimal} USDC is required. "
-                    f"Please fund the wallet before creating payment intents."
-                )
-        except Exception as balance_error:
-            # If it's already a balance error, re-raise it
-            error_msg = str(balance_error).lower()
-            if "insufficient" in error_msg or "no usdc" in error_msg or "balance" in error_msg:
-                raise balance_error
-            # If balance check itself failed, log but continue (simulation will catch it)
-            logger.warning("balance_precheck_failed", error=str(balance_error))
+            required = to_micros(amount)
+        except ValueError as e:
+            raise ValueError(f"Amount must be a valid numeric string ({e})") from e
+        if required <= 0:
+            raise ValueError("Amount must be positive")
+
+        # An intent must pass the same local guards as a direct payment; they run again at confirm
+        await self._guard_engine.check(required, wallet_id, recipient)
+
+        # Balance reservation and wallet lookup are independent, run them together
+        reservation, _ = await asyncio.gather(
+            self._reserve_balance(wallet_id, required),
+            self._lookup_wallet_for_diagnostics(wallet_id)
+        )
         
         # Extract purpose and exclude it from kwargs to avoid duplicate argument
         purpose = None
@@ -191,13 +526,6 @@ class OmniAgentPaymentClient(AbstractPaymentClient):
             kwargs = {k: v for k, v in metadata.items() if k != "purpose"}
         
         try:
-            # Verify wallet exists and get its network for better error messages
-            try:
-                wallet_info = await self._client.wallet.get_wallet(wallet_id)
-                logger.debug("wallet_info", wallet_id=wallet_id, blockchain=wallet_info.blockchain if wallet_info else None)
-            except Exception as wallet_err:
-                logger.warning("wallet_lookup_failed", wallet_id=wallet_id, error=str(wallet_err))
-            
             result = await self._client.create_payment_intent(
                 wallet_id=wallet_id,
                 recipient=recipient,
@@ -205,6 +533,13 @@ class OmniAgentPaymentClient(AbstractPaymentClient):
                 purpose=purpose,
                 **kwargs
             )
+            self.intent_index.add(
+                result.id, wallet_id, recipient, str(result.amount), _status_value(result.status)
+            )
+            expires_at = _intent_expiry(result) or time.time() + settings.OMNIAGENTPAY_INTENT_TTL_SECONDS
+            if reservation:
+                self.reservations.rekey(reservation, result.id, expires_at=expires_at)
+            self._intent_sweeper.track(result.id, expires_at)
             # Fix: Use correct attributes for PaymentIntent
             return {
                 "intent_id": result.id,
@@ -212,6 +547,8 @@ class OmniAgentPaymentClient(AbstractPaymentClient):
                 "amount": str(result.amount)
             }
         except Exception as e:
+            if reservation:
+                self.reservations.release(reservation)
             error_msg = str(e)
             logger.error("create_payment_intent_error", 
                         wallet_id=wallet_id, 
@@ -240,48 +577,291 @@ class OmniAgentPaymentClient(AbstractPaymentClient):
                     ) from e
             raise
 
+    async def _reserve_balance(self, wallet_id: str, required: Micros) -> Optional[str]:
+        """
+        Reserves the intent amount against the cached balance minus what other
+        outstanding intents already hold, failing fast when it does not fit.
+        Returns the placeholder reservation key, or None if the balance could
+        not be fetched (the SDK will then catch a shortfall itself).
+        """
+        try:
+            balance_info = await self.get_wallet_usdc_balance(wallet_id)
+        except Exception as balance_error:
+            # If it's already a balance error, re-raise it
+            error_msg = str(balance_error).lower()
+            if "insufficient" in error_msg or "no usdc" in error_msg or "balance" in error_msg:
+                raise balance_error
+            # If balance check itself failed, log but continue (simulation will catch it)
+            logger.warning("balance_precheck_failed", error=str(balance_error))
+            return None
+        balance = to_micros(balance_info.get('usdc_balance', '0'))
+
+        key = f"pending:{uuid.uuid4()}"
+        expires_at = time.time() + settings.OMNIAGENTPAY_INTENT_TTL_SECONDS
+        if not self.reservations.try_reserve(key, wallet_id, required, balance, expires_at=expires_at):
+            reserved = self.reservations.reserved(wallet_id)
+            detail = f", of which {format_micros(reserved)} USDC is reserved by outstanding payment intents" if reserved else ""
+            raise Exception(
+                f"Insufficient balance: Wallet has {format_micros(balance)} USDC{detail}, but {format_micros(required)} USDC is required. "
+                f"Please fund the wallet before creating payment intents."
+            )
+        return key
+
+    async def _lookup_wallet_for_diagnostics(self, wallet_id: str) -> Optional[Any]:
+        """Verify wallet exists and get its network for better error messages."""
+        try:
+            wallet_info = await self.get_wallet_info(wallet_id)
+            logger.debug("wallet_info", wallet_id=wallet_id, blockchain=wallet_info.blockchain if wallet_info else None)
+            return wallet_info
+        except Exception as wallet_err:
+            logger.warning("wallet_lookup_failed", wallet_id=wallet_id, error=str(wallet_err))
+            return None
+
     async def confirm_intent(self, intent_id: str) -> Dict[str, Any]:
         try:
+            await self._check_intent_guards(intent_id)
             result = await self._client.confirm_payment_intent(intent_id=intent_id)
-            # Return comprehensive payment result
-            return {
-                "intent_id": intent_id,
-                "status": result.status,
-                "success": result.success,
-                "transaction_id": result.transaction_id,
-                "blockchain_tx": result.blockchain_tx,
-                "amount": str(result.amount),
-                "recipient": result.recipient,
-                "message": "Payment executed successfully" if result.success else f"Payment execution failed: {result.error or 'Unknown error'}"
-            }
+            return await self._confirmed(intent_id, result)
+        except GuardValidationError:
+            raise
         except Exception as e:
-            error_msg = str(e)
-            # Provide helpful error messages
-            if "no USDC balance" in error_msg.lower() or "balance check failed" in error_msg.lower() or "insufficient balance" in error_msg.lower():
-                # Try to get intent details for better error message
-                try:
-                    intent = await self._client.get_payment_intent(intent_id)
-                    if intent:
-                        balance_info = await self.get_wallet_usdc_balance(intent.wallet_id)
-                        balance = balance_info.get('usdc_balance', '0')
-                        raise Exception(
-                            f"Payment confirmation failed: Wallet has insufficient USDC balance. "
-                            f"Required: {intent.amount} USDC, Current balance: {balance} USDC. "
-                            f"Please fund the wallet before confirming the payment intent."
-                        ) from e
-                except Exception:
-                    pass
-            
-            if "not found" in error_msg.lower():
-                raise Exception(f"Payment intent not found: {intent_id}. Please check the intent_id and try again.") from e
-            
-            if "cannot be confirmed" in error_msg.lower() or "status" in error_msg.lower():
-                raise Exception(f"Cannot confirm payment intent: {error_msg}. The intent may have already been confirmed or cancelled.") from e
-            
+            _, message = await self._classify_confirm_error(intent_id, e)
+            if message:
+                raise Exception(message) from e
             raise
+        finally:
+            self._guard_engine.release(intent_id)
+
+    async def _check_intent_guards(self, intent_id: str) -> None:
+        """
+        Re-runs the local guards for an intent about to be confirmed, since spend
+        may have moved since it was created. Shared budget is held under the
+        intent ID until the caller releases it after the confirm.
+        """
+        record = self.intent_index.get(intent_id)
+        if record:
+            wallet_id, recipient, amount = record["wallet_id"], record["recipient"], record["amount"]
+        else:
+            intent = await self.get_payment_intent(intent_id)
+            if not intent:
+                # Nothing to check; the confirm itself reports the missing intent
+                return
+            wallet_id, recipient, amount = intent.wallet_id, intent.recipient, str(intent.amount)
+        await self._guard_engine.check(to_micros(amount), wallet_id, recipient, hold=intent_id)
+
+    async def _confirmed(self, intent_id: str, result: Any) -> Dict[str, Any]:
+        """Records a confirm outcome locally and returns the comprehensive payment result."""
+        self.settle_intent("succeeded" if result.success else "failed", intent_id=intent_id, transaction_id=result.transaction_id)
+        if result.success:
+            await self._record_confirmed_spend(intent_id, result)
+        return {
+            "intent_id": intent_id,
+            "status": result.status,
+            "success": result.success,
+            "transaction_id": result.transaction_id,
+            "blockchain_tx": result.blockchain_tx,
+            "amount": str(result.amount),
+            "recipient": result.recipient,
+            "message": "Payment executed successfully" if result.success else f"Payment execution failed: {result.error or 'Unknown error'}"
+        }
+
+    async def _classify_confirm_error(self, intent_id: str, error: Exception) -> Tuple[str, Optional[str]]:
+        """
+        Maps a confirm failure to (error_type, helpful message). The message is
+        None when there is nothing to add and the original error should stand.
+        """
+        error_msg = str(error).lower()
+        if "no usdc balance" in error_msg or "balance check failed" in error_msg or "insufficient balance" in error_msg:
+            message = await self._insufficient_balance_message(intent_id)
+            if message:
+                return "insufficient_balance", message
+
+        if "not found" in error_msg:
+            # Nothing left to confirm, so nothing left to hold balance for
+            self.reservations.release(intent_id)
+            return "not_found", f"Payment intent not found: {intent_id}. Please check the intent_id and try again."
 
-    async def get_wallet_usdc_balance(self, wallet_id: str) -> Dict[str, Any]:
-        """Get the actual Circle wallet USDC balance."""
+        if "cannot be confirmed" in error_msg or "status" in error_msg:
+            self.reservations.release(intent_id)
+            return "invalid_state", (
+                f"Cannot confirm payment intent: {error}. The intent may have already been confirmed or cancelled."
+            )
+
+        return "internal_error", None
+
+    async def confirm_intents_batch(self, intent_ids: List[str], concurrency: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Confirms many payment intents with partial-failure semantics. Intents
+        from the same source wallet are confirmed in input order, one at a
+        time; different wallets run in parallel under a global concurrency cap.
+        The source wallet comes from the local intent index, falling back to an
+        SDK lookup for intents created elsewhere.
+        """
+        if not intent_ids:
+            raise ValueError("intent_ids must not be empty")
+        if len(intent_ids) > settings.OMNIAGENTPAY_BATCH_MAX_ITEMS:
+            raise ValueError(
+                f"Batch too large: {len(intent_ids)} items, maximum is {settings.OMNIAGENTPAY_BATCH_MAX_ITEMS}"
+            )
+        limit = max(1, concurrency or settings.OMNIAGENTPAY_BATCH_CONCURRENCY)
+        semaphore = asyncio.Semaphore(limit)
+
+        async def source_wallet(intent_id: str) -> Optional[str]:
+            record = self.intent_index.get(intent_id)
+            if record:
+                return record["wallet_id"]
+            async with semaphore:
+                intent = await self.get_payment_intent(intent_id)
+            return intent.wallet_id if intent else None
+
+        wallets = await asyncio.gather(*(source_wallet(i) for i in intent_ids), return_exceptions=True)
+        chains: Dict[Any, List[int]] = {}
+        for index, wallet_id in enumerate(wallets):
+            # An intent whose wallet cannot be resolved runs on its own; its confirm reports why
+            key = wallet_id if isinstance(wallet_id, str) else ("unresolved", index)
+            chains.setdefault(key, []).append(index)
+
+        results: List[Optional[Dict[str, Any]]] = [None] * len(intent_ids)
+        logger.info("confirming_intents_batch", count=len(intent_ids), wallets=len(chains), concurrency=limit)
+
+        async def run_wallet(indexes: List[int]) -> None:
+            for index in indexes:
+                async with semaphore:
+                    results[index] = await self._confirm_batch_item(index, intent_ids[index])
+
+        await asyncio.gather(*(run_wallet(indexes) for indexes in chains.values()))
+
+        succeeded = sum(1 for item in results if item["status"] == "success")
+        return {
+            "total": len(results),
+            "succeeded": succeeded,
+            "failed": len(results) - succeeded,
+            "results": results
+        }
+
+    async def _confirm_batch_item(self, index: int, intent_id: str) -> Dict[str, Any]:
+        item: Dict[str, Any] = {"index": index, "intent_id": intent_id}
+        try:
+            await self._check_intent_guards(intent_id)
+            result = await self._client.confirm_payment_intent(intent_id=intent_id)
+            payment = await self._confirmed(intent_id, result)
+        except GuardValidationError as e:
+            return {**item, "status": "error", "error_type": "guard_violation", "message": e.detail}
+        except Exception as e:
+            error_type, message = await self._classify_confirm_error(intent_id, e)
+            if error_type == "internal_error":
+                logger.error("batch_confirm_item_failed", intent_id=intent_id, error=str(e))
+            return {**item, "status": "error", "error_type": error_type, "message": message or str(e)}
+        finally:
+            self._guard_engine.release(intent_id)
+
+        if not result.success:
+            return {**item, "status": "error", "error_type": "payment_failed", "message": payment["message"], "payment": payment}
+        return {**item, "status": "success", "payment": payment}
+
+    async def _insufficient_balance_message(self, intent_id: str) -> Optional[str]:
+        """
+        Explains a failed confirm using the local intent index and the cached
+        balance; only intents unknown to this server are looked up remotely.
+        """
+        record = self.intent_index.get(intent_id)
+        try:
+            if record:
+                wallet_id, required = record["wallet_id"], record["amount"]
+                cached = self._balance_cache.get(wallet_id)
+                balance = cached.get("usdc_balance") if cached is not MISSING else None
+            else:
+                intent = await self.get_payment_intent(intent_id)
+                if not intent:
+                    return None
+                wallet_id, required = intent.wallet_id, intent.amount
+                balance = (await self.get_wallet_usdc_balance(wallet_id)).get("usdc_balance", "0")
+        except Exception:
+            return None
+        current = f"Current balance: {balance} USDC. " if balance is not None else ""
+        return (
+            f"Payment confirmation failed: Wallet has insufficient USDC balance. "
+            f"Required: {required} USDC, {current}"
+            f"Please fund the wallet before confirming the payment intent."
+        )
+
+    async def _record_confirmed_spend(self, intent_id: str, result: Any) -> None:
+        """Feeds a confirmed intent's spend to the local guard ledger (best effort)."""
+        try:
+            record = self.intent_index.get(intent_id)
+            wallet_id = record["wallet_id"] if record else (await self.get_payment_intent(intent_id)).wallet_id
+            self._guard_engine.record(to_micros(result.amount), wallet_id, ref=result.transaction_id)
+            self.invalidate_balance(wallet_id)
+        except Exception as e:
+            logger.warning("confirmed_spend_not_recorded", intent_id=intent_id, error=str(e))
+
+    def settle_intent(
+        self,
+        status: str,
+        intent_id: Optional[str] = None,
+        transaction_id: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Applies an intent outcome (from a confirm or a webhook, by intent or
+        transaction ID) to the intent index and frees the intent's balance
+        reservation once the status is final.
+        """
+        if intent_id:
+            record = self.intent_index.update(intent_id, status, transaction_id=transaction_id)
+        else:
+            record = self.intent_index.update_by_transaction(transaction_id, status) if transaction_id else None
+            intent_id = record["intent_id"] if record else None
+        if intent_id and status in TERMINAL_STATUSES:
+            self.reservations.release(intent_id)
+            self._intent_sweeper.untrack(intent_id)
+        return record
+
+    async def _expire_intents(self, intent_ids: List[str]) -> List[str]:
+        """
+        Cancels a batch of stale intents with the SDK and frees their
+        reservation and index entries. Returns the IDs to retry later.
+        """
+        results = await asyncio.gather(
+            *(self._client.cancel_payment_intent(intent_id) for intent_id in intent_ids),
+            return_exceptions=True
+        )
+        retry: List[str] = []
+        for intent_id, result in zip(intent_ids, results):
+            if isinstance(result, Exception):
+                error_msg = str(result).lower()
+                if "cannot cancel" in error_msg:
+                    # Already being confirmed; its outcome settles the intent
+                    continue
+                if "not found" not in error_msg:
+                    logger.warning("intent_cancel_failed", intent_id=intent_id, error=str(result))
+                    retry.append(intent_id)
+                    continue
+            self.reservations.release(intent_id)
+            self.intent_index.remove(intent_id)
+        return retry
+
+    def list_payment_intents(
+        self,
+        wallet_id: Optional[str] = None,
+        status: Optional[str] = None,
+        cursor: Optional[str] = None,
+        limit: int = 50
+    ) -> Dict[str, Any]:
+        """Pages through intents created via this server, newest first (local index, no SDK calls)."""
+        return self.intent_index.list(wallet_id=wallet_id, status=status, cursor=cursor, limit=limit)
+
+    async def get_wallet_usdc_balance(self, wallet_id: str, fresh: bool = False) -> Dict[str, Any]:
+        """Get the actual Circle wallet USDC balance. Pass fresh=True to bypass the balance cache."""
+        if not fresh:
+            cached = self._balance_cache.get(wallet_id)
+            if cached is not MISSING:
+                return dict(cached)
+
+        result = await self._single_flight.do(("balance", wallet_id), lambda: self._fetch_balance(wallet_id))
+        self._balance_cache.set(wallet_id, result)
+        return dict(result)
+
+    async def _fetch_balance(self, wallet_id: str) -> Dict[str, Any]:
         try:
             balance = await self._client.get_balance(wallet_id)
             return {
@@ -301,11 +881,25 @@ class OmniAgentPaymentClient(AbstractPaymentClient):
                 }
             raise
 
+    async def get_payment_intent(self, intent_id: str) -> Any:
+        """Look up a payment intent; concurrent lookups of the same intent are coalesced."""
+        return await self._single_flight.do(
+            ("intent", intent_id), lambda: self._client.get_payment_intent(intent_id)
+        )
+
     async def remove_recipient_guard(self, wallet_id: str) -> Dict[str, Any]:
         """Remove the recipient guard from a wallet to allow payments to any address."""
         try:
-            # Remove guard by name "recipient"
-            removed = await self._client._guard_manager.remove_guard(wallet_id, "recipient")
+            removed = False
+
+            def drop_recipient(current: List[Dict[str, Any]]) -> Optional[List[Dict[str, Any]]]:
+                nonlocal removed
+                remaining = [c for c in current if c.get("name") != "recipient"]
+                removed = len(remaining) < len(current)
+                return remaining if removed else None
+
+            await self._guard_store.update(wallet_id, drop_recipient)
+            self._guard_engine.set_wallet_whitelist(wallet_id, None)
             if removed:
                 return {"status": "success", "message": "Recipient guard removed. Wallet can now pay to any address."}
             else:
@@ -314,26 +908,32 @@ class OmniAgentPaymentClient(AbstractPaymentClient):
             raise Exception(f"Failed to remove recipient guard: {str(e)}") from e
 
     async def add_recipient_to_whitelist(self, wallet_id: str, addresses: List[str]) -> Dict[str, Any]:
-        """Add recipient addresses to the whitelist. Removes and re-adds the guard with updated addresses."""
+        """Add recipient addresses to the wallet's whitelist; existing entries are kept."""
         try:
-            # Get current guards to check if recipient guard exists
-            guard_names = await self._client.list_guards(wallet_id)
-            
-            # Remove existing recipient guard if it exists
-            if "recipient" in guard_names:
-                await self._client._guard_manager.remove_guard(wallet_id, "recipient")
-            
-            # Add recipient guard with new addresses
-            await self._client.add_recipient_guard(
-                wallet_id=wallet_id,
-                mode="whitelist",
-                addresses=addresses
-            )
-            
+            added: List[str] = []
+
+            def extend_whitelist(current: List[Dict[str, Any]]) -> Optional[List[Dict[str, Any]]]:
+                nonlocal added
+                index = next((i for i, c in enumerate(current) if c.get("name") == "recipient"), None)
+                existing = current[index] if index is not None else None
+                updated = add_addresses(existing, addresses)
+                before = len(existing.get("recipient_addresses", [])) if existing else 0
+                added = updated["recipient_addresses"][before:]
+                if existing is None:
+                    return current + [updated]
+                if not added:
+                    return None
+                return current[:index] + [updated] + current[index + 1:]
+
+            configs = await self._guard_store.update(wallet_id, extend_whitelist)
+            whitelisted = next(c["recipient_addresses"] for c in configs if c.get("name") == "recipient")
+            self._guard_engine.set_wallet_whitelist(wallet_id, whitelisted)
+
             return {
                 "status": "success",
-                "message": f"Recipient guard updated. Whitelisted addresses: {addresses}",
-                "whitelisted_addresses": addresses
+                "message": f"Recipient guard updated. Added {len(added)} address(es): {added}",
+                "whitelisted_addresses": whitelisted,
+                "added_addresses": added
             }
         except Exception as e:
             raise Exception(f"Failed to update recipient whitelist: {str(e)}") from e
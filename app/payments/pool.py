@@ -0,0 +1,137 @@
+import asyncio
+import json
+import os
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import structlog
+
+logger = structlog.get_logger(__name__)
+
+class WalletPool:
+    """
+    Background-filled pool of already-created, already-guarded wallets.
+    Claiming is a purely local operation; the pool refills itself once its
+    depth drops to the low-water mark. The SDK has no wallet rename, so a
+    claimed wallet keeps its pool-* name upstream (Circle, list_wallets) and
+    agent_name is only attached to the returned record. Unclaimed wallets are persisted to a
+    local JSON file so they survive restarts.
+    """
+
+    def __init__(
+        self,
+        provision: Callable[[str], Awaitable[Dict[str, Any]]],
+        target_size: int,
+        low_water: int,
+        refill_concurrency: int,
+        state_path: Optional[str] = None
+    ):
+        self._provision = provision
+        self.target_size = target_size
+        self.low_water = low_water
+        self.refill_concurrency = max(1, refill_concurrency)
+        self.state_path = state_path
+        self._available: List[Dict[str, Any]] = []
+        self._refill_task: Optional[asyncio.Task] = None
+        self.claims = 0
+        self.empty_claims = 0
+        self.refilled = 0
+        self.refill_failures = 0
+        self.last_refill_seconds: Optional[float] = None
+        self._load()
+
+    @property
+    def depth(self) -> int:
+        return len(self._available)
+
+    def claim(self, agent_name: str) -> Optional[Dict[str, Any]]:
+        """Takes a pooled wallet for an agent, or returns None if the pool is empty. The upstream name is not changed."""
+        if not self._available:
+            self.empty_claims += 1
+            self.schedule_refill()
+            return None
+
+        wallet = self._available.pop(0)
+        self.claims += 1
+        self._save()
+        logger.info("wallet_pool_claimed", agent=agent_name, wallet_id=wallet["wallet_id"], depth=self.depth)
+        if self.depth <= self.low_water:
+            self.schedule_refill()
+        return {**wallet, "agent_name": agent_name}
+
+    def schedule_refill(self) -> None:
+        """Starts a background refill unless one is already running."""
+        if self._refill_task is None or self._refill_task.done():
+            self._refill_task = asyncio.create_task(self.refill())
+
+    async def refill(self) -> int:
+        """Provisions wallets until the pool reaches its target size."""
+        needed = self.target_size - self.depth
+        if needed <= 0:
+            return 0
+
+        started = time.monotonic()
+        semaphore = asyncio.Semaphore(self.refill_concurrency)
+        logger.info("wallet_pool_refill_started", needed=needed, depth=self.depth)
+
+        async def provision_one() -> bool:
+            async with semaphore:
+                try:
+                    wallet = await self._provision(f"pool-{uuid.uuid4().hex[:12]}")
+                except Exception as e:
+                    self.refill_failures += 1
+                    logger.error("wallet_pool_refill_failed", error=str(e))
+                    return False
+            self._available.append(wallet)
+            self.refilled += 1
+            self._save()
+            return True
+
+        results = await asyncio.gather(*(provision_one() for _ in range(needed)))
+        self.last_refill_seconds = round(time.monotonic() - started, 3)
+        added = sum(results)
+        logger.info("wallet_pool_refill_finished", added=added, depth=self.depth, seconds=self.last_refill_seconds)
+        return added
+
+    async def stop(self) -> None:
+        if self._refill_task and not self._refill_task.done():
+            self._refill_task.cancel()
+            try:
+                await self._refill_task
+            except asyncio.CancelledError:
+                pass
+        self._save()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "depth": self.depth,
+            "target_size": self.target_size,
+            "low_water": self.low_water,
+            "claims": self.claims,
+            "empty_claims": self.empty_claims,
+            "refilled": self.refilled,
+            "refill_failures": self.refill_failures,
+            "refilling": self._refill_task is not None and not self._refill_task.done(),
+            "last_refill_seconds": self.last_refill_seconds
+        }
+
+    def _load(self) -> None:
+        if not self.state_path or not os.path.exists(self.state_path):
+            return
+        try:
+            with open(self.state_path) as f:
+                self._available = json.load(f).get("available", [])
+            logger.info("wallet_pool_loaded", depth=self.depth, path=self.state_path)
+        except (OSError, ValueError) as e:
+            logger.error("wallet_pool_load_failed", path=self.state_path, error=str(e))
+
+    def _save(self) -> None:
+        if not self.state_path:
+            return
+        tmp_path = f"{self.state_path}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump({"available": self._available}, f)
+            os.replace(tmp_path, self.state_path)
+        except OSError as e:
+            logger.error("wallet_pool_save_failed", path=self.state_path, error=str(e))
@@ -0,0 +1,156 @@
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+import structlog
+from app.core.config import settings
+
+logger = structlog.get_logger(__name__)
+
+class RateLimitDecision(NamedTuple):
+    allowed: bool
+    remaining: float
+    retry_after: float
+
+class RateLimiter(ABC):
+    """
+    Per-key token buckets: `capacity` tokens, refilled continuously at
+    `capacity` per `period` seconds. A take either admits the request and
+    consumes tokens, or reports how long until enough tokens are available.
+    """
+
+    def __init__(self, capacity: int, period: float = 60.0):
+        self.capacity = capacity
+        self.period = period
+        self.rate = capacity / period
+        self.allowed = 0
+        self.denied = 0
+
+    def reconfigure(self, capacity: int) -> None:
+        """Changes the bucket size (and refill rate) in place; current levels are kept."""
+        self.capacity = capacity
+        self.rate = capacity / self.period
+
+    @abstractmethod
+    async def _take(self, key: str, tokens: int, consume: bool) -> RateLimitDecision:
+        pass
+
+    async def take(self, key: str, tokens: int = 1) -> RateLimitDecision:
+        """Consumes tokens if available."""
+        decision = await self._decide(key, tokens, True)
+        if decision.allowed:
+            self.allowed += 1
+        else:
+            self.denied += 1
+        return decision
+
+    async def peek(self, key: str, tokens: int = 1) -> RateLimitDecision:
+        """Reports whether a take would be admitted, without consuming anything."""
+        return await self._decide(key, tokens, False)
+
+    async def _decide(self, key: str, tokens: int, consume: bool) -> RateLimitDecision:
+        if self.rate <= 0:
+            # A limit of 0 means unlimited, as for OMNIAGENTPAY_RATE_LIMIT_PER_MIN; buckets would never refill
+            return RateLimitDecision(True, float("inf"), 0.0)
+        return await self._take(key, tokens, consume)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.backend,
+            "capacity": self.capacity,
+            "period_seconds": self.period,
+            "allowed": self.allowed,
+            "denied": self.denied
+        }
+
+class InMemoryRateLimiter(RateLimiter):
+    """Process-local buckets; each instance of the server enforces its own limit."""
+    backend = "memory"
+
+    def __init__(
+        self,
+        capacity: int,
+        period: float = 60.0,
+        max_keys: int = 100000,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        super().__init__(capacity, period)
+        self.max_keys = max_keys
+        self._clock = clock
+        # key -> [tokens, last refill time]
+        self._buckets: Dict[str, List[float]] = {}
+
+    async def _take(self, key: str, tokens: int, consume: bool) -> RateLimitDecision:
+        now = self._clock()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.max_keys:
+                self._evict_full(now)
+            bucket = self._buckets[key] = [float(self.capacity), now]
+        level = min(float(self.capacity), bucket[0] + (now - bucket[1]) * self.rate)
+        allowed = level >= tokens
+        if allowed and consume:
+            level -= tokens
+        bucket[0], bucket[1] = level, now
+        retry_after = 0.0 if allowed else (tokens - level) / self.rate
+        return RateLimitDecision(allowed, level, retry_after)
+
+    def _evict_full(self, now: float) -> None:
+        # A full bucket is indistinguishable from a missing one
+        for key in [k for k, (level, ts) in self._buckets.items()
+                    if level + (now - ts) * self.rate >= self.capacity]:
+            del self._buckets[key]
+
+# Refill, admission and write-back happen in one atomic script, so a single
+# round trip decides admission even with many server instances sharing a key.
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local consume = tonumber(ARGV[4])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = tokens >= requested
+if allowed and consume == 1 then
+    tokens = tokens - requested
+end
+local retry_after = 0
+if not allowed then
+    retry_after = (requested - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000))
+return {allowed and 1 or 0, tostring(tokens), tostring(retry_after)}
+"""
+
+class RedisRateLimiter(RateLimiter):
+    """Buckets shared by every server instance through a Redis-protocol store."""
+    backend = "redis"
+
+    def __init__(self, client: Any, capacity: int, period: float = 60.0, prefix: str = "omniagentpay:ratelimit:"):
+        super().__init__(capacity, period)
+        self.prefix = prefix
+        self._script = client.register_script(TOKEN_BUCKET_SCRIPT)
+
+    async def _take(self, key: str, tokens: int, consume: bool) -> RateLimitDecision:
+        allowed, remaining, retry_after = await self._script(
+            keys=[f"{self.prefix}{key}"],
+            args=[self.capacity, self.rate, tokens, 1 if consume else 0]
+        )
+        return RateLimitDecision(bool(int(allowed)), float(remaining), float(retry_after))
+
+def build_rate_limiter(capacity: Optional[int] = None) -> RateLimiter:
+    """Creates the configured per-wallet payment rate limiter."""
+    if capacity is None:
+        capacity = settings.OMNIAGENTPAY_RATE_LIMIT_PER_MIN
+    if settings.OMNIAGENTPAY_RATE_LIMIT_BACKEND == "redis":
+        if not settings.OMNIAGENTPAY_REDIS_URL:
+            raise RuntimeError("OMNIAGENTPAY_REDIS_URL is required for the redis rate limit backend")
+        import redis.asyncio as redis_asyncio
+        client = redis_asyncio.Redis.from_url(settings.OMNIAGENTPAY_REDIS_URL)
+        logger.info("rate_limiter_initialized", backend="redis")
+        return RedisRateLimiter(client, capacity)
+    return InMemoryRateLimiter(capacity)
@@ -0,0 +1,179 @@
+import asyncio
+import json
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import structlog
+from app.payments.ratelimit import InMemoryRateLimiter
+
+logger = structlog.get_logger(__name__)
+
+class GuardReconciler:
+    """
+    Background job that walks every managed wallet and applies the guard
+    policy diff, with bounded concurrency and a wallets-per-second budget.
+    Progress is checkpointed to a local JSON file as the highest wallet id
+    below which every wallet is done, so a restarted job resumes where it
+    stopped. The checkpoint is discarded when the policy fingerprint changes.
+    """
+
+    def __init__(
+        self,
+        list_wallets: Callable[[], Awaitable[List[str]]],
+        reconcile: Callable[[str], Awaitable[Any]],
+        policy_fingerprint: Callable[[], str],
+        concurrency: int,
+        rate_per_second: float,
+        state_path: Optional[str] = None,
+        checkpoint_every: int = 50,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self._list_wallets = list_wallets
+        self._reconcile = reconcile
+        self._policy_fingerprint = policy_fingerprint
+        self.concurrency = max(1, concurrency)
+        self.rate_per_second = rate_per_second
+        self.state_path = state_path
+        self.checkpoint_every = max(1, checkpoint_every)
+        self._clock = clock
+        self._task: Optional[asyncio.Task] = None
+        self._fingerprint: Optional[str] = None
+        self._cursor: Optional[str] = None
+        self._finished = False
+        self.total = 0
+        self.skipped = 0
+        self.processed = 0
+        self.changed = 0
+        self.failed = 0
+        self.last_error: Optional[str] = None
+        self._started_at: Optional[float] = None
+        self._finished_at: Optional[float] = None
+        self._load()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self, restart: bool = False) -> bool:
+        """Starts a pass in the background unless one is already running."""
+        if self.running:
+            return False
+        if restart:
+            self._cursor = None
+            self._finished = False
+        self._task = asyncio.create_task(self.run())
+        return True
+
+    async def run(self) -> Dict[str, Any]:
+        """Reconciles every wallet not yet covered by the checkpoint."""
+        fingerprint = self._policy_fingerprint()
+        if fingerprint != self._fingerprint:
+            # New policy: every wallet needs another look
+            self._fingerprint, self._cursor, self._finished = fingerprint, None, False
+
+        self.processed = self.changed = self.failed = self.skipped = 0
+        self._started_at, self._finished_at = self._clock(), None
+        wallet_ids = sorted(set(await self._list_wallets()))
+        self.total = len(wallet_ids)
+        if self._finished:
+            pending: List[str] = []
+        else:
+            pending = [w for w in wallet_ids if self._cursor is None or w > self._cursor]
+        self.skipped = self.total - len(pending)
+        logger.info("guard_reconcile_started", total=self.total, pending=len(pending), policy=fingerprint)
+
+        limiter = None
+        if self.rate_per_second > 0:
+            burst = max(1, int(self.rate_per_second))
+            limiter = InMemoryRateLimiter(capacity=burst, period=burst / self.rate_per_second)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        done = [False] * len(pending)
+        next_unsettled = 0
+
+        async def reconcile_one(index: int, wallet_id: str) -> None:
+            nonlocal next_unsettled
+            async with semaphore:
+                if limiter:
+                    while True:
+                        decision = await limiter.take("reconcile")
+                        if decision.allowed:
+                            break
+                        await asyncio.sleep(decision.retry_after)
+                try:
+                    diff = await self._reconcile(wallet_id)
+                    if getattr(diff, "changed", False):
+                        self.changed += 1
+                except Exception as e:
+                    # A failing wallet is reported but does not hold back the checkpoint
+                    self.failed += 1
+                    self.last_error = f"{wallet_id}: {e}"
+                    logger.error("guard_reconcile_failed", wallet_id=wallet_id, error=str(e))
+            self.processed += 1
+            done[index] = True
+            while next_unsettled < len(pending) and done[next_unsettled]:
+                next_unsettled += 1
+            if next_unsettled:
+                self._cursor = pending[next_unsettled - 1]
+            if self.processed % self.checkpoint_every == 0:
+                self._save()
+
+        try:
+            await asyncio.gather(*(reconcile_one(i, w) for i, w in enumerate(pending)))
+            self._finished = True
+        finally:
+            self._finished_at = self._clock()
+            self._save()
+        logger.info("guard_reconcile_finished", **self.stats())
+        return self.stats()
+
+    async def stop(self) -> None:
+        if self.running:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        end = self._finished_at if self._finished_at is not None else self._clock()
+        elapsed = end - self._started_at if self._started_at is not None else 0.0
+        remaining = self.total - self.skipped - self.processed
+        return {
+            "running": self.running,
+            "policy": self._fingerprint,
+            "checkpoint": self._cursor,
+            "completed": self._finished,
+            "total": self.total,
+            "skipped": self.skipped,
+            "processed": self.processed,
+            "changed": self.changed,
+            "failed": self.failed,
+            "remaining": max(0, remaining),
+            "elapsed_seconds": round(elapsed, 3),
+            "wallets_per_second": round(self.processed / elapsed, 2) if elapsed > 0 else None,
+            "last_error": self.last_error
+        }
+
+    def _load(self) -> None:
+        if not self.state_path or not os.path.exists(self.state_path):
+            return
+        try:
+            with open(self.state_path) as f:
+                state = json.load(f)
+            self._fingerprint = state.get("policy")
+            self._cursor = state.get("cursor")
+            self._finished = bool(state.get("completed"))
+            logger.info("guard_reconcile_checkpoint_loaded", path=self.state_path, cursor=self._cursor)
+        except (OSError, ValueError) as e:
+            logger.error("guard_reconcile_checkpoint_load_failed", path=self.state_path, error=str(e))
+
+    def _save(self) -> None:
+        if not self.state_path:
+            return
+        tmp_path = f"{self.state_path}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump({"policy": self._fingerprint, "cursor": self._cursor, "completed": self._finished}, f)
+            os.replace(tmp_path, self.state_path)
+        except OSError as e:
+            logger.error("guard_reconcile_checkpoint_save_failed", path=self.state_path, error=str(e))
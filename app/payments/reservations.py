@@ -0,0 +1,94 @@
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+from app.payments.money import Micros
+
+class ReservationLedger:
+    """
+    Micro-USDC held by outstanding payment intents, per wallet. A new intent
+    may only reserve what is left of the wallet balance after everything
+    already reserved, and the check and the reservation happen together, so
+    concurrent intents cannot all pass against the same balance. Reservations
+    are released when their intent settles; one whose intent has expired is
+    dropped the next time its wallet is looked at.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.time):
+        self._clock = clock
+        # key -> (wallet_id, amount, expires_at)
+        self._entries: Dict[str, Tuple[str, Micros, Optional[float]]] = {}
+        self._wallet_keys: Dict[str, Dict[str, None]] = {}
+        self._wallet_totals: Dict[str, Micros] = {}
+        self.rejections = 0
+        self.expired = 0
+
+    def reserved(self, wallet_id: str) -> Micros:
+        self._drop_expired(wallet_id)
+        return self._wallet_totals.get(wallet_id, 0)
+
+    def available(self, wallet_id: str, balance: Micros) -> Micros:
+        return balance - self.reserved(wallet_id)
+
+    def try_reserve(
+        self,
+        key: str,
+        wallet_id: str,
+        amount: Micros,
+        balance: Micros,
+        expires_at: Optional[float] = None
+    ) -> bool:
+        """Reserves amount if it fits the unreserved balance; returns False (reserving nothing) otherwise."""
+        if amount > self.available(wallet_id, balance):
+            self.rejections += 1
+            return False
+        self.release(key)
+        self._entries[key] = (wallet_id, amount, expires_at)
+        self._wallet_keys.setdefault(wallet_id, {})[key] = None
+        self._wallet_totals[wallet_id] = self._wallet_totals.get(wallet_id, 0) + amount
+        return True
+
+    def rekey(self, key: str, new_key: str, expires_at: Optional[float] = None) -> bool:
+        """Moves a reservation to a new key (e.g. a placeholder to the created intent's ID)."""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        wallet_id, amount, old_expiry = entry
+        keys = self._wallet_keys[wallet_id]
+        del keys[key]
+        keys[new_key] = None
+        self._entries[new_key] = (wallet_id, amount, old_expiry if expires_at is None else expires_at)
+        return True
+
+    def release(self, key: str) -> Optional[Micros]:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return None
+        wallet_id, amount, _ = entry
+        keys = self._wallet_keys[wallet_id]
+        del keys[key]
+        if keys:
+            self._wallet_totals[wallet_id] -= amount
+        else:
+            del self._wallet_keys[wallet_id]
+            del self._wallet_totals[wallet_id]
+        return amount
+
+    def _drop_expired(self, wallet_id: str) -> None:
+        keys = self._wallet_keys.get(wallet_id)
+        if not keys:
+            return
+        now = self._clock()
+        expired = [k for k in keys if self._entries[k][2] is not None and self._entries[k][2] <= now]
+        for key in expired:
+            self.release(key)
+            self.expired += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "outstanding": len(self._entries),
+            "wallets": len(self._wallet_totals),
+            "rejections": self.rejections,
+            "expired": self.expired
+        }
@@ -1,8 +1,17 @@
+import asyncio
+import hashlib
 import uuid
 import structlog
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from pydantic import BaseModel, Field, field_validator
+from app.core.config import settings
+from app.core.security import verify_simulation_token
+from app.payments.cache import TTLCache
+from app.payments.guards import GuardEngine, GuardSnapshot, get_guard_engine
+from app.payments.idempotency import IdempotencyStore, InMemoryIdempotencyStore, SQLiteIdempotencyStore
 from app.payments.interfaces import AbstractPaymentClient
+from app.payments.lanes import LaneScheduler
+from app.payments.money import Micros, to_micros
 from app.payments.omni_client import OmniAgentPaymentClient
 from app.utils.exceptions import PaymentError, GuardValidationError
 
@@ -14,30 +23,83 @@ class PaymentRequest(BaseModel):
     to_address: str = Field(..., description="The recipient's blockchain address")
     amount: str = Field(..., description="Amount to send (e.g., '10.50')")
     currency: str = Field("USD", description="Currency code")
+    idempotency_key: Optional[str] = Field(None, description="Client-supplied key to make retries safe")
+    simulation_token: Optional[str] = Field(None, description="Token from a prior simulate_payment of this payment")
+    max_wait_seconds: Optional[float] = Field(None, description="Longest the payment may queue behind its wallet's lane")
 
     @field_validator("amount")
     @classmethod
     def validate_amount(cls, v):
         try:
-            float_val = float(v)
-            if float_val <= 0:
-                raise ValueError("Amount must be positive")
-        except ValueError:
-            raise ValueError("Amount must be a valid numeric string")
+            micros = to_micros(v)
+        except ValueError as e:
+            raise ValueError(f"Amount must be a valid numeric string ({e})")
+        if micros <= 0:
+            raise ValueError("Amount must be positive")
         return v
 
+    @property
+    def amount_micros(self) -> Micros:
+        return to_micros(self.amount)
+
+    def fingerprint(self) -> str:
+        """Hash of the payment parameters an idempotency key is bound to."""
+        raw = f"{self.from_wallet_id}|{self.to_address}|{self.amount_micros}|{self.currency.upper()}"
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+def build_idempotency_store() -> IdempotencyStore:
+    """Creates the configured idempotency result store (SQLite if a path is set)."""
+    if settings.OMNIAGENTPAY_IDEMPOTENCY_DB_PATH:
+        return SQLiteIdempotencyStore(
+            path=settings.OMNIAGENTPAY_IDEMPOTENCY_DB_PATH,
+            maxsize=settings.OMNIAGENTPAY_IDEMPOTENCY_STORE_SIZE,
+            ttl=settings.OMNIAGENTPAY_IDEMPOTENCY_TTL_SECONDS
+        )
+    return InMemoryIdempotencyStore(
+        maxsize=settings.OMNIAGENTPAY_IDEMPOTENCY_STORE_SIZE,
+        ttl=settings.OMNIAGENTPAY_IDEMPOTENCY_TTL_SECONDS
+    )
+
 class PaymentOrchestrator:
     """ Orchestrates the payment flow: Validation -> Simulation -> Execution. """
     
-    def __init__(self, client: AbstractPaymentClient):
+    def __init__(
+        self,
+        client: AbstractPaymentClient,
+        idempotency_store: Optional[IdempotencyStore] = None,
+        guard_engine: Optional[GuardEngine] = None
+    ):
         self.client = client
+        self.idempotency_store = idempotency_store or build_idempotency_store()
+        # Local guard pre-checks; the SDK guards stay authoritative
+        self.guard_engine = guard_engine or get_guard_engine()
+        # Per-wallet ordered lanes paced to the rate-limit budget of the guard policy in force
+        self.lanes = LaneScheduler(
+            max_per_minute=0,
+            max_wait=settings.OMNIAGENTPAY_LANE_MAX_WAIT_SECONDS,
+            pacing=self.guard_engine.rate_limit
+        )
+        # idempotency_key -> (fingerprint, task) for payments still in progress
+        self._in_flight: Dict[str, Tuple[str, asyncio.Task]] = {}
+        # Simulation tokens are single-use; remember consumed ones until they expire
+        self._used_simulation_tokens = TTLCache(
+            maxsize=settings.OMNIAGENTPAY_IDEMPOTENCY_STORE_SIZE,
+            ttl=settings.OMNIAGENTPAY_SIMULATION_TOKEN_TTL_SECONDS
+        )
+        self.replays = 0
+        self.joined_in_flight = 0
+        self.simulations_skipped = 0
+        self.simulation_tokens_rejected = 0
 
     async def pay(self, request_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Executes a guarded payment flow.
-        1. Validate Input
+        1. Validate Input (including local guard pre-checks)
         2. Run Simulation (Required)
         3. Execute with Idempotency
+
+        With a client-supplied idempotency_key, a completed payment's result is
+        replayed and a concurrent call with the same key joins the one in flight.
         """
         # 1. Validate MCP tool input
         try:
@@ -46,25 +108,182 @@ class PaymentOrchestrator:
             logger.error("invalid_payment_input", error=str(e))
             raise PaymentError(f"Invalid input: {str(e)}")
 
-        # Generate idempotency key for this flow
-        idempotency_key = str(uuid.uuid4())
-        
+        if not req.idempotency_key:
+            # Generate idempotency key for this flow
+            return await self._execute_flow(req, str(uuid.uuid4()))
+
+        key = req.idempotency_key
+        fingerprint = req.fingerprint()
+
+        record = self.idempotency_store.get(key)
+        if record is not None:
+            self._check_fingerprint(key, record["fingerprint"], fingerprint)
+            self.replays += 1
+            logger.info("idempotent_payment_replayed", idempotency_key=key)
+            return {**record["result"], "idempotent_replay": True}
+
+        pending = self._in_flight.get(key)
+        if pending is not None:
+            self._check_fingerprint(key, pending[0], fingerprint)
+            self.joined_in_flight += 1
+            logger.info("idempotent_payment_joined", idempotency_key=key)
+            return dict(await asyncio.shield(pending[1]))
+
+        task = asyncio.ensure_future(self._execute_and_record(req, key, fingerprint))
+        self._in_flight[key] = (fingerprint, task)
+        task.add_done_callback(lambda t: self._in_flight.pop(key, None))
+        return dict(await asyncio.shield(task))
+
+    async def pay_batch(self, payments: List[Dict[str, Any]], concurrency: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Executes many payments with partial-failure semantics.
+        All items are validated before any payment starts. Payments from the same
+        source wallet run in input order, one at a time; different wallets run in
+        parallel under a global concurrency cap.
+        """
+        if not payments:
+            raise PaymentError("Invalid input: payments must not be empty")
+        if len(payments) > settings.OMNIAGENTPAY_BATCH_MAX_ITEMS:
+            raise PaymentError(
+                f"Invalid input: batch of {len(payments)} payments exceeds maximum of {settings.OMNIAGENTPAY_BATCH_MAX_ITEMS}"
+            )
+
+        # 1. Validate everything up front so no money moves for a malformed batch
+        invalid = []
+        by_wallet: Dict[str, List[int]] = {}
+        for index, item in enumerate(payments):
+            try:
+                req = PaymentRequest(**item)
+            except Exception as e:
+                invalid.append(f"item {index}: {str(e)}")
+                continue
+            by_wallet.setdefault(req.from_wallet_id, []).append(index)
+        if invalid:
+            logger.error("invalid_batch_payment_input", errors=invalid)
+            raise PaymentError(f"Invalid input: {'; '.join(invalid)}")
+
+        limit = max(1, concurrency or settings.OMNIAGENTPAY_BATCH_CONCURRENCY)
+        semaphore = asyncio.Semaphore(limit)
+        results: List[Optional[Dict[str, Any]]] = [None] * len(payments)
+        logger.info("orchestrating_payment_batch", count=len(payments), wallets=len(by_wallet), concurrency=limit)
+
+        async def run_wallet(indexes: List[int]) -> None:
+            for index in indexes:
+                async with semaphore:
+                    results[index] = await self._pay_batch_item(index, payments[index])
+
+        # 2. One sequential chain per source wallet, chains run concurrently
+        await asyncio.gather(*(run_wallet(indexes) for indexes in by_wallet.values()))
+
+        succeeded = sum(1 for item in results if item["status"] == "success")
+        return {
+            "total": len(results),
+            "succeeded": succeeded,
+            "failed": len(results) - succeeded,
+            "results": results
+        }
+
+    async def _pay_batch_item(self, index: int, item: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            return {"index": index, "status": "success", "payment": await self.pay(item)}
+        except GuardValidationError as e:
+            return {"index": index, "status": "error", "error_type": "guard_violation", "message": e.detail}
+        except PaymentError as e:
+            return {"index": index, "status": "error", "error_type": "payment_error", "message": e.detail}
+        except Exception as e:
+            logger.error("batch_payment_item_failed", index=index, error=str(e))
+            return {"index": index, "status": "error", "error_type": "internal_error", "message": str(e)}
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {
+            "store": self.idempotency_store.stats(),
+            "replays": self.replays,
+            "joined_in_flight": self.joined_in_flight,
+            "in_flight": len(self._in_flight),
+            "simulations_skipped": self.simulations_skipped,
+            "simulation_tokens_rejected": self.simulation_tokens_rejected,
+            "lanes": self.lanes.stats(),
+            "guards": self.guard_engine.stats()
+        }
+
+    @staticmethod
+    def _check_fingerprint(key: str, stored: str, requested: str) -> None:
+        if stored != requested:
+            raise PaymentError(
+                f"Idempotency key {key} was already used with different payment parameters"
+            )
+
+    def _consume_simulation_token(self, req: PaymentRequest) -> bool:
+        """True if the request carries a valid, unused simulation token for these exact parameters."""
+        if not req.simulation_token:
+            return False
+        token_id = verify_simulation_token(
+            req.simulation_token, req.from_wallet_id, req.to_address, req.amount, req.currency
+        )
+        if token_id is None or token_id in self._used_simulation_tokens:
+            self.simulation_tokens_rejected += 1
+            logger.info("simulation_token_rejected", wallet_id=req.from_wallet_id)
+            return False
+        self._used_simulation_tokens.set(token_id, True)
+        self.simulations_skipped += 1
+        return True
+
+    async def _execute_and_record(self, req: PaymentRequest, key: str, fingerprint: str) -> Dict[str, Any]:
+        result = await self._execute_flow(req, key)
+        # Only successful payments are stored; failures may be retried with the same key
+        self.idempotency_store.put(key, fingerprint, result)
+        return result
+
+    async def _execute_flow(self, req: PaymentRequest, idempotency_key: str) -> Dict[str, Any]:
+        # The whole payment is checked against the guard policy in force when it arrived,
+        # even if the policy is reloaded while it waits in its lane
+        snapshot = self.guard_engine.snapshot
+        # Reject obvious violations before queueing; rate limits are left to the lane's pacing
+        await self.guard_engine.check(
+            req.amount_micros, req.from_wallet_id, req.to_address, include_queueable=False, snapshot=snapshot
+        )
+        # Payments from one wallet run one at a time, paced to its per-minute budget
+        async with self.lanes.slot(req.from_wallet_id, req.max_wait_seconds):
+            return await self._simulate_and_execute(req, idempotency_key, snapshot)
+
+    async def _simulate_and_execute(
+        self, req: PaymentRequest, idempotency_key: str, snapshot: Optional[GuardSnapshot] = None
+    ) -> Dict[str, Any]:
         logger.info("orchestrating_payment", 
                     wallet_id=req.from_wallet_id, 
                     amount=req.amount,
                     idempotency_key=idempotency_key)
 
-        # 2. Simulation (REQUIRED before execution)
-        simulation = await self.client.simulate_payment(
-            from_wallet_id=req.from_wallet_id,
-            to_address=req.to_address,
-            amount=req.amount,
-            currency=req.currency
+        # Re-check locally now that earlier payments from this wallet have settled
+        # (the lane has already taken this payment's rate-limit token). Shared budgets
+        # stay reserved for this payment until it is recorded or fails.
+        await self.guard_engine.check(
+            req.amount_micros, req.from_wallet_id, req.to_address,
+            include_queueable=False, snapshot=snapshot, hold=idempotency_key
         )
+        try:
+            return await self._simulate_and_pay(req, idempotency_key)
+        finally:
+            self.guard_engine.release(idempotency_key, snapshot)
+
+    async def _simulate_and_pay(self, req: PaymentRequest, idempotency_key: str) -> Dict[str, Any]:
+        # 2. Simulation (REQUIRED before execution, unless a valid simulation token proves it ran)
+        if self._consume_simulation_token(req):
+            logger.info("payment_simulation_reused", wallet_id=req.from_wallet_id)
+        else:
+            simulation = await self.client.simulate_payment(
+                from_wallet_id=req.from_wallet_id,
+                to_address=req.to_address,
+                amount=req.amount,
+                currency=req.currency,
+                # The lane already took this payment's rate-limit token
+                include_queueable=False,
+                hold=idempotency_key
+            )
 
-        if simulation.get("status") != "success" or not simulation.get("validation_passed"):
-            logger.error("payment_simulation_failed", simulation=simulation)
-            raise GuardValidationError(f"Payment simulation failed: {simulation.get('reason', 'Unknown error')}")
+            if simulation.get("status") != "success" or not simulation.get("validation_passed"):
+                logger.error("payment_simulation_failed", simulation=simulation)
+                raise GuardValidationError(f"Payment simulation failed: {simulation.get('reason', 'Unknown error')}")
 
         # 3. Execution
         try:
@@ -72,8 +291,11 @@ class PaymentOrchestrator:
                 from_wallet_id=req.from_wallet_id,
                 to_address=req.to_address,
                 amount=req.amount,
-                currency=req.currency
-                # In real SDK, we would pass idempotency_key here
+                currency=req.currency,
+                idempotency_key=idempotency_key
+            )
+            self.guard_engine.record(
+                req.amount_micros, req.from_wallet_id, ref=execution_result.get("transfer_id")
             )
 
             # 4. Return structured result (Stripping blockchain details)
@@ -90,7 +312,16 @@ class PaymentOrchestrator:
             logger.error("payment_execution_failed", error=str(e))
             raise PaymentError(f"Payment execution failed: {str(e)}")
 
+_orchestrator: Optional[PaymentOrchestrator] = None
+
 async def get_payment_orchestrator() -> PaymentOrchestrator:
-    """Dependency provider for PaymentOrchestrator."""
-    client = await OmniAgentPaymentClient.get_instance()
-    return PaymentOrchestrator(client)
+    """Dependency provider for PaymentOrchestrator (shared so idempotency state is process-wide)."""
+    global _orchestrator
+    if _orchestrator is None:
+        client = await OmniAgentPaymentClient.get_instance()
+        _orchestrator = PaymentOrchestrator(client)
+    return _orchestrator
+
+def get_payment_metrics() -> Dict[str, Any]:
+    """Orchestrator counters, empty until the first payment has been orchestrated."""
+    return _orchestrator.get_metrics() if _orchestrator else {}
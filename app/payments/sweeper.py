@@ -0,0 +1,96 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import structlog
+from app.payments.timerwheel import TimerWheel
+
+logger = structlog.get_logger(__name__)
+
+class IntentSweeper:
+    """
+    Expires unconfirmed payment intents once their deadline passes. Each
+    intent's deadline sits in a timer wheel (O(1) to track or untrack), and a
+    background loop advances the wheel every interval and hands the expired
+    intents to `expire` in batches. `expire` returns the IDs it could not
+    handle yet; those are retried after `retry_after` seconds.
+    """
+
+    def __init__(
+        self,
+        expire: Callable[[List[str]], Awaitable[List[str]]],
+        interval: float,
+        batch_size: int = 100,
+        retry_after: float = 30.0,
+        clock: Callable[[], float] = time.time
+    ):
+        self._expire = expire
+        self.interval = interval
+        self.batch_size = max(1, batch_size)
+        self.retry_after = retry_after
+        self._clock = clock
+        self._wheel = TimerWheel(tick=interval if interval > 0 else 1.0, start=clock())
+        self._task: Optional[asyncio.Task] = None
+        self.expired = 0
+        self.retries = 0
+        self.sweeps = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def track(self, intent_id: str, expires_at: float) -> None:
+        self._wheel.schedule(intent_id, expires_at)
+
+    def untrack(self, intent_id: str) -> bool:
+        return self._wheel.cancel(intent_id)
+
+    def start(self) -> None:
+        if self.interval > 0 and not self.running:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self.running:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error("intent_sweep_failed", error=str(e))
+
+    async def sweep(self) -> int:
+        """Expires every intent whose deadline has passed; returns how many were expired."""
+        now = self._clock()
+        due = self._wheel.advance(now)
+        self.sweeps += 1
+        expired = 0
+        for start in range(0, len(due), self.batch_size):
+            batch = due[start:start + self.batch_size]
+            try:
+                pending = await self._expire(batch)
+            except Exception as e:
+                logger.error("intent_expiry_batch_failed", count=len(batch), error=str(e))
+                pending = batch
+            for intent_id in pending:
+                self._wheel.schedule(intent_id, now + self.retry_after)
+            self.retries += len(pending)
+            expired += len(batch) - len(pending)
+        self.expired += expired
+        if due:
+            logger.info("intents_expired", expired=expired, retrying=len(due) - expired)
+        return expired
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "tracked": len(self._wheel),
+            "expired": self.expired,
+            "retries": self.retries,
+            "sweeps": self.sweeps
+        }
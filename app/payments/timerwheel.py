@@ -0,0 +1,105 @@
+import math
+from typing import Any, Dict, Hashable, List, Tuple
+
+class TimerWheel:
+    """
+    Hierarchical timer wheel: level i has `slots` buckets, each `slots**i`
+    ticks wide. Scheduling and cancelling are O(1); a timer far in the future
+    sits in a coarse bucket and is moved down a level when time reaches that
+    bucket, so advancing costs O(1) per tick plus O(1) per cascaded timer.
+    Deadlines beyond the top level's span are parked there and re-placed
+    each time their bucket comes around.
+    """
+
+    def __init__(self, tick: float, slots: int = 64, levels: int = 4, start: float = 0.0):
+        if tick <= 0:
+            raise ValueError("tick must be positive")
+        if levels < 2:
+            # Parked timers must sit above level 0, where buckets fire rather than cascade
+            raise ValueError("levels must be at least 2")
+        self.tick = tick
+        self.slots = slots
+        self.levels = levels
+        self._origin = start
+        self._now_tick = 0
+        self._wheels: List[List[Dict[Hashable, int]]] = [[{} for _ in range(slots)] for _ in range(levels)]
+        # key -> (level, slot, expiry tick); level -1 means already due
+        self._timers: Dict[Hashable, Tuple[int, int, int]] = {}
+        self._due: Dict[Hashable, None] = {}
+
+    def __len__(self) -> int:
+        return len(self._timers)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._timers
+
+    def schedule(self, key: Hashable, deadline: float) -> None:
+        """(Re)schedules key to fire at the first advance() at or after deadline."""
+        self.cancel(key)
+        self._place(key, math.ceil((deadline - self._origin) / self.tick))
+
+    def cancel(self, key: Hashable) -> bool:
+        timer = self._timers.pop(key, None)
+        if timer is None:
+            return False
+        level, slot, _ = timer
+        if level < 0:
+            del self._due[key]
+        else:
+            del self._wheels[level][slot][key]
+        return True
+
+    def advance(self, now: float) -> List[Hashable]:
+        """Moves the wheel to now and returns the keys whose deadline has passed."""
+        fired: List[Hashable] = list(self._due)
+        for key in fired:
+            del self._timers[key]
+        self._due.clear()
+
+        target = math.floor((now - self._origin) / self.tick)
+        while self._now_tick < target:
+            if not self._timers:
+                # Nothing to cascade or fire, jump straight to the target
+                self._now_tick = target
+                break
+            self._now_tick += 1
+            top = 0
+            while top + 1 < self.levels and self._now_tick % self.slots ** (top + 1) == 0:
+                top += 1
+            # Coarse buckets first, so timers land in the finer buckets processed next
+            for level in range(top, 0, -1):
+                bucket = self._wheels[level][(self._now_tick // self.slots ** level) % self.slots]
+                cascading = list(bucket.items())
+                bucket.clear()
+                for key, expiry in cascading:
+                    del self._timers[key]
+                    self._place(key, expiry)
+            bucket = self._wheels[0][self._now_tick % self.slots]
+            for key in bucket:
+                del self._timers[key]
+                fired.append(key)
+            bucket.clear()
+            for key in self._due:
+                del self._timers[key]
+                fired.append(key)
+            self._due.clear()
+        return fired
+
+    def _place(self, key: Hashable, expiry: int) -> None:
+        delta = expiry - self._now_tick
+        if delta <= 0:
+            self._due[key] = None
+            self._timers[key] = (-1, 0, expiry)
+            return
+        level = 0
+        while level + 1 < self.levels and delta >= self.slots ** (level + 1):
+            level += 1
+        slot = (expiry // self.slots ** level) % self.slots
+        if delta >= self.slots ** (level + 1):
+            # Beyond the top level's span: park in the bucket just before the current one
+            slot = (self._now_tick // self.slots ** level - 1) % self.slots
+        self._wheels[level][slot][key] = expiry
+        self._timers[key] = (level, slot, expiry)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"scheduled": len(self._timers), "tick": self.tick, "slots": self.slots, "levels": self.levels}
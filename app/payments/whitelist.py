@@ -0,0 +1,119 @@
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+import structlog
+
+logger = structlog.get_logger(__name__)
+
+# Chain scope of entries that apply to every chain
+ANY_CHAIN = "*"
+
+def normalize_address(address: str) -> str:
+    """
+    Canonical form used for whitelist lookups.
+    EVM hex addresses are case-folded so checksummed (EIP-55) and lowercase
+    spellings match; the SDK recipient guard compares case-insensitively too.
+    """
+    return address.strip().lower()
+
+def normalize_chain(chain: Optional[str]) -> str:
+    return chain.strip().upper() if chain else ANY_CHAIN
+
+def parse_entry(line: str) -> Optional[Tuple[str, str]]:
+    """Parses an "address" or "CHAIN:address" whitelist line; blanks and # comments are skipped."""
+    line = line.split("#", 1)[0].strip()
+    if not line:
+        return None
+    chain, sep, address = line.rpartition(":")
+    if not sep:
+        return ANY_CHAIN, normalize_address(line)
+    return normalize_chain(chain), normalize_address(address)
+
+class WhitelistIndex:
+    """
+    Hash index of approved recipients with O(1) membership checks.
+    Each normalized address maps to the (interned) set of chains it is
+    approved on, so very large whitelists stay compact in memory.
+    """
+
+    def __init__(self, addresses: Iterable[str] = ()):
+        self._entries: Dict[str, FrozenSet[str]] = {}
+        # Interned chain sets; almost every entry shares one of a handful
+        self._scopes: Dict[FrozenSet[str], FrozenSet[str]] = {}
+        self.update(addresses)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __bool__(self) -> bool:
+        return bool(self._entries)
+
+    def __contains__(self, address: str) -> bool:
+        return self.contains(address)
+
+    def contains(self, address: Optional[str], chain: Optional[str] = None) -> bool:
+        """True if the address is approved on the chain (any chain when chain is None)."""
+        if not address:
+            return False
+        scope = self._entries.get(normalize_address(address))
+        if scope is None:
+            return False
+        return chain is None or ANY_CHAIN in scope or normalize_chain(chain) in scope
+
+    def add(self, address: str, chain: Optional[str] = None) -> bool:
+        """Approves an address; returns False if it was already approved on that chain."""
+        key = normalize_address(address)
+        scope = self._entries.get(key, frozenset())
+        chain_key = normalize_chain(chain)
+        if chain_key in scope:
+            return False
+        self._entries[key] = self._intern(scope | {chain_key})
+        return True
+
+    def remove(self, address: str, chain: Optional[str] = None) -> bool:
+        """Revokes an address on one chain, or on every chain when chain is None."""
+        key = normalize_address(address)
+        scope = self._entries.get(key)
+        if scope is None:
+            return False
+        if chain is None:
+            del self._entries[key]
+            return True
+        chain_key = normalize_chain(chain)
+        if chain_key not in scope:
+            return False
+        remaining = scope - {chain_key}
+        if remaining:
+            self._entries[key] = self._intern(remaining)
+        else:
+            del self._entries[key]
+        return True
+
+    def update(self, addresses: Iterable[str]) -> int:
+        """Adds "address" or "CHAIN:address" entries; returns how many were new."""
+        added = 0
+        for line in addresses:
+            entry = parse_entry(line)
+            if entry is not None:
+                chain, address = entry
+                added += self.add(address, None if chain == ANY_CHAIN else chain)
+        return added
+
+    def load_file(self, path: str) -> int:
+        """Adds the entries of a whitelist file (one per line); returns how many were new."""
+        with open(path) as f:
+            added = self.update(f)
+        logger.info("whitelist_file_loaded", path=path, added=added, size=len(self))
+        return added
+
+    def addresses(self) -> List[str]:
+        """Approved addresses (normalized) for registering with the SDK."""
+        return list(self._entries)
+
+    def scoped_addresses(self) -> List[str]:
+        """Addresses approved only on particular chains."""
+        return [address for address, scope in self._entries.items() if ANY_CHAIN not in scope]
+
+    def stats(self) -> Dict[str, Any]:
+        return {"size": len(self), "scopes": len(self._scopes)}
+
+    def _intern(self, scope: FrozenSet[str]) -> FrozenSet[str]:
+        return self._scopes.setdefault(scope, scope)
@@ -20,8 +20,9 @@ class UnauthorizedRecipientError(GuardValidationError):
         super().__init__(f"Unauthorized Recipient: {recipient}")
 
 class RateLimitExceededError(GuardValidationError):
-    def __init__(self):
-        super().__init__("Rate limit exceeded for autonomous payments")
+    def __init__(self, reason: str = None):
+        detail = "Rate limit exceeded for autonomous payments"
+        super().__init__(f"{detail}: {reason}" if reason else detail)
 
 class WalletNotFoundError(MCPException):
     def __init__(self, wallet_id: str):
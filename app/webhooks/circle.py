@@ -1,8 +1,12 @@
 import structlog
+from datetime import datetime
 from fastapi import APIRouter, Request, HTTPException, Header
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 from app.core.config import settings
+from app.payments.guards import get_guard_engine
+from app.payments.money import Micros, format_micros, to_micros
+from app.payments.omni_client import OmniAgentPaymentClient
 
 router = APIRouter()
 logger = structlog.get_logger(__name__)
@@ -56,17 +60,86 @@ async def circle_webhook(
         logger.error("webhook_processing_failed", error=str(e), event_type=event_type)
         raise HTTPException(status_code=500, detail="Webhook processing failed")
 
+def extract_wallet_id(payload: Dict[str, Any]) -> Optional[str]:
+    """Find the wallet ID an event refers to (event data first, then top level)."""
+    data = payload.get("data") or {}
+    for source in (data, payload):
+        for key in ("wallet_id", "walletId"):
+            if source.get(key):
+                return source[key]
+    return None
+
+async def invalidate_wallet_balance(payload: Dict[str, Any]):
+    """Drop the cached balance of the wallet affected by an event."""
+    wallet_id = extract_wallet_id(payload)
+    if not wallet_id:
+        logger.warning("webhook_missing_wallet_id", event_type=payload.get("type"))
+        return
+    client = await OmniAgentPaymentClient.get_instance()
+    client.invalidate_balance(wallet_id)
+    logger.info("balance_cache_invalidated", wallet_id=wallet_id)
+
+def extract_amount(payload: Dict[str, Any]) -> Optional[Micros]:
+    """Find the amount of an event in micro-USDC ("amount" or the first of "amounts")."""
+    data = payload.get("data") or {}
+    amount = data.get("amount")
+    if amount is None and data.get("amounts"):
+        amount = data["amounts"][0]
+    if isinstance(amount, dict):
+        amount = amount.get("amount")
+    try:
+        return to_micros(amount) if amount is not None else None
+    except ValueError:
+        return None
+
+def extract_timestamp(payload: Dict[str, Any]) -> Optional[float]:
+    data = payload.get("data") or {}
+    created = data.get("createDate") or data.get("created_at")
+    try:
+        return datetime.fromisoformat(created).timestamp() if created else None
+    except (TypeError, ValueError):
+        return None
+
+def extract_transaction_id(payload: Dict[str, Any]) -> Optional[str]:
+    data = payload.get("data") or {}
+    return data.get("transaction_id") or data.get("transactionId") or data.get("id")
+
+async def update_intent_status(payload: Dict[str, Any], status: str):
+    """Mirror an event's outcome onto the local intent index and release the intent's reservation."""
+    data = payload.get("data") or {}
+    client = await OmniAgentPaymentClient.get_instance()
+    record = client.settle_intent(
+        status,
+        intent_id=data.get("intent_id") or data.get("intentId"),
+        transaction_id=extract_transaction_id(payload)
+    )
+    if record:
+        logger.info("intent_status_updated", intent_id=record["intent_id"], status=status)
+
+def record_wallet_spend(payload: Dict[str, Any]):
+    """Count an outgoing payment in the local spend ledger used by budget pre-checks."""
+    wallet_id = extract_wallet_id(payload)
+    amount = extract_amount(payload)
+    if not wallet_id or amount is None:
+        return
+    ref = extract_transaction_id(payload)
+    get_guard_engine().record_spend(amount, wallet_id, ref=ref, at=extract_timestamp(payload))
+    logger.info("wallet_spend_recorded", wallet_id=wallet_id, amount=format_micros(amount))
+
 async def handle_payment_sent(payload: Dict[str, Any]):
     """Handle payment sent event."""
     logger.info("handling_payment_sent", data=payload)
-    # implementation details...
+    record_wallet_spend(payload)
+    await update_intent_status(payload, "succeeded")
+    await invalidate_wallet_balance(payload)
 
 async def handle_payment_received(payload: Dict[str, Any]):
     """Handle payment received event."""
     logger.info("handling_payment_received", data=payload)
-    # implementation details...
+    await invalidate_wallet_balance(payload)
 
 async def handle_transaction_failed(payload: Dict[str, Any]):
     """Handle transaction failed event."""
     logger.info("handling_transaction_failed", data=payload)
-    # implementation details...
+    await update_intent_status(payload, "failed")
+    await invalidate_wallet_balance(payload)
@@ -0,0 +1,40 @@
+"""
+Lookup cost of the recipient whitelist index at scale.
+
+Run with: python -m tests.bench_whitelist [entries]
+"""
+import random
+import sys
+import time
+import tracemalloc
+from app.payments.whitelist import WhitelistIndex
+
+
+def main(size: int = 1_000_000, lookups: int = 200_000) -> None:
+    addresses = [f"0x{random.getrandbits(160):040X}" for _ in range(size)]
+
+    started = time.perf_counter()
+    index = WhitelistIndex(addresses)
+    build_seconds = time.perf_counter() - started
+
+    # Measured on a second build so tracing overhead does not skew the timing
+    tracemalloc.start()
+    WhitelistIndex(addresses)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    hits = random.sample(addresses, lookups)
+    misses = [f"0x{random.getrandbits(160):040x}" for _ in range(lookups)]
+
+    for label, probes in (("hit", hits), ("miss", misses)):
+        started = time.perf_counter()
+        for address in probes:
+            index.contains(address)
+        per_lookup = (time.perf_counter() - started) / lookups
+        print(f"{label:>4}: {per_lookup * 1e9:8.0f} ns/lookup")
+
+    print(f"entries: {len(index):,}  build: {build_seconds:.2f}s  peak memory: {peak / 2**20:.0f} MiB")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
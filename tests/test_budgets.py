@@ -0,0 +1,100 @@
+import json
+import pytest
+from app.payments.budgets import BudgetTree
+from app.payments.guards import GuardEngine, HierarchicalBudgetGuard
+from app.payments.money import to_micros
+from app.utils.exceptions import BudgetExceededError
+
+CONFIG = {
+    "nodes": {
+        "acme/research/agent-1": {"parent": "acme/research", "daily_limit": "80"},
+        "acme/research": {"parent": "acme", "hourly_limit": "50"},
+        "acme": {"daily_limit": "100"}
+    },
+    "wallets": {"wallet-1": "acme/research/agent-1", "wallet-2": "acme/research", "wallet-3": "acme"}
+}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_payment_must_fit_every_ancestor():
+    """Test spend by one wallet counts against its team and org"""
+    clock = FakeClock()
+    tree = BudgetTree.from_dict(CONFIG, clock=clock)
+    tree.record("wallet-1", to_micros(40))
+
+    tree.check("wallet-3", to_micros(60))
+    with pytest.raises(BudgetExceededError, match="Hourly budget of 50 for acme/research"):
+        tree.check("wallet-2", to_micros(11))
+
+    clock.now = 3600
+    tree.record("wallet-2", to_micros(50))
+    with pytest.raises(BudgetExceededError, match="Daily budget of 100 for acme "):
+        tree.check("wallet-3", to_micros(11))
+    assert tree.stats() == {"nodes": 3, "wallets": 3, "rejections": 2}
+
+
+def test_unassigned_wallet_is_unrestricted():
+    """Test wallets outside the hierarchy are not checked"""
+    tree = BudgetTree.from_dict(CONFIG)
+    tree.check("wallet-9", to_micros(1000))
+    tree.record("wallet-9", to_micros(1000))
+    assert tree.status("acme")["path"][0]["daily"]["spent"] == "0"
+
+
+def test_status_reports_remaining_along_path():
+    """Test remaining budget is reported for a node and its ancestors"""
+    tree = BudgetTree.from_dict(CONFIG)
+    tree.record("wallet-1", to_micros("12.5"))
+
+    status = tree.wallet_status("wallet-1")
+    assert [node["node_id"] for node in status["path"]] == ["acme/research/agent-1", "acme/research", "acme"]
+    assert status["path"][0]["daily"] == {"limit": "80", "spent": "12.5", "remaining": "67.5"}
+    assert status["path"][1]["daily"] == {"limit": None, "spent": "12.5", "remaining": None}
+    assert status["path"][1]["hourly"]["remaining"] == "37.5"
+
+
+def test_held_amount_counts_until_released():
+    """Test a hold reserves on every ancestor, is replaced on re-check and freed by release"""
+    tree = BudgetTree.from_dict(CONFIG, clock=FakeClock())
+    tree.check("wallet-1", to_micros(30), hold="p1")
+    tree.check("wallet-1", to_micros(30), hold="p1")
+    with pytest.raises(BudgetExceededError, match="acme/research "):
+        tree.check("wallet-2", to_micros(21), hold="p2")
+    assert tree.status("acme")["path"][0]["reserved"] == "30"
+    assert tree.status("acme")["path"][0]["daily"]["remaining"] == "70"
+
+    tree.record("wallet-1", to_micros(30))
+    tree.release("p1")
+    tree.release("p2")
+    tree.check("wallet-2", to_micros(20))
+    assert tree.status("acme")["path"][0]["reserved"] == "0"
+
+
+def test_invalid_config_rejected():
+    """Test unknown or cyclic parents are reported"""
+    with pytest.raises(ValueError, match="cyclic"):
+        BudgetTree.from_dict({"nodes": {"a": {"parent": "b"}, "b": {"parent": "a"}}})
+    with pytest.raises(ValueError, match="Unknown budget node"):
+        BudgetTree.from_dict({"nodes": {"a": {}}, "wallets": {"w": "b"}})
+
+
+@pytest.mark.asyncio
+async def test_guard_engine_feeds_tree(tmp_path):
+    """Test the hierarchical guard checks and records through the engine"""
+    path = tmp_path / "budgets.json"
+    path.write_text(json.dumps(CONFIG))
+    engine = GuardEngine([HierarchicalBudgetGuard(BudgetTree.load_file(str(path)))])
+
+    engine.record(to_micros(45), "wallet-1", ref="tx-1")
+    engine.record_spend(to_micros(45), "wallet-1", ref="tx-1")
+    await engine.check(to_micros(5), "wallet-2")
+    with pytest.raises(BudgetExceededError):
+        await engine.check(to_micros(6), "wallet-2")
+    assert engine.budget_tree.stats()["wallets"] == 3
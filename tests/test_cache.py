@@ -0,0 +1,75 @@
+from app.payments.cache import MISSING, NOT_FOUND, TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_cache_hit_and_miss():
+    """Test basic get/set with hit and miss counters"""
+    cache = TTLCache(maxsize=10, ttl=60)
+    assert cache.get("a") is MISSING
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["size"] == 1
+
+
+def test_cache_ttl_expiry():
+    """Test entries expire after TTL"""
+    clock = FakeClock()
+    cache = TTLCache(maxsize=10, ttl=5, clock=clock)
+    cache.set("a", 1)
+    clock.now = 4.9
+    assert cache.get("a") == 1
+    clock.now = 5.0
+    assert cache.get("a") is MISSING
+    assert len(cache) == 0
+
+
+def test_cache_lru_eviction():
+    """Test least recently used entry is evicted when full"""
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is MISSING
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_cache_negative_entries():
+    """Test negative entries use their own TTL"""
+    clock = FakeClock()
+    cache = TTLCache(maxsize=10, ttl=60, negative_ttl=2, clock=clock)
+    cache.set_negative("missing")
+    assert cache.get("missing") is NOT_FOUND
+    assert cache.stats()["negative_hits"] == 1
+    clock.now = 2.0
+    assert cache.get("missing") is MISSING
+
+
+def test_cache_negative_disabled():
+    """Test negative caching is a no-op when negative_ttl is 0"""
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set_negative("missing")
+    assert cache.get("missing") is MISSING
+
+
+def test_cache_invalidate():
+    """Test explicit invalidation"""
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set("a", 1)
+    assert cache.invalidate("a") is True
+    assert cache.invalidate("a") is False
+    assert "a" not in cache
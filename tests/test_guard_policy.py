@@ -0,0 +1,67 @@
+import copy
+from app.payments.guard_policy import GuardPolicy, add_addresses, apply_diff, diff_guards
+
+
+def make_policy(**overrides):
+    params = dict(daily_limit=1000.0, hourly_limit=200.0, tx_limit=500.0, rate_limit_per_min=5, whitelist=["0xAAA"])
+    params.update(overrides)
+    return GuardPolicy(**params)
+
+
+def stored(policy):
+    return [copy.deepcopy(config) for config in policy.desired().values()]
+
+
+def test_diff_empty_wallet_adds_everything():
+    """Test a wallet without guards gets the whole policy"""
+    diff = diff_guards([], make_policy().desired())
+    assert [c["name"] for c in diff.added] == ["budget", "rate_limit", "single_tx", "recipient"]
+    assert diff.changed
+
+
+def test_diff_matching_guards_unchanged():
+    """Test equal limits in a different decimal spelling are not rewritten"""
+    current = stored(make_policy())
+    current[0]["daily_limit"] = "1000"
+    diff = diff_guards(current, make_policy().desired())
+    assert not diff.changed
+    assert diff.unchanged == ["budget", "rate_limit", "single_tx", "recipient"]
+
+
+def test_diff_replaces_only_changed_guard():
+    """Test a changed limit replaces just that guard, keeping unrelated guards in place"""
+    current = [{"name": "custom", "guard_type": "confirm"}] + stored(make_policy())
+    diff = diff_guards(current, make_policy(tx_limit=250.0).desired())
+    assert [c["name"] for c in diff.replaced] == ["single_tx"]
+
+    updated = apply_diff(current, diff)
+    assert [c["name"] for c in updated] == ["custom", "budget", "rate_limit", "single_tx", "recipient"]
+    assert updated[3]["max_amount"] == "250.0"
+
+
+def test_diff_collapses_duplicates():
+    """Test duplicate guards left by blind re-application collapse into one"""
+    current = stored(make_policy()) + stored(make_policy())
+    diff = diff_guards(current, make_policy().desired())
+    updated = apply_diff(current, diff)
+    assert sorted(c["name"] for c in updated) == ["budget", "rate_limit", "recipient", "single_tx"]
+
+
+def test_diff_whitelist_incremental():
+    """Test new default recipients are appended and per-wallet additions are kept"""
+    current = stored(make_policy())
+    current[3]["recipient_addresses"] = ["0xaaa", "0xWALLET"]
+    diff = diff_guards(current, make_policy(whitelist=["0xAAA", "0xBBB"]).desired())
+    assert diff.whitelist_additions == ["0xBBB"]
+    assert not diff.replaced
+
+    updated = apply_diff(current, diff)
+    assert updated[3]["recipient_addresses"] == ["0xaaa", "0xWALLET", "0xBBB"]
+
+
+def test_add_addresses_skips_present():
+    """Test whitelist additions ignore case-insensitive duplicates"""
+    config = add_addresses(None, ["0xAAA", "0xAAA"])
+    assert config["recipient_addresses"] == ["0xAAA"]
+    config = add_addresses(config, ["0xaaa", "0xBBB"])
+    assert config["recipient_addresses"] == ["0xAAA", "0xBBB"]
@@ -0,0 +1,178 @@
+import asyncio
+import json
+import pytest
+from redis.exceptions import WatchError
+from omniagentpay.guards.manager import GuardManager
+from omniagentpay.storage.memory import InMemoryStorage
+from omniagentpay.storage.redis import RedisStorage
+from app.payments.guard_store import RedisGuardStore, SDKGuardStore, build_guard_store
+
+
+class FakePipeline:
+    """Transactional pipeline of the stand-in: WATCH, immediate reads, queued MULTI writes."""
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.watched = {}
+        self.queued = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.watched = {}
+
+    async def watch(self, *keys):
+        self.redis.round_trips += 1
+        self.watched = {key: self.redis.versions.get(key, 0) for key in keys}
+
+    async def unwatch(self):
+        self.redis.round_trips += 1
+        self.watched = {}
+
+    async def get(self, key):
+        return await self.redis.get(key)
+
+    def multi(self):
+        self.queued = []
+
+    def set(self, key, value):
+        self.queued.append(("set", key, value))
+
+    def sadd(self, key, *members):
+        self.queued.append(("sadd", key, members))
+
+    async def execute(self):
+        self.redis.round_trips += 1
+        if any(self.redis.versions.get(k, 0) != v for k, v in self.watched.items()):
+            raise WatchError("watched key changed")
+        for op, key, value in self.queued:
+            if op == "set":
+                self.redis.write(key, value)
+            else:
+                self.redis.sets.setdefault(key, set()).update(value)
+
+
+class FakeRedis:
+    """Local stand-in for the Redis commands the guard store and the SDK's RedisStorage use."""
+
+    def __init__(self):
+        self.data = {}
+        self.sets = {}
+        self.versions = {}
+        self.round_trips = 0
+
+    def write(self, key, value):
+        self.data[key] = value
+        self.versions[key] = self.versions.get(key, 0) + 1
+
+    async def get(self, key):
+        self.round_trips += 1
+        return self.data.get(key)
+
+    async def set(self, key, value):
+        self.round_trips += 1
+        self.write(key, value)
+
+    async def sadd(self, key, *members):
+        self.round_trips += 1
+        self.sets.setdefault(key, set()).update(members)
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+def sdk_storage(fake):
+    storage = RedisStorage(redis_url="redis://stand-in")
+    storage._client = fake
+    return storage
+
+
+def guard(name):
+    return {"name": name, "guard_type": "single_tx", "max_amount": "1"}
+
+
+@pytest.mark.asyncio
+async def test_redis_store_shared_between_instances():
+    """Test guards written by one instance are visible to another and to the SDK"""
+    fake = FakeRedis()
+    instance_a = RedisGuardStore(fake, sdk_storage(fake))
+    instance_b = RedisGuardStore(fake, sdk_storage(fake))
+
+    await instance_a.update("wallet-1", lambda current: current + [guard("a"), guard("b"), guard("c")])
+
+    assert [c["name"] for c in await instance_b.load("wallet-1")] == ["a", "b", "c"]
+    manager = GuardManager(instance_b.storage)
+    assert await manager.list_wallet_guard_names("wallet-1") == ["a", "b", "c"]
+    assert fake.sets["omniagentpay:guard_registrations:_index"] == {"wallet:wallet-1"}
+
+
+@pytest.mark.asyncio
+async def test_redis_store_batch_write_is_one_round_trip():
+    """Test several guards are written with a single pipelined transaction"""
+    fake = FakeRedis()
+    store = RedisGuardStore(fake, sdk_storage(fake))
+
+    await store.update("wallet-1", lambda current: current + [guard(n) for n in ("a", "b", "c", "d")])
+
+    # WATCH, GET, then MULTI/SET/SADD/EXEC pipelined together
+    assert fake.round_trips == 3
+    assert store.stats()["writes"] == 1
+
+
+@pytest.mark.asyncio
+async def test_redis_store_retries_on_concurrent_write():
+    """Test a conflicting write from another instance is not lost"""
+    fake = FakeRedis()
+    store = RedisGuardStore(fake, sdk_storage(fake))
+    key = "omniagentpay:guard_registrations:wallet:wallet-1"
+    calls = []
+
+    def mutate(current):
+        calls.append([c["name"] for c in current])
+        if len(calls) == 1:
+            # Another instance writes between our read and our commit
+            fake.write(key, json.dumps({"guards": [guard("other")]}))
+        return current + [guard("mine")]
+
+    result = await store.update("wallet-1", mutate)
+
+    assert calls == [[], ["other"]]
+    assert [c["name"] for c in result] == ["other", "mine"]
+    assert store.stats()["conflicts"] == 1
+
+
+@pytest.mark.asyncio
+async def test_redis_store_noop_update_skips_write():
+    """Test a mutation that changes nothing does not write"""
+    fake = FakeRedis()
+    store = RedisGuardStore(fake, sdk_storage(fake))
+
+    assert await store.update("wallet-1", lambda current: None) == []
+    assert store.stats()["writes"] == 0
+    assert fake.data == {}
+
+
+@pytest.mark.asyncio
+async def test_sdk_store_serializes_updates():
+    """Test concurrent in-process updates to one wallet do not lose writes"""
+    store = SDKGuardStore(InMemoryStorage())
+
+    async def add(name):
+        await store.update("wallet-1", lambda current: current + [guard(name)])
+
+    await asyncio.gather(*(add(f"g{i}") for i in range(10)))
+    assert len(await store.load("wallet-1")) == 10
+
+
+def test_default_store_uses_the_sdk_storage():
+    """Test the default backend wraps the SDK's own storage and leaves its guard manager alone"""
+    storage = InMemoryStorage()
+    manager = GuardManager(storage)
+    sdk = type("SDK", (), {"_storage": storage, "_guard_manager": manager})()
+
+    store = build_guard_store(sdk)
+
+    assert isinstance(store, SDKGuardStore)
+    assert store.storage is storage
+    assert sdk._guard_manager is manager
@@ -0,0 +1,261 @@
+import asyncio
+import json
+import os
+import pytest
+from app.core.config import settings
+from app.payments.guards import (
+    BudgetGuard,
+    GuardEngine,
+    RateLimitGuard,
+    RecipientWhitelistGuard,
+    SingleTransactionGuard
+)
+from app.payments.ledger import SpendLedger
+from app.payments.money import to_micros
+from app.payments.ratelimit import InMemoryRateLimiter
+from app.utils.exceptions import BudgetExceededError, RateLimitExceededError, UnauthorizedRecipientError
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.mark.asyncio
+async def test_budget_guard_hourly_and_daily_windows():
+    """Test spend is checked against both sliding windows"""
+    clock = FakeClock()
+    guard = BudgetGuard(daily_limit=300, hourly_limit=100, ledger=SpendLedger(clock=clock))
+    guard.record(to_micros(80), "wallet-1")
+
+    with pytest.raises(BudgetExceededError, match="Hourly"):
+        await guard.validate(to_micros(30), "wallet-1")
+    await guard.validate(to_micros(30), "wallet-2")
+
+    clock.now += 3600
+    await guard.validate(to_micros(30), "wallet-1")
+    guard.record(to_micros(100), "wallet-1")
+    guard.record(to_micros(100), "wallet-1")
+    clock.now += 3600
+    with pytest.raises(BudgetExceededError, match="Daily"):
+        await guard.validate(to_micros(30), "wallet-1")
+
+    clock.now += 86400
+    await guard.validate(to_micros(30), "wallet-1")
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_guard_peeks_without_consuming():
+    """Test the guard reports exhaustion but leaves tokens to lane admission"""
+    clock = FakeClock()
+    guard = RateLimitGuard(requests_per_min=2, limiter=InMemoryRateLimiter(2, clock=clock))
+
+    await guard.validate(to_micros(1), "wallet-1")
+    await guard.validate(to_micros(1), "wallet-1")
+    await guard.validate(to_micros(1), "wallet-1")
+    await guard.limiter.take("wallet-1")
+    await guard.limiter.take("wallet-1")
+    with pytest.raises(RateLimitExceededError, match="next slot in 30.0s"):
+        await guard.validate(to_micros(1), "wallet-1")
+
+    clock.now += 30
+    await guard.validate(to_micros(1), "wallet-1")
+
+
+@pytest.mark.asyncio
+async def test_whitelist_guard_wallet_overrides():
+    """Test per-wallet whitelist changes take precedence over the default list"""
+    guard = RecipientWhitelistGuard(["0xabc"])
+    with pytest.raises(UnauthorizedRecipientError):
+        await guard.validate(to_micros(1), "wallet-1", "0xdef")
+
+    guard.set_wallet_addresses("wallet-1", ["0xdef"])
+    await guard.validate(to_micros(1), "wallet-1", "0xdef")
+    guard.set_wallet_addresses("wallet-2", None)
+    await guard.validate(to_micros(1), "wallet-2", "0x123")
+
+
+@pytest.mark.asyncio
+async def test_whitelist_guard_confirms_rejections_with_loader():
+    """Test a local rejection is re-checked against the wallet's stored whitelist"""
+    stored = {"wallet-1": ["0xaaa", "0xbbb"], "wallet-2": None}
+
+    async def loader(wallet_id):
+        if wallet_id == "broken":
+            raise ConnectionError("store unavailable")
+        return stored[wallet_id]
+
+    guard = RecipientWhitelistGuard(["0xaaa"], whitelist_file="", wallet_loader=loader)
+    await guard.validate(to_micros(1), "wallet-1", "0xbbb")
+    with pytest.raises(UnauthorizedRecipientError):
+        await guard.validate(to_micros(1), "wallet-1", "0xccc")
+    await guard.validate(to_micros(1), "wallet-2", "0xccc")
+    await guard.validate(to_micros(1), "broken", "0xccc")
+
+
+@pytest.mark.asyncio
+async def test_engine_skips_queueable_guards_on_request():
+    """Test rate limits can be left to lane pacing while other guards still reject"""
+    engine = GuardEngine([SingleTransactionGuard(tx_limit=50), RateLimitGuard(requests_per_min=1)])
+    await engine.rate_limiter.take("wallet-1")
+
+    await engine.check(to_micros(10), "wallet-1", include_queueable=False)
+    with pytest.raises(RateLimitExceededError):
+        await engine.check(to_micros(10), "wallet-1")
+    with pytest.raises(BudgetExceededError):
+        await engine.check(to_micros(60), "wallet-2", include_queueable=False)
+
+    stats = engine.stats()
+    assert (stats["checks"], stats["rejections"]) == (3, 2)
+    assert stats["rate_limiter"]["allowed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_engine_counts_each_reference_once():
+    """Test a payment seen in its result and in a webhook is only counted once"""
+    engine = GuardEngine([BudgetGuard(daily_limit=100, hourly_limit=50)])
+    engine.record(to_micros(30), "wallet-1", ref="tx-1")
+    engine.record_spend(to_micros(30), "wallet-1", ref="tx-1")
+
+    await engine.check(to_micros(20), "wallet-1")
+    engine.record_spend(to_micros(20), "wallet-1", ref="tx-2")
+    with pytest.raises(BudgetExceededError):
+        await engine.check(to_micros(1), "wallet-1")
+    assert engine.stats()["duplicates"] == 1
+    assert engine.stats()["ledger"] == {"wallets": 1, "recorded": 2}
+
+
+def write_policy(path, **policy):
+    path.write_text(json.dumps(policy))
+    return str(path)
+
+
+@pytest.mark.asyncio
+async def test_engine_reload_swaps_snapshot_and_keeps_state(tmp_path):
+    """Test a reload applies new limits while spend and per-wallet whitelists survive"""
+    path = write_policy(tmp_path / "policy.json", tx_limit="50", daily_limit="100", whitelisted_recipients=["0xabc"])
+    engine = GuardEngine.from_policy_file(path)
+    engine.record(to_micros(60), "wallet-1")
+    engine.set_wallet_whitelist("wallet-2", ["0xdef"])
+    before = engine.snapshot
+
+    with pytest.raises(BudgetExceededError, match="limit of 50"):
+        await engine.check(to_micros(60), "wallet-3", "0xabc")
+
+    write_policy(tmp_path / "policy.json", tx_limit="80", daily_limit="100", whitelisted_recipients=["0xabc"])
+    stats = await engine.reload()
+
+    assert stats["version"] == before.version + 1
+    assert stats["fingerprint"] != before.fingerprint
+    assert stats["last_reload_ms"] is not None
+    assert engine.snapshot.policy.tx_limit == "80"
+    await engine.check(to_micros(60), "wallet-3", "0xabc")
+    # Spend recorded under the old snapshot still counts against the daily budget
+    with pytest.raises(BudgetExceededError, match="Daily"):
+        await engine.check(to_micros(50), "wallet-1", "0xabc")
+    await engine.check(to_micros(10), "wallet-2", "0xdef")
+    # A request holding the old snapshot keeps evaluating it
+    with pytest.raises(BudgetExceededError, match="limit of 50"):
+        await engine.check(to_micros(60), "wallet-3", "0xabc", snapshot=before)
+
+
+@pytest.mark.asyncio
+async def test_engine_reload_failure_keeps_policy(tmp_path):
+    """Test a broken policy file leaves the active snapshot in place"""
+    path = write_policy(tmp_path / "policy.json", tx_limit="50")
+    engine = GuardEngine.from_policy_file(path)
+    version = engine.snapshot.version
+
+    write_policy(tmp_path / "policy.json", tx_limit="50", unknown_limit="1")
+    with pytest.raises(ValueError, match="unknown_limit"):
+        await engine.reload()
+
+    assert engine.snapshot.version == version
+    assert engine.stats()["policy"]["reload_failures"] == 1
+    with pytest.raises(ValueError, match="No guard policy file"):
+        await GuardEngine([]).reload()
+
+
+@pytest.mark.asyncio
+async def test_engine_reload_reconfigures_rate_limit(tmp_path):
+    """Test a changed per-minute limit resizes the shared token buckets in place"""
+    path = write_policy(tmp_path / "policy.json", rate_limit_per_min=2)
+    engine = GuardEngine.from_policy_file(path)
+    limiter = engine.rate_limiter
+
+    write_policy(tmp_path / "policy.json", rate_limit_per_min=10)
+    await engine.reload()
+
+    assert engine.rate_limiter is limiter
+    assert limiter.capacity == 10
+
+
+@pytest.mark.asyncio
+async def test_engine_rate_limit_comes_from_policy_file(tmp_path, monkeypatch):
+    """Test the policy file's per-minute limit sizes the buckets at startup, even when settings disable it"""
+    monkeypatch.setattr(settings, "OMNIAGENTPAY_RATE_LIMIT_PER_MIN", 0)
+    engine = GuardEngine.from_policy_file(write_policy(tmp_path / "policy.json", rate_limit_per_min=50))
+
+    assert engine.rate_limit() == (50, engine.rate_limiter)
+    assert engine.rate_limiter.capacity == 50
+    await engine.check(to_micros(1), "wallet-1")
+
+
+@pytest.mark.asyncio
+async def test_engine_watcher_reloads_changed_file(tmp_path):
+    """Test the policy file watcher picks up a modified file"""
+    path = write_policy(tmp_path / "policy.json", tx_limit="50")
+    engine = GuardEngine.from_policy_file(path)
+    engine.start_policy_watcher(0.01)
+    try:
+        write_policy(tmp_path / "policy.json", tx_limit="75")
+        os.utime(path, (engine._policy_mtime + 10, engine._policy_mtime + 10))
+        for _ in range(100):
+            if engine.reloads:
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        await engine.stop_policy_watcher()
+    assert engine.snapshot.policy.tx_limit == "75"
+
+
+def test_guard_defaults_read_settings_at_construction(monkeypatch):
+    """Test limits left unset follow the current settings rather than import-time values"""
+    monkeypatch.setattr(settings, "OMNIAGENTPAY_TX_LIMIT", 42.0)
+    assert SingleTransactionGuard().tx_limit == 42.0
+
+
+@pytest.mark.asyncio
+async def test_check_many_matches_check():
+    """Test the batch pre-check gives each payment the verdict check() would give it alone"""
+    limiter = InMemoryRateLimiter(capacity=1)
+    await limiter.take("busy")
+    engine = GuardEngine([
+        SingleTransactionGuard(tx_limit=100),
+        BudgetGuard(daily_limit=1000, hourly_limit=150),
+        RateLimitGuard(requests_per_min=1, limiter=limiter),
+        RecipientWhitelistGuard(whitelisted_addresses=["0xaaa"], whitelist_file="")
+    ])
+    engine.record(to_micros(100), "spent")
+    payments = [
+        (to_micros(10), "idle", "0xaaa"),
+        (to_micros(200), "idle", "0xaaa"),
+        (to_micros(60), "spent", "0xaaa"),
+        (to_micros(40), "spent", "0xaaa"),
+        (to_micros(10), "busy", "0xaaa"),
+        (to_micros(10), "idle", "0xbbb")
+    ]
+
+    reasons = await engine.check_many(payments)
+
+    for (amount, wallet_id, recipient), reason in zip(payments, reasons):
+        try:
+            await engine.check(amount, wallet_id, recipient)
+            expected = None
+        except (BudgetExceededError, RateLimitExceededError, UnauthorizedRecipientError) as e:
+            expected = e.detail
+        assert reason == expected
+    assert [reason is None for reason in reasons] == [True, False, False, True, False, False]
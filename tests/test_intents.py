@@ -0,0 +1,88 @@
+import pytest
+from app.payments.intents import MAX_PAGE_SIZE, IntentIndex
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def fill(index, count, wallets=("wallet-1", "wallet-2")):
+    for i in range(count):
+        index.add(f"intent-{i}", wallets[i % len(wallets)], "0xabc", "1.0", "requires_confirmation")
+
+
+def test_index_pages_newest_first():
+    """Test cursor pagination walks every intent exactly once, newest first"""
+    index = IntentIndex(maxsize=100)
+    fill(index, 7)
+
+    seen = []
+    cursor = None
+    while True:
+        page = index.list(cursor=cursor, limit=3)
+        seen.extend(item["intent_id"] for item in page["intents"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == [f"intent-{i}" for i in reversed(range(7))]
+
+
+def test_index_clamps_page_size():
+    """Test a non-positive limit still returns a page and an oversized one is capped"""
+    index = IntentIndex(maxsize=MAX_PAGE_SIZE + 10)
+    fill(index, MAX_PAGE_SIZE + 5)
+
+    first = index.list(limit=0)
+    assert len(first["intents"]) == 1
+    assert first["next_cursor"] is not None
+    assert len(index.list(limit=10 ** 9)["intents"]) == MAX_PAGE_SIZE
+
+
+def test_index_filters_by_wallet_and_status():
+    """Test wallet and status filters, including across pages"""
+    index = IntentIndex(maxsize=100)
+    fill(index, 6)
+    index.update("intent-4", "succeeded", transaction_id="tx-4")
+
+    wallet_page = index.list(wallet_id="wallet-1", limit=2)
+    assert [i["intent_id"] for i in wallet_page["intents"]] == ["intent-4", "intent-2"]
+    rest = index.list(wallet_id="wallet-1", cursor=wallet_page["next_cursor"], limit=2)
+    assert [i["intent_id"] for i in rest["intents"]] == ["intent-0"]
+    assert rest["next_cursor"] is None
+
+    open_intents = index.list(wallet_id="wallet-1", status="requires_confirmation")
+    assert [i["intent_id"] for i in open_intents["intents"]] == ["intent-2", "intent-0"]
+    assert index.list(wallet_id="unknown") == {"intents": [], "next_cursor": None}
+    with pytest.raises(ValueError):
+        index.list(cursor="not-a-cursor")
+
+
+def test_index_updates_by_transaction():
+    """Test webhook-style updates find the intent through its transaction"""
+    clock = FakeClock()
+    index = IntentIndex(maxsize=10, clock=clock)
+    index.add("intent-1", "wallet-1", "0xabc", "5.0", "requires_confirmation")
+    clock.now = 10
+    index.update("intent-1", "processing", transaction_id="tx-1")
+
+    record = index.update_by_transaction("tx-1", "failed")
+    assert record["status"] == "failed"
+    assert record["updated_at"] == 10
+    assert index.update_by_transaction("tx-unknown", "failed") is None
+
+
+def test_index_evicts_oldest_when_full():
+    """Test the index stays bounded and forgets the oldest intents"""
+    index = IntentIndex(maxsize=3)
+    fill(index, 5)
+
+    assert len(index) == 3
+    assert index.get("intent-0") is None
+    assert index.stats()["evictions"] == 2
+    assert [i["intent_id"] for i in index.list()["intents"]] == ["intent-4", "intent-3", "intent-2"]
+    assert index.remove("intent-3")["intent_id"] == "intent-3"
+    assert [i["intent_id"] for i in index.list(wallet_id="wallet-2")["intents"]] == []
@@ -0,0 +1,125 @@
+import asyncio
+import pytest
+from app.payments.lanes import LaneScheduler
+from app.utils.exceptions import RateLimitExceededError
+
+
+class FakeTime:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def clock(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.mark.asyncio
+async def test_lane_serializes_same_wallet():
+    """Test that payments for one wallet never overlap and keep FIFO order"""
+    lanes = LaneScheduler(max_per_minute=0, max_wait=5)
+    active = 0
+    peak = 0
+    order = []
+
+    async def run(i):
+        nonlocal active, peak
+        async with lanes.slot("wallet-1"):
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.001)
+            order.append(i)
+            active -= 1
+
+    await asyncio.gather(*(run(i) for i in range(5)))
+    assert peak == 1
+    assert order == [0, 1, 2, 3, 4]
+
+
+@pytest.mark.asyncio
+async def test_lanes_for_different_wallets_run_in_parallel():
+    """Test that one wallet's lane does not block another"""
+    lanes = LaneScheduler(max_per_minute=0, max_wait=5)
+    release = asyncio.Event()
+
+    async def hold():
+        async with lanes.slot("wallet-1"):
+            await release.wait()
+
+    holder = asyncio.create_task(hold())
+    await asyncio.sleep(0)
+    async with lanes.slot("wallet-2"):
+        pass
+    release.set()
+    await holder
+
+
+@pytest.mark.asyncio
+async def test_lane_paces_to_budget_instead_of_rejecting():
+    """Test that payments over the per-minute budget wait for the window"""
+    fake = FakeTime()
+    lanes = LaneScheduler(max_per_minute=2, max_wait=120, clock=fake.clock, sleep=fake.sleep)
+
+    for _ in range(3):
+        async with lanes.slot("wallet-1"):
+            pass
+
+    assert fake.sleeps == [60.0]
+    assert lanes.stats()["paced"] == 1
+    assert lanes.stats()["admitted"] == 3
+
+
+@pytest.mark.asyncio
+async def test_lane_pacing_follows_current_policy():
+    """Test the per-minute budget is read on every dispatch, so a policy change applies at once"""
+    fake = FakeTime()
+    budget = [0]
+    lanes = LaneScheduler(max_per_minute=0, max_wait=120, clock=fake.clock, sleep=fake.sleep,
+                          pacing=lambda: (budget[0], None))
+
+    for _ in range(2):
+        async with lanes.slot("wallet-1"):
+            pass
+    assert fake.sleeps == []
+
+    budget[0] = 2
+    async with lanes.slot("wallet-1"):
+        pass
+    assert fake.sleeps == [60.0]
+
+
+@pytest.mark.asyncio
+async def test_lane_rejects_when_pacing_exceeds_deadline():
+    """Test deadline-aware rejection when the budget frees up too late"""
+    fake = FakeTime()
+    lanes = LaneScheduler(max_per_minute=1, max_wait=120, clock=fake.clock, sleep=fake.sleep)
+
+    async with lanes.slot("wallet-1"):
+        pass
+    with pytest.raises(RateLimitExceededError):
+        async with lanes.slot("wallet-1", max_wait=10):
+            pass
+    assert lanes.stats()["rejected"] == 1
+    assert fake.sleeps == []
+
+
+@pytest.mark.asyncio
+async def test_lane_rejects_when_queue_wait_exceeds_deadline():
+    """Test that waiting behind a slow payment respects max_wait"""
+    lanes = LaneScheduler(max_per_minute=0, max_wait=5)
+    release = asyncio.Event()
+
+    async def hold():
+        async with lanes.slot("wallet-1"):
+            await release.wait()
+
+    holder = asyncio.create_task(hold())
+    await asyncio.sleep(0)
+    with pytest.raises(RateLimitExceededError):
+        async with lanes.slot("wallet-1", max_wait=0.01):
+            pass
+    release.set()
+    await holder
@@ -0,0 +1,63 @@
+from app.payments.ledger import SpendLedger, SpendWindow
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_window_rolls_buckets_off():
+    """Test spend leaves the total once its bucket leaves the span"""
+    window = SpendWindow(span=60, buckets=6)
+    window.add(5, now=0)
+    window.add(3, now=25)
+
+    assert window.total(now=59) == 8
+    assert window.total(now=60) == 3
+    assert window.total(now=79) == 3
+    assert window.total(now=80) == 0
+
+
+def test_window_never_overcounts_exact_span():
+    """Test the bucketed total is at most the exact rolling total"""
+    window = SpendWindow(span=60, buckets=6)
+    events = [(t, t % 7 + 1) for t in range(0, 300, 3)]
+    for t, amount in events:
+        window.add(amount, now=t)
+        exact = sum(a for ts, a in events if t - 60 < ts <= t)
+        assert window.total(now=t) <= exact
+
+
+def test_window_long_gap_resets():
+    """Test a gap longer than the span clears everything at once"""
+    window = SpendWindow(span=60, buckets=6)
+    window.add(5, now=0)
+    window.add(1, now=1000)
+    assert window.total(now=1000) == 1
+
+
+def test_window_backdated_spend():
+    """Test late events land in their own bucket or are dropped if too old"""
+    window = SpendWindow(span=60, buckets=6)
+    window.add_at(2, at=95, now=100)
+    window.add_at(9, at=10, now=100)
+    assert window.total(now=100) == 2
+    assert window.total(now=100 + 50) == 0
+
+
+def test_ledger_hourly_and_daily_totals():
+    """Test per-wallet totals over both windows"""
+    clock = FakeClock()
+    ledger = SpendLedger(clock=clock)
+    ledger.record("wallet-1", 10)
+    ledger.record("wallet-2", 1)
+    clock.now = 3600
+    ledger.record("wallet-1", 5)
+
+    assert ledger.hourly("wallet-1") == 5
+    assert ledger.daily("wallet-1") == 15
+    assert ledger.daily("unknown") == 0
+    assert ledger.stats() == {"wallets": 2, "recorded": 3}
@@ -0,0 +1,44 @@
+import pytest
+from decimal import Decimal
+from app.payments.money import format_micros, to_micros
+from app.payments.service import PaymentRequest
+
+
+def test_to_micros_is_exact():
+    """Test amounts parse to exact integer micro-USDC"""
+    assert to_micros("10.50") == 10_500_000
+    assert to_micros("0.000001") == 1
+    assert to_micros(Decimal("1e2")) == 100_000_000
+    assert to_micros(0.1) == 100_000
+    assert to_micros(5) == 5_000_000
+    assert to_micros("0.1") + to_micros("0.2") == to_micros("0.3")
+
+
+@pytest.mark.parametrize("value", ["abc", "1.0000001", "NaN", "Infinity", ""])
+def test_to_micros_rejects_invalid(value):
+    """Test non-numeric, non-finite and sub-micro amounts are rejected"""
+    with pytest.raises(ValueError):
+        to_micros(value)
+
+
+def test_format_micros():
+    """Test canonical formatting drops trailing zeros"""
+    assert format_micros(10_500_000) == "10.5"
+    assert format_micros(100_000_000) == "100"
+    assert format_micros(1) == "0.000001"
+    assert format_micros(-2_500_000) == "-2.5"
+
+
+def test_payment_request_amount_validation():
+    """Test payment input is validated in micro-USDC"""
+    assert PaymentRequest(from_wallet_id="w", to_address="0x1", amount="10.5").amount_micros == 10_500_000
+    for amount in ["0", "-1", "1.0000001", "ten"]:
+        with pytest.raises(ValueError):
+            PaymentRequest(from_wallet_id="w", to_address="0x1", amount=amount)
+
+
+def test_fingerprint_ignores_amount_formatting():
+    """Test equivalent amount spellings bind to the same idempotency fingerprint"""
+    first = PaymentRequest(from_wallet_id="w", to_address="0x1", amount="10.50")
+    second = PaymentRequest(from_wallet_id="w", to_address="0x1", amount="10.5")
+    assert first.fingerprint() == second.fingerprint()
@@ -1,8 +1,17 @@
+import asyncio
 import pytest
 from unittest.mock import AsyncMock, MagicMock, patch
 from decimal import Decimal
+from omniagentpay.guards.budget import BudgetGuard as SDKBudgetGuard
+from omniagentpay.guards.manager import GuardManager
+from omniagentpay.guards.recipient import RecipientGuard
+from omniagentpay.storage.memory import InMemoryStorage
+from app.payments.guard_store import SDKGuardStore
+from app.payments.guards import BudgetGuard, GuardEngine, RecipientWhitelistGuard, SingleTransactionGuard, compile_guards
+from app.payments.money import to_micros
 from app.payments.omni_client import OmniAgentPaymentClient
 from app.core.config import settings
+from app.utils.exceptions import GuardValidationError
 
 
 @pytest.fixture
@@ -19,6 +28,7 @@ def payment_client(mock_omni_client):
     """Create OmniAgentPaymentClient instance"""
     client = OmniAgentPaymentClient()
     client._client = mock_omni_client
+    client._guard_store = SDKGuardStore(InMemoryStorage())
     return client
 
 
@@ -32,18 +42,16 @@ async def test_create_agent_wallet(payment_client, mock_omni_client):
     mock_wallet.state = "active"
     
     mock_omni_client.create_wallet = AsyncMock(return_value=mock_wallet)
-    mock_omni_client.add_budget_guard = AsyncMock()
-    mock_omni_client.add_rate_limit_guard = AsyncMock()
-    mock_omni_client.add_single_tx_guard = AsyncMock()
     
     result = await payment_client.create_agent_wallet("test_agent")
     
     assert result["wallet_id"] == "wallet-123"
     assert result["address"] == "0x123"
     mock_omni_client.create_wallet.assert_called_once()
-    mock_omni_client.add_budget_guard.assert_called_once()
-    mock_omni_client.add_rate_limit_guard.assert_called_once()
-    mock_omni_client.add_single_tx_guard.assert_called_once()
+    names = [c["name"] for c in await payment_client._guard_store.load("wallet-123")]
+    assert {"budget", "rate_limit", "single_tx"} <= set(names)
+    # All guards are attached with a single write
+    assert payment_client._guard_store.writes == 1
 
 
 @pytest.mark.asyncio
@@ -56,10 +64,6 @@ async def test_create_agent_wallet_no_recipient_guard_when_empty(payment_client,
     mock_wallet.state = "active"
     
     mock_omni_client.create_wallet = AsyncMock(return_value=mock_wallet)
-    mock_omni_client.add_budget_guard = AsyncMock()
-    mock_omni_client.add_rate_limit_guard = AsyncMock()
-    mock_omni_client.add_single_tx_guard = AsyncMock()
-    mock_omni_client.add_recipient_guard = AsyncMock()
     
     # Temporarily set whitelist to empty
     original_whitelist = settings.OMNIAGENTPAY_WHITELISTED_RECIPIENTS
@@ -67,8 +71,9 @@ async def test_create_agent_wallet_no_recipient_guard_when_empty(payment_client,
     
     try:
         result = await payment_client.create_agent_wallet("test_agent")
-        # Recipient guard should not be called when whitelist is empty
-        mock_omni_client.add_recipient_guard.assert_not_called()
+        # Recipient guard should not be added when whitelist is empty
+        names = [c["name"] for c in await payment_client._guard_store.load("wallet-123")]
+        assert "recipient" not in names
     finally:
         settings.OMNIAGENTPAY_WHITELISTED_RECIPIENTS = original_whitelist
 
@@ -205,6 +210,9 @@ async def test_confirm_intent(payment_client, mock_omni_client):
     mock_result.error = None
     
     mock_omni_client.confirm_payment_intent = AsyncMock(return_value=mock_result)
+    mock_omni_client.get_payment_intent = AsyncMock(
+        return_value=MagicMock(wallet_id="wallet-1", recipient="0x123", amount=Decimal("10.0"))
+    )
     
     result = await payment_client.confirm_intent("intent-123")
     
@@ -246,28 +254,55 @@ async def test_get_wallet_usdc_balance_zero(payment_client, mock_omni_client):
 @pytest.mark.asyncio
 async def test_remove_recipient_guard(payment_client, mock_omni_client):
     """Test removing recipient guard"""
-    mock_omni_client._guard_manager = MagicMock()
-    mock_omni_client._guard_manager.remove_guard = AsyncMock(return_value=True)
+    manager = GuardManager(payment_client._guard_store.storage)
+    await manager.add_guard("wallet-1", RecipientGuard(addresses=["0x123"]))
+    await manager.add_guard("wallet-1", SDKBudgetGuard(daily_limit=Decimal("10")))
     
     result = await payment_client.remove_recipient_guard("wallet-1")
     
     assert result["status"] == "success"
-    mock_omni_client._guard_manager.remove_guard.assert_called_once_with("wallet-1", "recipient")
+    assert await manager.list_wallet_guard_names("wallet-1") == ["budget"]
+    assert (await payment_client.remove_recipient_guard("wallet-1"))["status"] == "info"
 
 
 @pytest.mark.asyncio
 async def test_add_recipient_to_whitelist(payment_client, mock_omni_client):
-    """Test adding recipient to whitelist"""
-    mock_omni_client._guard_manager = MagicMock()
-    mock_omni_client._guard_manager.remove_guard = AsyncMock(return_value=True)
-    mock_omni_client.list_guards = AsyncMock(return_value=["recipient", "budget"])
-    mock_omni_client.add_recipient_guard = AsyncMock()
-    
+    """Test whitelist additions extend the existing recipient guard in place"""
+    manager = GuardManager(payment_client._guard_store.storage)
+    await manager.add_guard("wallet-1", RecipientGuard(addresses=["0x123"]))
+    await manager.add_guard("wallet-1", SDKBudgetGuard(daily_limit=Decimal("10")))
+
     result = await payment_client.add_recipient_to_whitelist("wallet-1", ["0x123", "0x456"])
-    
+
     assert result["status"] == "success"
-    assert len(result["whitelisted_addresses"]) == 2
-    mock_omni_client.add_recipient_guard.assert_called_once()
+    assert result["whitelisted_addresses"] == ["0x123", "0x456"]
+    assert result["added_addresses"] == ["0x456"]
+    names = await manager.list_wallet_guard_names("wallet-1")
+    assert names == ["recipient", "budget"]
+
+
+@pytest.mark.asyncio
+async def test_add_recipient_to_whitelist_creates_guard(payment_client, mock_omni_client):
+    """Test a recipient guard is created when the wallet has none"""
+    result = await payment_client.add_recipient_to_whitelist("wallet-1", ["0x123"])
+
+    assert result["added_addresses"] == ["0x123"]
+    chain = await GuardManager(payment_client._guard_store.storage).get_wallet_guards("wallet-1")
+    assert [guard.name for guard in chain] == ["recipient"]
+
+
+@pytest.mark.asyncio
+async def test_whitelist_added_elsewhere_is_honoured_locally(payment_client, mock_omni_client):
+    """Test a per-wallet whitelist in the guard store is read back instead of rejecting on the default list"""
+    await payment_client.add_recipient_to_whitelist("wallet-1", ["0xaaa", "0xbbb"])
+    # A restarted (or other) instance: same guard store, fresh local guards
+    engine = GuardEngine([RecipientWhitelistGuard(["0xaaa"], whitelist_file="")])
+    engine.set_wallet_whitelist_loader(payment_client._stored_wallet_whitelist)
+
+    await engine.check(to_micros(1), "wallet-1", "0xbbb")
+    await engine.check(to_micros(1), "wallet-2", "0xbbb")
+    with pytest.raises(GuardValidationError):
+        await engine.check(to_micros(1), "wallet-1", "0xccc")
 
 
 @pytest.mark.asyncio
@@ -302,6 +337,7 @@ async def test_confirm_intent_balance_error(payment_client, mock_omni_client):
     )
     mock_intent = MagicMock()
     mock_intent.wallet_id = "wallet-1"
+    mock_intent.recipient = "0x123"
     mock_intent.amount = Decimal("10.0")
     mock_omni_client.get_payment_intent = AsyncMock(return_value=mock_intent)
     mock_omni_client.get_balance = AsyncMock(return_value=Decimal("0"))
@@ -310,3 +346,523 @@ async def test_confirm_intent_balance_error(payment_client, mock_omni_client):
         await payment_client.confirm_intent("intent-123")
     
     assert "insufficient" in str(exc_info.value).lower() or "balance" in str(exc_info.value).lower()
+
+
+def mock_intent(intent_id="intent-1", amount="10.0"):
+    intent = MagicMock()
+    intent.id = intent_id
+    intent.amount = Decimal(amount)
+    intent.status = "requires_confirmation"
+    intent.recipient = "0x123"
+    intent.created_at = None
+    return intent
+
+
+@pytest.mark.asyncio
+async def test_create_payment_intent_populates_index(payment_client, mock_omni_client):
+    """Test created intents are indexed locally and listed newest first"""
+    mock_omni_client.get_balance = AsyncMock(return_value=Decimal("100"))
+    for i in range(3):
+        mock_omni_client.create_payment_intent = AsyncMock(return_value=mock_intent(f"intent-{i}"))
+        await payment_client.create_payment_intent("wallet-1", "0x123", "10.0")
+
+    page = payment_client.list_payment_intents(wallet_id="wallet-1", limit=2)
+    assert [i["intent_id"] for i in page["intents"]] == ["intent-2", "intent-1"]
+    assert page["intents"][0]["status"] == "requires_confirmation"
+    rest = payment_client.list_payment_intents(wallet_id="wallet-1", cursor=page["next_cursor"])
+    assert [i["intent_id"] for i in rest["intents"]] == ["intent-0"]
+
+
+@pytest.mark.asyncio
+async def test_confirm_intent_diagnostics_use_index(payment_client, mock_omni_client):
+    """Test a failed confirm of an indexed intent is explained without SDK lookups"""
+    mock_omni_client.get_balance = AsyncMock(return_value=Decimal("4"))
+    mock_omni_client.create_payment_intent = AsyncMock(return_value=mock_intent(amount="3.0"))
+    await payment_client.create_payment_intent("wallet-1", "0x123", "3.0")
+    mock_omni_client.confirm_payment_intent = AsyncMock(side_effect=Exception("Insufficient balance"))
+    mock_omni_client.get_payment_intent = AsyncMock()
+
+    with pytest.raises(Exception) as exc_info:
+        await payment_client.confirm_intent("intent-1")
+
+    assert "Required: 3.0 USDC" in str(exc_info.value)
+    mock_omni_client.get_payment_intent.assert_not_called()
+    assert mock_omni_client.get_balance.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_confirm_intent_updates_index(payment_client, mock_omni_client):
+    """Test confirming records the outcome and transaction in the index"""
+    mock_omni_client.get_balance = AsyncMock(return_value=Decimal("100"))
+    mock_omni_client.create_payment_intent = AsyncMock(return_value=mock_intent())
+    await payment_client.create_payment_intent("wallet-1", "0x123", "10.0")
+    mock_result = MagicMock()
+    mock_result.success = True
+    mock_result.transaction_id = "tx-1"
+    mock_result.amount = Decimal("10.0")
+    mock_omni_client.confirm_payment_intent = AsyncMock(return_value=mock_result)
+    mock_omni_client.get_payment_intent = AsyncMock()
+
+    await payment_client.confirm_intent("intent-1")
+
+    record = payment_client.intent_index.get("intent-1")
+    assert record["status"] == "succeeded"
+    assert record["transaction_id"] == "tx-1"
+    mock_omni_client.get_payment_intent.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_intents_cannot_over_commit(payment_client, mock_omni_client):
+    """Test outstanding intents reserve balance so concurrent intents fail fast"""
+    mock_omni_client.get_balance = AsyncMock(return_value=Decimal("100"))
+    created = iter(range(100))
+
+    async def create(**kwargs):
+        await asyncio.sleep(0)
+        return mock_intent(f"intent-{next(created)}")
+
+    mock_omni_client.create_payment_intent = AsyncMock(side_effect=create)
+    results = await asyncio.gather(
+        *(payment_client.create_payment_intent("wallet-1", "0x123", "10.0") for _ in range(50)),
+        return_exceptions=True
+    )
+
+    failures = [r for r in results if isinstance(r, Exception)]
+    assert len(failures) == 40
+    assert "reserved by outstanding payment intents" in str(failures[0])
+    assert mock_omni_client.create_payment_intent.await_count == 10
+    assert payment_client.reservations.reserved("wallet-1") == 100_000_000
+
+
+@pytest.mark.asyncio
+async def test_create_payment_intent_rejects_invalid_amount(payment_client, mock_omni_client):
+    """Test malformed amounts are rejected instead of creating an intent without a reservation"""
+    mock_omni_client.get_balance = AsyncMock(return_value=Decimal("100"))
+    mock_omni_client.create_payment_intent = AsyncMock(return_value=mock_intent())
+
+    for amount in ("ten", "1.0000001", "0", "-5"):
+        with pytest.raises(ValueError, match="Amount must be"):
+            await payment_client.create_payment_intent("wallet-1", "0x123", amount)
+
+    mock_omni_client.create_payment_intent.assert_not_called()
+    assert len(payment_client.reservations) == 0
+
+
+@pytest.mark.asyncio
+async def test_reservations_released_when_intents_settle(payment_client, mock_omni_client):
+    """Test confirms, webhooks and failed creates free reserved balance"""
+    mock_omni_client.get_balance = AsyncMock(return_value=Decimal("100"))
+    mock_omni_client.create_payment_intent = AsyncMock(return_value=mock_intent("intent-1", "60.0"))
+    await payment_client.create_payment_intent("wallet-1", "0x123", "60.0")
+    mock_omni_client.create_payment_intent = AsyncMock(return_value=mock_intent("intent-2", "40.0"))
+    await payment_client.create_payment_intent("wallet-1", "0x123", "40.0")
+
+    mock_omni_client.create_payment_intent = AsyncMock(side_effect=Exception("upstream error"))
+    with pytest.raises(Exception):
+        await payment_client.create_payment_intent("wallet-1", "0x123", "1.0")
+    with pytest.raises(Exception):
+        await payment_client.create_payment_intent("wallet-1", "0x123", "1.0")
+    assert len(payment_client.reservations) == 2
+
+    mock_result = MagicMock()
+    mock_result.success = False
+    mock_result.transaction_id = "tx-1"
+    mock_omni_client.confirm_payment_intent = AsyncMock(return_value=mock_result)
+    await payment_client.confirm_intent("intent-1")
+    assert payment_client.reservations.reserved("wallet-1") == 40_000_000
+
+    payment_client.intent_index.update("intent-2", "processing", transaction_id="tx-2")
+    payment_client.settle_intent("succeeded", transaction_id="tx-2")
+    assert payment_client.reservations.reserved("wallet-1") == 0
+    assert payment_client.intent_index.get("intent-2")["status"] == "succeeded"
+
+
+@pytest.mark.asyncio
+async def test_expired_intents_are_cancelled_and_forgotten(payment_client, mock_omni_client):
+    """Test the expiry sweep cancels stale intents and frees their index and reservation state"""
+    mock_omni_client.get_balance = AsyncMock(return_value=Decimal("100"))
+    for intent_id in ["intent-1", "intent-2", "intent-3"]:
+        mock_omni_client.create_payment_intent = AsyncMock(return_value=mock_intent(intent_id))
+        await payment_client.create_payment_intent("wallet-1", "0x123", "10.0")
+
+    async def cancel(intent_id):
+        if intent_id == "intent-2":
+            raise Exception("Cannot cancel intent in status: processing")
+        if intent_id == "intent-3":
+            raise Exception("connection reset")
+
+    mock_omni_client.cancel_payment_intent = AsyncMock(side_effect=cancel)
+    retry = await payment_client._expire_intents(["intent-1", "intent-2", "intent-3"])
+
+    assert retry == ["intent-3"]
+    assert payment_client.intent_index.get("intent-1") is None
+    assert payment_client.intent_index.get("intent-2") is not None
+    assert payment_client.reservations.reserved("wallet-1") == 20_000_000
+    assert payment_client.get_metrics()["intent_sweeper"]["tracked"] == 3
+
+
+@pytest.mark.asyncio
+async def test_confirm_intents_batch_orders_per_wallet(payment_client, mock_omni_client):
+    """Test batch confirms keep one wallet's intents in order and classify each failure"""
+    for intent_id, wallet_id in [("a1", "wallet-a"), ("b1", "wallet-b"), ("a2", "wallet-a"), ("gone", "wallet-c")]:
+        payment_client.intent_index.add(intent_id, wallet_id, "0x123", "1.0", "requires_confirmation")
+    started = []
+
+    async def confirm(intent_id):
+        started.append(intent_id)
+        if intent_id == "gone":
+            raise Exception("Payment intent gone not found")
+        result = MagicMock()
+        result.success = intent_id != "b1"
+        result.transaction_id = f"tx-{intent_id}"
+        result.amount = Decimal("1.0")
+        result.error = "rejected"
+        return result
+
+    mock_omni_client.confirm_payment_intent = AsyncMock(side_effect=confirm)
+    result = await payment_client.confirm_intents_batch(["a1", "b1", "a2", "gone"], concurrency=2)
+
+    assert [item["intent_id"] for item in result["results"]] == ["a1", "b1", "a2", "gone"]
+    assert started.index("a1") < started.index("a2")
+    assert result["succeeded"] == 2
+    assert result["results"][1]["error_type"] == "payment_failed"
+    assert result["results"][3]["error_type"] == "not_found"
+    assert payment_client.intent_index.get("a2")["status"] == "succeeded"
+
+
+@pytest.mark.asyncio
+async def test_confirm_intents_batch_rejects_bad_input(payment_client):
+    """Test empty and oversized batches are rejected before any confirm"""
+    with pytest.raises(ValueError):
+        await payment_client.confirm_intents_batch([])
+    with pytest.raises(ValueError):
+        await payment_client.confirm_intents_batch(["i"] * (settings.OMNIAGENTPAY_BATCH_MAX_ITEMS + 1))
+
+
+@pytest.mark.asyncio
+async def test_simulate_payment_uses_wallet_cache(payment_client, mock_omni_client):
+    """Test that repeated simulations resolve the wallet from cache"""
+    mock_wallet = MagicMock()
+    mock_wallet.blockchain = "ARC-TESTNET"
+    mock_wallet.address = "0xabc"
+    mock_omni_client.get_wallet = AsyncMock(return_value=mock_wallet)
+
+    mock_result = MagicMock()
+    mock_result.would_succeed = True
+    mock_result.estimated_fee = Decimal("0.1")
+    mock_omni_client.simulate = AsyncMock(return_value=mock_result)
+
+    for _ in range(3):
+        await payment_client.simulate_payment(
+            from_wallet_id="wallet-1",
+            to_address="0x123",
+            amount="10.0"
+        )
+
+    mock_omni_client.get_wallet.assert_called_once_with("wallet-1")
+    stats = payment_client.get_metrics()["wallet_cache"]
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+
+
+@pytest.mark.asyncio
+async def test_simulate_payments_batch(payment_client, mock_omni_client):
+    """Test batch simulation checks guards locally, resolves each wallet once and keeps input order"""
+    payment_client._guard_engine = GuardEngine([BudgetGuard(daily_limit=1000, hourly_limit=100)])
+
+    async def get_wallet(wallet_id):
+        if wallet_id == "missing":
+            raise Exception("Wallet not found")
+        return MagicMock()
+
+    mock_omni_client.get_wallet = AsyncMock(side_effect=get_wallet)
+    mock_result = MagicMock()
+    mock_result.would_succeed = True
+    mock_result.estimated_fee = Decimal("0.1")
+    mock_omni_client.simulate = AsyncMock(return_value=mock_result)
+
+    result = await payment_client.simulate_payments([
+        {"from_wallet_id": "wallet-1", "to_address": "0x1", "amount": "10"},
+        {"from_wallet_id": "wallet-1", "to_address": "0x2", "amount": "500"},
+        {"from_wallet_id": "wallet-2", "to_address": "0x3", "amount": "20"},
+        {"from_wallet_id": "wallet-1", "to_address": "0x4", "amount": "30"},
+        {"from_wallet_id": "missing", "to_address": "0x5", "amount": "1"},
+        {"from_wallet_id": "wallet-1", "to_address": "0x6", "amount": "abc"}
+    ])
+
+    assert [item["index"] for item in result["results"]] == [0, 1, 2, 3, 4, 5]
+    assert result["results"][1]["checked_locally"] is True
+    assert "Hourly budget" in result["results"][1]["reason"]
+    assert result["results"][3]["simulation_token"]
+    assert result["results"][4]["status"] == "error"
+    assert "Invalid input" in result["results"][5]["message"]
+    assert (result["passed"], result["rejected"], result["failed"]) == (3, 1, 2)
+    assert mock_omni_client.simulate.await_count == 3
+    assert sorted(c.args[0] for c in mock_omni_client.get_wallet.await_args_list) == ["missing", "wallet-1", "wallet-2"]
+
+
+@pytest.mark.asyncio
+async def test_simulate_payments_invalid_item_does_not_shift_amounts(payment_client, mock_omni_client):
+    """Test an item rejected after its amount parsed leaves later items with their own amounts"""
+    payment_client._guard_engine = GuardEngine([SingleTransactionGuard(tx_limit=100)])
+    mock_omni_client.get_wallet = AsyncMock(return_value=MagicMock())
+    mock_omni_client.simulate = AsyncMock(return_value=MagicMock(would_succeed=True, estimated_fee=Decimal("0")))
+
+    result = await payment_client.simulate_payments([
+        {"from_wallet_id": "wallet-1", "amount": "1"},
+        {"from_wallet_id": "wallet-1", "to_address": "0x1", "amount": "5000"}
+    ])
+
+    assert "Invalid input" in result["results"][0]["message"]
+    assert result["results"][1]["checked_locally"] is True
+    assert "simulation_token" not in result["results"][1]
+    mock_omni_client.simulate.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_simulate_payment_caches_wallet_not_found(payment_client, mock_omni_client):
+    """Test that a missing wallet is negatively cached"""
+    mock_omni_client.get_wallet = AsyncMock(side_effect=Exception("Wallet not found"))
+    mock_omni_client.simulate = AsyncMock()
+
+    for _ in range(2):
+        with pytest.raises(Exception, match="Wallet not found"):
+            await payment_client.simulate_payment(
+                from_wallet_id="missing",
+                to_address="0x123",
+                amount="10.0"
+            )
+
+    mock_omni_client.get_wallet.assert_called_once_with("missing")
+    mock_omni_client.simulate.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_get_wallet_usdc_balance_cached(payment_client, mock_omni_client):
+    """Test that balance lookups are cached and fresh=True bypasses the cache"""
+    mock_omni_client.get_balance = AsyncMock(return_value=Decimal("100.0"))
+
+    await payment_client.get_wallet_usdc_balance("wallet-1")
+    await payment_client.get_wallet_usdc_balance("wallet-1")
+    assert mock_omni_client.get_balance.call_count == 1
+
+    mock_omni_client.get_balance = AsyncMock(return_value=Decimal("90.0"))
+    result = await payment_client.get_wallet_usdc_balance("wallet-1", fresh=True)
+    assert result["usdc_balance"] == "90.0"
+    mock_omni_client.get_balance.assert_called_once_with("wallet-1")
+
+
+@pytest.mark.asyncio
+async def test_invalidate_balance(payment_client, mock_omni_client):
+    """Test that invalidation forces the next lookup upstream"""
+    mock_omni_client.get_balance = AsyncMock(return_value=Decimal("100.0"))
+
+    await payment_client.get_wallet_usdc_balance("wallet-1")
+    assert payment_client.invalidate_balance("wallet-1") is True
+    await payment_client.get_wallet_usdc_balance("wallet-1")
+    assert mock_omni_client.get_balance.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_add_default_guards_reconciles(payment_client, mock_omni_client):
+    """Test re-applying default guards only writes what differs from the policy"""
+    storage = payment_client._guard_store.storage
+    storage.save = AsyncMock(wraps=storage.save)
+
+    first = await payment_client.add_default_guards("wallet-1")
+    assert first["status"] == "guards_applied"
+    assert first["changed"] is True
+    assert storage.save.await_count == 1
+
+    second = await payment_client.add_default_guards("wallet-1")
+    assert second["changed"] is False
+    assert sorted(second["unchanged"]) == sorted(second["guards"])
+    assert storage.save.await_count == 1
+
+    # A new policy (e.g. a reloaded policy file) only touches the changed guard
+    payment_client._guard_engine = GuardEngine(compile_guards({"tx_limit": 250.0}))
+    third = await payment_client.add_default_guards("wallet-1")
+    assert third["replaced"] == ["single_tx"]
+    assert storage.save.await_count == 2
+    names = await GuardManager(storage).list_wallet_guard_names("wallet-1")
+    assert sorted(names) == sorted(first["guards"])
+
+
+@pytest.mark.asyncio
+async def test_reconcile_updates_local_wallet_whitelist(payment_client, mock_omni_client):
+    """Test addresses a reconcile allows upstream are no longer rejected by a stale local override"""
+    before = GuardEngine(compile_guards({"whitelisted_recipients": ["0xaaa"], "whitelist_file": ""}))
+    before.set_wallet_whitelist("wallet-1", ["0xaaa"])
+    # A reloaded policy keeps the per-wallet overrides of the previous guards
+    payment_client._guard_engine = GuardEngine(
+        compile_guards({"whitelisted_recipients": ["0xaaa", "0xbbb"], "whitelist_file": ""}, before.guards)
+    )
+
+    await payment_client.reconcile_guards("wallet-1")
+
+    await payment_client._guard_engine.check(to_micros(1), "wallet-1", "0xbbb")
+
+
+@pytest.mark.asyncio
+async def test_create_agent_wallet_guard_failure_attaches_nothing(payment_client, mock_omni_client):
+    """Test a failed guard write leaves the wallet with no partial guard set"""
+    mock_wallet = MagicMock()
+    mock_wallet.id = "wallet-123"
+    mock_omni_client.create_wallet = AsyncMock(return_value=mock_wallet)
+    payment_client._guard_store.storage.save = AsyncMock(side_effect=Exception("storage unavailable"))
+
+    with pytest.raises(Exception) as exc_info:
+        await payment_client.create_agent_wallet("test_agent")
+
+    error_msg = str(exc_info.value)
+    assert "wallet-123" in error_msg
+    assert "storage unavailable" in error_msg
+    assert await payment_client._guard_store.load("wallet-123") == []
+
+
+@pytest.mark.asyncio
+async def test_create_agent_wallets_batch_bounded_concurrency(payment_client):
+    """Test batch provisioning respects the concurrency limit and keeps order"""
+    import asyncio
+    in_flight = 0
+    peak = 0
+
+    async def fake_create(agent_name):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.001)
+        in_flight -= 1
+        if agent_name == "bad":
+            raise Exception("quota exceeded")
+        return {"wallet_id": f"w-{agent_name}"}
+
+    payment_client.create_agent_wallet = fake_create
+    names = [f"agent-{i}" for i in range(10)] + ["bad"]
+    seen = []
+
+    async def on_result(item):
+        seen.append(item["index"])
+
+    result = await payment_client.create_agent_wallets_batch(names, concurrency=3, on_result=on_result)
+
+    assert peak <= 3
+    assert result["total"] == 11
+    assert result["succeeded"] == 10
+    assert result["failed"] == 1
+    assert [item["index"] for item in result["results"]] == list(range(11))
+    assert result["results"][0]["wallet"]["wallet_id"] == "w-agent-0"
+    assert result["results"][10]["message"] == "quota exceeded"
+    assert sorted(seen) == list(range(11))
+
+
+@pytest.mark.asyncio
+async def test_create_agent_wallets_batch_rejects_oversized(payment_client):
+    """Test batch size validation"""
+    with pytest.raises(ValueError):
+        await payment_client.create_agent_wallets_batch([])
+    with pytest.raises(ValueError, match="Batch too large"):
+        await payment_client.create_agent_wallets_batch(["a"] * (settings.OMNIAGENTPAY_BATCH_MAX_ITEMS + 1))
+
+
+@pytest.mark.asyncio
+async def test_create_agent_wallet_claims_from_pool(payment_client, mock_omni_client):
+    """Test that a pooled wallet is returned without upstream calls"""
+    from app.payments.pool import WalletPool
+
+    async def provision(name):
+        return {"wallet_id": "pooled-1", "address": "0x1", "blockchain": "ARC-TESTNET", "status": "LIVE"}
+
+    payment_client._wallet_pool = WalletPool(provision, target_size=1, low_water=0, refill_concurrency=1)
+    await payment_client._wallet_pool.refill()
+    mock_omni_client.create_wallet = AsyncMock()
+
+    result = await payment_client.create_agent_wallet("agent-a")
+
+    assert result["wallet_id"] == "pooled-1"
+    assert result["agent_name"] == "agent-a"
+    mock_omni_client.create_wallet.assert_not_called()
+    assert payment_client.get_metrics()["wallet_pool"]["claims"] == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_balance_checks_are_coalesced(payment_client, mock_omni_client):
+    """Test that concurrent balance checks for one wallet share one upstream call"""
+    import asyncio
+    release = asyncio.Event()
+
+    async def get_balance(wallet_id):
+        await release.wait()
+        return Decimal("100.0")
+
+    mock_omni_client.get_balance = AsyncMock(side_effect=get_balance)
+
+    tasks = [
+        asyncio.create_task(payment_client.get_wallet_usdc_balance("wallet-1", fresh=True))
+        for _ in range(3)
+    ]
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(*tasks)
+
+    assert mock_omni_client.get_balance.call_count == 1
+    assert all(r["usdc_balance"] == "100.0" for r in results)
+    assert payment_client.get_metrics()["single_flight"]["coalesced"] == 2
+
+
+@pytest.mark.asyncio
+async def test_simulate_payment_rejects_locally_over_tx_limit(payment_client, mock_omni_client):
+    """Test that an obvious guard violation is answered without SDK calls"""
+    mock_omni_client.get_wallet = AsyncMock()
+    mock_omni_client.simulate = AsyncMock()
+
+    result = await payment_client.simulate_payment(
+        from_wallet_id="wallet-1",
+        to_address="0x123",
+        amount=str(settings.OMNIAGENTPAY_TX_LIMIT + 1)
+    )
+
+    assert result["validation_passed"] is False
+    assert result["checked_locally"] is True
+    mock_omni_client.get_wallet.assert_not_called()
+    mock_omni_client.simulate.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_confirm_intent_records_spend(payment_client, mock_omni_client):
+    """Test that a confirmed intent is counted in the local budget ledger"""
+    engine = GuardEngine([BudgetGuard(daily_limit=100, hourly_limit=100)])
+    payment_client._guard_engine = engine
+
+    mock_result = MagicMock(success=True, status="completed", transaction_id="tx-1", amount=Decimal("25"))
+    mock_omni_client.confirm_payment_intent = AsyncMock(return_value=mock_result)
+    mock_omni_client.get_payment_intent = AsyncMock(
+        return_value=MagicMock(wallet_id="wallet-1", recipient="0x123", amount=Decimal("25"))
+    )
+
+    await payment_client.confirm_intent("intent-123")
+
+    assert engine.guards[0].ledger.hourly("wallet-1") == 25_000_000
+
+
+@pytest.mark.asyncio
+async def test_intents_are_checked_against_guards(payment_client, mock_omni_client):
+    """Test guards run when an intent is created and again when it is confirmed"""
+    engine = GuardEngine([BudgetGuard(daily_limit=100, hourly_limit=30)])
+    payment_client._guard_engine = engine
+    mock_omni_client.get_balance = AsyncMock(return_value=Decimal("1000"))
+    mock_omni_client.create_payment_intent = AsyncMock(return_value=mock_intent("intent-1", "20"))
+    mock_omni_client.confirm_payment_intent = AsyncMock()
+
+    with pytest.raises(GuardValidationError, match="Budget Violation"):
+        await payment_client.create_payment_intent(wallet_id="wallet-1", recipient="0x123", amount="31")
+    mock_omni_client.create_payment_intent.assert_not_called()
+
+    await payment_client.create_payment_intent(wallet_id="wallet-1", recipient="0x123", amount="20")
+    engine.record(to_micros(15), "wallet-1", ref="tx-elsewhere")
+    with pytest.raises(GuardValidationError, match="Budget Violation"):
+        await payment_client.confirm_intent("intent-1")
+    mock_omni_client.confirm_payment_intent.assert_not_called()
+
+    batch = await payment_client.confirm_intents_batch(["intent-1"])
+    assert batch["results"][0]["error_type"] == "guard_violation"
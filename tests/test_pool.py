@@ -0,0 +1,77 @@
+import pytest
+from app.payments.pool import WalletPool
+
+
+def make_provisioner(created):
+    async def provision(name):
+        created.append(name)
+        return {"wallet_id": f"w-{len(created)}", "address": "0x1", "blockchain": "ARC-TESTNET", "status": "LIVE"}
+    return provision
+
+
+@pytest.mark.asyncio
+async def test_pool_refill_and_claim():
+    """Test refill to target and local claims"""
+    created = []
+    pool = WalletPool(make_provisioner(created), target_size=3, low_water=0, refill_concurrency=2)
+
+    assert await pool.refill() == 3
+    assert pool.depth == 3
+
+    wallet = pool.claim("agent-a")
+    assert wallet["wallet_id"] == "w-1"
+    assert wallet["agent_name"] == "agent-a"
+    assert pool.depth == 2
+    assert pool.stats()["claims"] == 1
+
+
+@pytest.mark.asyncio
+async def test_pool_empty_claim_schedules_refill():
+    """Test claiming from an empty pool returns None and triggers a refill"""
+    created = []
+    pool = WalletPool(make_provisioner(created), target_size=2, low_water=1, refill_concurrency=1)
+
+    assert pool.claim("agent-a") is None
+    assert pool.stats()["empty_claims"] == 1
+    await pool._refill_task
+    assert pool.depth == 2
+
+
+@pytest.mark.asyncio
+async def test_pool_low_water_triggers_refill():
+    """Test that dropping to the low-water mark refills in the background"""
+    created = []
+    pool = WalletPool(make_provisioner(created), target_size=3, low_water=2, refill_concurrency=3)
+    await pool.refill()
+
+    pool.claim("agent-a")
+    assert pool.stats()["refilling"] is True
+    await pool._refill_task
+    assert pool.depth == 3
+    assert len(created) == 4
+
+
+@pytest.mark.asyncio
+async def test_pool_refill_failures_counted():
+    """Test failed provisioning does not add wallets"""
+    async def failing(name):
+        raise Exception("upstream down")
+
+    pool = WalletPool(failing, target_size=2, low_water=0, refill_concurrency=2)
+    assert await pool.refill() == 0
+    assert pool.stats()["refill_failures"] == 2
+
+
+@pytest.mark.asyncio
+async def test_pool_state_survives_restart(tmp_path):
+    """Test unclaimed wallets are persisted and reloaded"""
+    state_path = str(tmp_path / "pool.json")
+    created = []
+    pool = WalletPool(make_provisioner(created), target_size=2, low_water=0, refill_concurrency=1, state_path=state_path)
+    await pool.refill()
+    pool.claim("agent-a")
+    await pool.stop()
+
+    restarted = WalletPool(make_provisioner(created), target_size=2, low_water=0, refill_concurrency=1, state_path=state_path)
+    assert restarted.depth == 1
+    assert restarted.claim("agent-b")["wallet_id"] == "w-2"
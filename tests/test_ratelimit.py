@@ -0,0 +1,138 @@
+import asyncio
+import pytest
+from app.payments.lanes import LaneScheduler
+from app.payments.ratelimit import InMemoryRateLimiter, RedisRateLimiter, TOKEN_BUCKET_SCRIPT
+from app.utils.exceptions import RateLimitExceededError
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeRedis:
+    """
+    Local stand-in for a Redis server: registered scripts run atomically
+    (one at a time) against an in-memory hash store. The token bucket script
+    is mirrored in Python, since no Lua interpreter is available in tests.
+    """
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.hashes = {}
+        self.round_trips = 0
+        self._lock = asyncio.Lock()
+
+    def register_script(self, script):
+        assert script == TOKEN_BUCKET_SCRIPT
+
+        async def run(keys, args):
+            self.round_trips += 1
+            async with self._lock:
+                return self._token_bucket(keys[0], *args)
+
+        return run
+
+    def _token_bucket(self, key, capacity, rate, requested, consume):
+        now = self.clock()
+        state = self.hashes.get(key, {})
+        tokens = float(state.get("tokens", capacity))
+        ts = float(state.get("ts", now))
+        tokens = min(capacity, tokens + max(0, now - ts) * rate)
+        allowed = tokens >= requested
+        if allowed and consume == 1:
+            tokens -= requested
+        retry_after = 0 if allowed else (requested - tokens) / rate
+        self.hashes[key] = {"tokens": str(tokens).encode(), "ts": str(now).encode()}
+        return [1 if allowed else 0, str(tokens).encode(), str(retry_after).encode()]
+
+
+@pytest.mark.asyncio
+async def test_memory_bucket_refills_continuously():
+    """Test capacity burst then refill at capacity per period"""
+    clock = FakeClock()
+    limiter = InMemoryRateLimiter(capacity=3, period=60, clock=clock)
+
+    for _ in range(3):
+        assert (await limiter.take("wallet-1")).allowed
+    denied = await limiter.take("wallet-1")
+    assert not denied.allowed
+    assert denied.retry_after == pytest.approx(20)
+    assert (await limiter.take("wallet-2")).allowed
+
+    clock.now = 20
+    assert (await limiter.take("wallet-1")).allowed
+    assert limiter.stats()["denied"] == 1
+
+
+@pytest.mark.asyncio
+async def test_memory_peek_does_not_consume():
+    """Test peek reports admission without taking tokens"""
+    limiter = InMemoryRateLimiter(capacity=1, clock=FakeClock())
+    assert (await limiter.peek("wallet-1")).allowed
+    assert (await limiter.peek("wallet-1")).allowed
+    assert (await limiter.take("wallet-1")).allowed
+    assert not (await limiter.peek("wallet-1")).allowed
+
+
+@pytest.mark.asyncio
+async def test_zero_capacity_is_unlimited():
+    """Test a limiter sized 0 admits everything instead of dividing by its zero refill rate"""
+    limiter = InMemoryRateLimiter(capacity=0, clock=FakeClock())
+    assert (await limiter.peek("wallet-1")).allowed
+    assert (await limiter.take("wallet-1")).allowed
+
+
+@pytest.mark.asyncio
+async def test_memory_evicts_full_buckets():
+    """Test idle (full) buckets are dropped when the key limit is reached"""
+    clock = FakeClock()
+    limiter = InMemoryRateLimiter(capacity=1, max_keys=2, clock=clock)
+    await limiter.take("a")
+    await limiter.take("b")
+    clock.now = 60
+    await limiter.take("c")
+    assert set(limiter._buckets) == {"c"}
+
+
+@pytest.mark.asyncio
+async def test_redis_limiter_shared_across_instances():
+    """Test two server instances draw from the same bucket, one round trip per take"""
+    clock = FakeClock()
+    server = FakeRedis(clock)
+    instance_a = RedisRateLimiter(server, capacity=2)
+    instance_b = RedisRateLimiter(server, capacity=2)
+
+    results = await asyncio.gather(*(limiter.take("wallet-1") for limiter in (instance_a, instance_b, instance_a)))
+    assert [r.allowed for r in results].count(True) == 2
+    assert server.round_trips == 3
+    assert "omniagentpay:ratelimit:wallet-1" in server.hashes
+
+    clock.now = 30
+    assert (await instance_b.take("wallet-1")).allowed
+
+
+@pytest.mark.asyncio
+async def test_lane_waits_for_shared_token():
+    """Test a lane sleeps until the shared bucket refills, within its deadline"""
+    clock = FakeClock()
+    slept = []
+
+    async def sleep(seconds):
+        slept.append(seconds)
+        clock.now += seconds
+
+    limiter = RedisRateLimiter(FakeRedis(clock), capacity=1)
+    await limiter.take("wallet-1")  # spent by another instance
+    lanes = LaneScheduler(max_per_minute=5, max_wait=90, limiter=limiter, clock=clock, sleep=sleep)
+
+    async with lanes.slot("wallet-1"):
+        pass
+    assert slept == [pytest.approx(60)]
+
+    with pytest.raises(RateLimitExceededError, match="shared budget"):
+        async with lanes.slot("wallet-1", max_wait=10):
+            pass
@@ -0,0 +1,100 @@
+import asyncio
+import pytest
+from types import SimpleNamespace
+from app.payments.reconciler import GuardReconciler
+
+
+def make_reconciler(wallets, seen, policy="p1", fail=(), **kwargs):
+    async def list_wallets():
+        return list(wallets)
+
+    async def reconcile(wallet_id):
+        seen.append(wallet_id)
+        if wallet_id in fail:
+            raise Exception("storage unavailable")
+        return SimpleNamespace(changed=wallet_id.endswith("1"))
+
+    params = dict(concurrency=3, rate_per_second=0)
+    params.update(kwargs)
+    return GuardReconciler(list_wallets, reconcile, lambda: policy, **params)
+
+
+@pytest.mark.asyncio
+async def test_reconciler_walks_all_wallets():
+    """Test every wallet is reconciled once and progress is reported"""
+    seen = []
+    reconciler = make_reconciler([f"w-{i}" for i in range(10)], seen, fail={"w-3"})
+
+    stats = await reconciler.run()
+
+    assert sorted(seen) == sorted(f"w-{i}" for i in range(10))
+    assert stats["processed"] == 10
+    assert stats["changed"] == 1
+    assert stats["failed"] == 1
+    assert stats["remaining"] == 0
+    assert stats["completed"] is True
+
+
+@pytest.mark.asyncio
+async def test_reconciler_resumes_from_checkpoint(tmp_path):
+    """Test a restarted job skips wallets below the saved checkpoint"""
+    state = str(tmp_path / "reconcile.json")
+    wallets = [f"w-{i}" for i in range(6)]
+    seen = []
+    first = make_reconciler(wallets, seen, state_path=state, concurrency=1, checkpoint_every=1)
+
+    async def interrupt(wallet_id):
+        seen.append(wallet_id)
+        if wallet_id == "w-3":
+            raise asyncio.CancelledError()
+    first._reconcile = interrupt
+    with pytest.raises(asyncio.CancelledError):
+        await first.run()
+
+    seen.clear()
+    second = make_reconciler(wallets, seen, state_path=state)
+    stats = await second.run()
+    assert seen == ["w-3", "w-4", "w-5"]
+    assert stats["skipped"] == 3
+
+    # Finished pass with the same policy: nothing left to do after a restart
+    seen.clear()
+    assert (await make_reconciler(wallets, seen, state_path=state).run())["processed"] == 0
+    assert seen == []
+
+    # Policy change discards the checkpoint
+    stats = await make_reconciler(wallets, seen, policy="p2", state_path=state).run()
+    assert stats["processed"] == 6
+
+
+@pytest.mark.asyncio
+async def test_reconciler_bounded_concurrency():
+    """Test no more than `concurrency` wallets are in flight at once"""
+    in_flight = 0
+    peak = 0
+
+    async def reconcile(wallet_id):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0)
+        in_flight -= 1
+
+    async def list_wallets():
+        return [f"w-{i}" for i in range(20)]
+
+    reconciler = GuardReconciler(list_wallets, reconcile, lambda: "p", concurrency=4, rate_per_second=0)
+    await reconciler.run()
+    assert peak == 4
+
+
+@pytest.mark.asyncio
+async def test_reconciler_start_runs_in_background():
+    """Test start() does not launch a second pass while one is running"""
+    seen = []
+    reconciler = make_reconciler(["w-1", "w-2"], seen, rate_per_second=1000)
+
+    assert reconciler.start() is True
+    assert reconciler.start() is False
+    await reconciler._task
+    assert reconciler.stats()["processed"] == 2
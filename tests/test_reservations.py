@@ -0,0 +1,47 @@
+from app.payments.reservations import ReservationLedger
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_reservations_reject_over_commitment():
+    """Test reservations draw down the balance and reject what no longer fits"""
+    ledger = ReservationLedger()
+
+    assert ledger.try_reserve("i1", "wallet-1", 60, balance=100)
+    assert not ledger.try_reserve("i2", "wallet-1", 50, balance=100)
+    assert ledger.try_reserve("i3", "wallet-1", 40, balance=100)
+    assert ledger.reserved("wallet-1") == 100
+    assert ledger.try_reserve("i4", "wallet-2", 50, balance=100)
+    assert ledger.stats()["rejections"] == 1
+
+
+def test_reservations_release_and_rekey():
+    """Test a placeholder reservation can take the intent ID and be released once"""
+    ledger = ReservationLedger()
+    ledger.try_reserve("pending", "wallet-1", 70, balance=100)
+
+    assert ledger.rekey("pending", "intent-1")
+    assert ledger.release("pending") is None
+    assert ledger.release("intent-1") == 70
+    assert ledger.release("intent-1") is None
+    assert ledger.reserved("wallet-1") == 0
+    assert len(ledger) == 0
+
+
+def test_reservations_expire():
+    """Test an expired reservation stops holding balance"""
+    clock = FakeClock()
+    ledger = ReservationLedger(clock=clock)
+    ledger.try_reserve("i1", "wallet-1", 80, balance=100, expires_at=10)
+    ledger.try_reserve("i2", "wallet-1", 20, balance=100)
+
+    assert ledger.available("wallet-1", 100) == 0
+    clock.now = 10
+    assert ledger.available("wallet-1", 100) == 80
+    assert ledger.stats()["expired"] == 1
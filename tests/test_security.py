@@ -0,0 +1,26 @@
+from datetime import timedelta
+from app.core.security import create_simulation_token, verify_simulation_token
+
+
+def test_simulation_token_roundtrip():
+    """Test a token verifies for the parameters it was issued for"""
+    token = create_simulation_token("wallet-1", "0x123", "10.50", "USD")
+    assert verify_simulation_token(token, "wallet-1", "0x123", "10.5", "usd")
+
+
+def test_simulation_token_bound_to_parameters():
+    """Test a token does not verify for other parameters"""
+    token = create_simulation_token("wallet-1", "0x123", "10", "USD")
+    assert verify_simulation_token(token, "wallet-2", "0x123", "10", "USD") is None
+    assert verify_simulation_token(token, "wallet-1", "0x456", "10", "USD") is None
+    assert verify_simulation_token(token, "wallet-1", "0x123", "11", "USD") is None
+    assert verify_simulation_token(token, "wallet-1", "0x123", "10", "EUR") is None
+
+
+def test_simulation_token_expired_or_tampered():
+    """Test expired and tampered tokens are rejected"""
+    expired = create_simulation_token("wallet-1", "0x123", "10", "USD", expires_delta=timedelta(seconds=-1))
+    assert verify_simulation_token(expired, "wallet-1", "0x123", "10", "USD") is None
+
+    token = create_simulation_token("wallet-1", "0x123", "10", "USD")
+    assert verify_simulation_token(token[:-2] + "xx", "wallet-1", "0x123", "10", "USD") is None
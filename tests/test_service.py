@@ -0,0 +1,297 @@
+import asyncio
+import pytest
+from decimal import Decimal
+from unittest.mock import AsyncMock, MagicMock, patch
+from app.core.config import settings
+from app.payments.budgets import BudgetTree
+from app.payments.guards import GuardEngine, HierarchicalBudgetGuard, RateLimitGuard, SingleTransactionGuard, get_default_guards
+from app.payments.idempotency import InMemoryIdempotencyStore, SQLiteIdempotencyStore
+from app.payments.omni_client import OmniAgentPaymentClient
+from app.payments.service import PaymentOrchestrator
+from app.utils.exceptions import GuardValidationError, PaymentError
+
+
+@pytest.fixture
+def mock_payment_client():
+    """Mock payment client whose simulation always passes"""
+    client = AsyncMock()
+    client.simulate_payment.return_value = {"status": "success", "validation_passed": True}
+    client.execute_payment.return_value = {"transfer_id": "tx-1", "status": "complete"}
+    return client
+
+
+@pytest.fixture
+def orchestrator(mock_payment_client):
+    return PaymentOrchestrator(
+        mock_payment_client,
+        InMemoryIdempotencyStore(maxsize=100, ttl=60),
+        GuardEngine(get_default_guards())
+    )
+
+
+def payment(**overrides):
+    data = {"from_wallet_id": "wallet-1", "to_address": "0x123", "amount": "10.0", "currency": "USD"}
+    data.update(overrides)
+    return data
+
+
+@pytest.mark.asyncio
+async def test_pay_without_key_generates_one(orchestrator, mock_payment_client):
+    """Test that a fresh key is generated and passed to execution"""
+    result = await orchestrator.pay(payment())
+
+    assert result["status"] == "success"
+    assert result["idempotency_key"]
+    assert mock_payment_client.execute_payment.call_args.kwargs["idempotency_key"] == result["idempotency_key"]
+
+
+@pytest.mark.asyncio
+async def test_pay_replays_completed_result(orchestrator, mock_payment_client):
+    """Test that a retry with the same key costs no upstream calls"""
+    first = await orchestrator.pay(payment(idempotency_key="key-1"))
+    second = await orchestrator.pay(payment(idempotency_key="key-1", amount="10"))
+
+    assert second["payment_id"] == first["payment_id"]
+    assert second["idempotent_replay"] is True
+    assert mock_payment_client.simulate_payment.call_count == 1
+    assert mock_payment_client.execute_payment.call_count == 1
+    assert orchestrator.get_metrics()["replays"] == 1
+
+
+@pytest.mark.asyncio
+async def test_pay_dedupes_concurrent_calls(orchestrator, mock_payment_client):
+    """Test that concurrent calls with one key share a single execution"""
+    release = asyncio.Event()
+
+    async def slow_execute(**kwargs):
+        await release.wait()
+        return {"transfer_id": "tx-1"}
+
+    mock_payment_client.execute_payment.side_effect = slow_execute
+
+    tasks = [asyncio.create_task(orchestrator.pay(payment(idempotency_key="key-1"))) for _ in range(3)]
+    await asyncio.sleep(0.01)
+    release.set()
+    results = await asyncio.gather(*tasks)
+
+    assert {r["payment_id"] for r in results} == {"tx-1"}
+    assert mock_payment_client.execute_payment.call_count == 1
+    assert orchestrator.get_metrics()["joined_in_flight"] == 2
+
+
+@pytest.mark.asyncio
+async def test_pay_rejects_key_reuse_with_different_parameters(orchestrator):
+    """Test that a key is bound to its original payment parameters"""
+    await orchestrator.pay(payment(idempotency_key="key-1"))
+
+    with pytest.raises(PaymentError, match="different payment parameters"):
+        await orchestrator.pay(payment(idempotency_key="key-1", amount="11.0"))
+
+
+@pytest.mark.asyncio
+async def test_pay_failure_is_not_stored(orchestrator, mock_payment_client):
+    """Test that a failed payment can be retried with the same key"""
+    mock_payment_client.execute_payment.side_effect = [Exception("timeout"), {"transfer_id": "tx-2"}]
+
+    with pytest.raises(PaymentError):
+        await orchestrator.pay(payment(idempotency_key="key-1"))
+    result = await orchestrator.pay(payment(idempotency_key="key-1"))
+
+    assert result["payment_id"] == "tx-2"
+
+
+def test_sqlite_store_persists_and_prunes(tmp_path):
+    """Test the SQLite backend survives reopen and stays bounded"""
+    path = str(tmp_path / "idempotency.db")
+    store = SQLiteIdempotencyStore(path, maxsize=2, ttl=60)
+    store.put("a", "fp-a", {"payment_id": "tx-a"})
+    store.put("b", "fp-b", {"payment_id": "tx-b"})
+    store.put("c", "fp-c", {"payment_id": "tx-c"})
+    store.close()
+
+    reopened = SQLiteIdempotencyStore(path, maxsize=2, ttl=60)
+    assert reopened.get("a") is None
+    assert reopened.get("c") == {"fingerprint": "fp-c", "result": {"payment_id": "tx-c"}}
+    assert reopened.stats()["size"] == 2
+
+
+def test_sqlite_store_expires_records(tmp_path):
+    """Test records older than the TTL are not returned"""
+    now = [1000.0]
+    store = SQLiteIdempotencyStore(str(tmp_path / "idempotency.db"), maxsize=10, ttl=60, clock=lambda: now[0])
+    store.put("a", "fp-a", {"payment_id": "tx-a"})
+    now[0] += 61
+    assert store.get("a") is None
+
+
+@pytest.mark.asyncio
+async def test_pay_with_simulation_token_skips_simulation(orchestrator, mock_payment_client):
+    """Test that a valid simulation token replaces re-simulation once"""
+    from app.core.security import create_simulation_token
+    token = create_simulation_token("wallet-1", "0x123", "10", "usd")
+
+    await orchestrator.pay(payment(simulation_token=token))
+    mock_payment_client.simulate_payment.assert_not_called()
+
+    # Tokens are single-use
+    await orchestrator.pay(payment(simulation_token=token))
+    assert mock_payment_client.simulate_payment.call_count == 1
+    metrics = orchestrator.get_metrics()
+    assert metrics["simulations_skipped"] == 1
+    assert metrics["simulation_tokens_rejected"] == 1
+
+
+@pytest.mark.asyncio
+async def test_pay_with_mismatched_simulation_token_simulates(orchestrator, mock_payment_client):
+    """Test that a token for different parameters is ignored"""
+    from app.core.security import create_simulation_token
+    token = create_simulation_token("wallet-1", "0x123", "5.0", "USD")
+
+    await orchestrator.pay(payment(simulation_token=token))
+    mock_payment_client.simulate_payment.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_pay_batch_orders_per_wallet_and_parallelizes_across(orchestrator, mock_payment_client):
+    """Test per-wallet ordering with cross-wallet parallelism"""
+    order = []
+    in_flight = {}
+    peak_per_wallet = {}
+
+    async def execute(**kwargs):
+        wallet = kwargs["from_wallet_id"]
+        in_flight[wallet] = in_flight.get(wallet, 0) + 1
+        peak_per_wallet[wallet] = max(peak_per_wallet.get(wallet, 0), in_flight[wallet])
+        await asyncio.sleep(0.001)
+        in_flight[wallet] -= 1
+        order.append((wallet, kwargs["amount"]))
+        return {"transfer_id": f"tx-{wallet}-{kwargs['amount']}"}
+
+    mock_payment_client.execute_payment.side_effect = execute
+    payments = [payment(from_wallet_id=w, amount=str(a)) for a in range(1, 4) for w in ("w1", "w2")]
+
+    result = await orchestrator.pay_batch(payments, concurrency=4)
+
+    assert result["succeeded"] == 6
+    assert [r["index"] for r in result["results"]] == list(range(6))
+    assert peak_per_wallet == {"w1": 1, "w2": 1}
+    assert [a for w, a in order if w == "w1"] == ["1", "2", "3"]
+    assert [a for w, a in order if w == "w2"] == ["1", "2", "3"]
+
+
+@pytest.mark.asyncio
+async def test_pay_batch_partial_failure(orchestrator, mock_payment_client):
+    """Test that one failing item does not stop the others"""
+    mock_payment_client.simulate_payment.side_effect = [
+        {"status": "success", "validation_passed": False, "reason": "budget"},
+        {"status": "success", "validation_passed": True},
+    ]
+
+    result = await orchestrator.pay_batch([payment(), payment(amount="2.0")])
+
+    assert result["failed"] == 1
+    assert result["results"][0]["error_type"] == "guard_violation"
+    assert result["results"][1]["status"] == "success"
+
+
+@pytest.mark.asyncio
+async def test_pay_batch_validates_all_items_first(orchestrator, mock_payment_client):
+    """Test that an invalid item rejects the batch before any payment"""
+    with pytest.raises(PaymentError, match="item 1"):
+        await orchestrator.pay_batch([payment(), payment(amount="-5")])
+    mock_payment_client.execute_payment.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_pays_for_one_wallet_are_serialized(orchestrator, mock_payment_client):
+    """Test that concurrent payments from one wallet go through its lane one at a time"""
+    active = 0
+    peak = 0
+
+    async def execute(**kwargs):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.001)
+        active -= 1
+        return {"transfer_id": "tx"}
+
+    mock_payment_client.execute_payment.side_effect = execute
+    await asyncio.gather(*(orchestrator.pay(payment(amount=str(i + 1))) for i in range(3)))
+
+    assert peak == 1
+    assert orchestrator.get_metrics()["lanes"]["admitted"] == 3
+
+
+@pytest.mark.asyncio
+async def test_pay_rejects_guard_violation_locally(mock_payment_client):
+    """Test an over-limit payment is rejected before any upstream call"""
+    orchestrator = PaymentOrchestrator(
+        mock_payment_client,
+        InMemoryIdempotencyStore(maxsize=100, ttl=60),
+        GuardEngine([SingleTransactionGuard(tx_limit=5)])
+    )
+
+    with pytest.raises(GuardValidationError, match="exceeds limit"):
+        await orchestrator.pay(payment())
+
+    mock_payment_client.simulate_payment.assert_not_called()
+    mock_payment_client.execute_payment.assert_not_called()
+    assert orchestrator.get_metrics()["guards"]["rejections"] == 1
+
+
+@pytest.mark.asyncio
+async def test_full_rate_limit_of_payments_all_succeed():
+    """Test payments admitted by the lane are not rejected again by the rate-limit guard"""
+    engine = GuardEngine([RateLimitGuard(requests_per_min=settings.OMNIAGENTPAY_RATE_LIMIT_PER_MIN)])
+    sdk = MagicMock()
+    sdk.get_wallet = AsyncMock(return_value=MagicMock())
+    simulation = MagicMock(would_succeed=True, estimated_fee=Decimal("0"))
+    sdk.simulate = AsyncMock(return_value=simulation)
+    sdk.pay = AsyncMock(return_value=MagicMock(transaction_id="tx", amount=Decimal("1")))
+    with patch('app.payments.omni_client.OmniAgentPay', return_value=sdk):
+        client = OmniAgentPaymentClient()
+    client._guard_engine = engine
+    orchestrator = PaymentOrchestrator(client, InMemoryIdempotencyStore(maxsize=100, ttl=60), engine)
+
+    results = await asyncio.gather(*(
+        orchestrator.pay(payment(amount="1")) for _ in range(settings.OMNIAGENTPAY_RATE_LIMIT_PER_MIN)
+    ))
+
+    assert all(result["status"] == "success" for result in results)
+    assert sdk.pay.await_count == settings.OMNIAGENTPAY_RATE_LIMIT_PER_MIN
+
+
+@pytest.mark.asyncio
+async def test_sibling_wallets_cannot_overspend_shared_budget():
+    """Test concurrent payments from sibling wallets are held against their org's budget"""
+    tree = BudgetTree.from_dict({
+        "nodes": {"org": {"daily_limit": "10"}, "org/a": {"parent": "org"}, "org/b": {"parent": "org"}},
+        "wallets": {"w1": "org/a", "w2": "org/b"}
+    })
+    engine = GuardEngine([HierarchicalBudgetGuard(tree)])
+    sdk = MagicMock()
+    sdk.get_wallet = AsyncMock(return_value=MagicMock())
+    sdk.simulate = AsyncMock(return_value=MagicMock(would_succeed=True, estimated_fee=Decimal("0")))
+
+    async def pay(**kwargs):
+        await asyncio.sleep(0.01)
+        return MagicMock(transaction_id=f"tx-{kwargs['wallet_id']}", amount=Decimal("8"))
+
+    sdk.pay = AsyncMock(side_effect=pay)
+    with patch('app.payments.omni_client.OmniAgentPay', return_value=sdk):
+        client = OmniAgentPaymentClient()
+    client._guard_engine = engine
+    orchestrator = PaymentOrchestrator(client, InMemoryIdempotencyStore(maxsize=100, ttl=60), engine)
+
+    results = await asyncio.gather(
+        orchestrator.pay(payment(from_wallet_id="w1", amount="8")),
+        orchestrator.pay(payment(from_wallet_id="w2", amount="8")),
+        return_exceptions=True
+    )
+
+    assert sum(isinstance(result, dict) for result in results) == 1
+    assert sum(isinstance(result, GuardValidationError) for result in results) == 1
+    status = tree.status("org")["path"][0]
+    assert status["daily"]["spent"] == "8"
+    assert status["reserved"] == "0"
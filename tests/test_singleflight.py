@@ -0,0 +1,80 @@
+import asyncio
+import pytest
+from app.payments.singleflight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_are_coalesced():
+    """Test that concurrent calls for one key share a single upstream call"""
+    flight = SingleFlight()
+    upstream_calls = 0
+    release = asyncio.Event()
+
+    async def lookup():
+        nonlocal upstream_calls
+        upstream_calls += 1
+        await release.wait()
+        return {"usdc_balance": "100"}
+
+    tasks = [asyncio.create_task(flight.do("wallet-1", lookup)) for _ in range(5)]
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(*tasks)
+
+    assert upstream_calls == 1
+    assert all(r == {"usdc_balance": "100"} for r in results)
+    assert flight.stats() == {"calls": 1, "coalesced": 4, "in_flight": 0}
+
+
+@pytest.mark.asyncio
+async def test_different_keys_are_not_coalesced():
+    """Test that distinct keys issue separate calls"""
+    flight = SingleFlight()
+
+    async def lookup(value):
+        await asyncio.sleep(0)
+        return value
+
+    results = await asyncio.gather(flight.do("a", lambda: lookup(1)), flight.do("b", lambda: lookup(2)))
+    assert results == [1, 2]
+    assert flight.stats()["coalesced"] == 0
+
+
+@pytest.mark.asyncio
+async def test_errors_are_shared_and_not_cached():
+    """Test that a failure propagates to all waiters and the next call retries"""
+    flight = SingleFlight()
+    attempts = 0
+
+    async def failing():
+        nonlocal attempts
+        attempts += 1
+        await asyncio.sleep(0)
+        raise ValueError("upstream down")
+
+    results = await asyncio.gather(flight.do("k", failing), flight.do("k", failing), return_exceptions=True)
+    assert all(isinstance(r, ValueError) for r in results)
+    assert attempts == 1
+
+    with pytest.raises(ValueError):
+        await flight.do("k", failing)
+    assert attempts == 2
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_does_not_cancel_shared_call():
+    """Test that cancelling one caller leaves the others unaffected"""
+    flight = SingleFlight()
+    release = asyncio.Event()
+
+    async def lookup():
+        await release.wait()
+        return "ok"
+
+    first = asyncio.create_task(flight.do("k", lookup))
+    second = asyncio.create_task(flight.do("k", lookup))
+    await asyncio.sleep(0)
+    first.cancel()
+    release.set()
+
+    assert await second == "ok"
@@ -0,0 +1,77 @@
+import pytest
+from unittest.mock import MagicMock, patch
+from app.core.lifecycle import shutdown_event, startup_event
+from app.payments.omni_client import OmniAgentPaymentClient
+from app.payments.sweeper import IntentSweeper
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.mark.asyncio
+async def test_sweeper_expires_in_batches_and_retries():
+    """Test expired intents are handed over in batches and failures come back later"""
+    clock = FakeClock()
+    batches = []
+
+    async def expire(intent_ids):
+        batches.append(list(intent_ids))
+        return [i for i in intent_ids if i == "flaky"]
+
+    sweeper = IntentSweeper(expire=expire, interval=1.0, batch_size=2, retry_after=10, clock=clock)
+    for intent_id in ["a", "b", "flaky"]:
+        sweeper.track(intent_id, 5)
+    sweeper.track("confirmed", 5)
+    sweeper.untrack("confirmed")
+    sweeper.track("later", 100)
+
+    clock.now = 4
+    assert await sweeper.sweep() == 0
+    clock.now = 5
+    assert await sweeper.sweep() == 2
+    assert sorted(sum(batches, [])) == ["a", "b", "flaky"]
+    assert all(len(batch) <= 2 for batch in batches)
+
+    clock.now = 15
+    await sweeper.sweep()
+    assert batches[-1] == ["flaky"]
+    assert sweeper.stats()["tracked"] == 2
+    assert sweeper.stats()["retries"] == 2
+
+
+@pytest.mark.asyncio
+async def test_sweeper_start_and_stop():
+    """Test the background loop starts once and stops cleanly"""
+    async def expire(intent_ids):
+        return []
+
+    sweeper = IntentSweeper(expire=expire, interval=0.01)
+    sweeper.start()
+    assert sweeper.running
+    await sweeper.stop()
+    assert not sweeper.running
+
+    disabled = IntentSweeper(expire=expire, interval=0)
+    disabled.start()
+    assert not disabled.running
+
+
+@pytest.mark.asyncio
+async def test_sweeper_starts_with_the_client_not_the_app():
+    """Test startup needs no SDK client, and the sweeper runs once the client is created"""
+    with patch('app.payments.omni_client.OmniAgentPay', side_effect=RuntimeError("no credentials")):
+        await startup_event(MagicMock())
+    assert OmniAgentPaymentClient._instance is None
+
+    with patch('app.payments.omni_client.OmniAgentPay'):
+        client = await OmniAgentPaymentClient.get_instance()
+    try:
+        assert client.get_metrics()["intent_sweeper"]["running"]
+    finally:
+        await shutdown_event(MagicMock())
+        OmniAgentPaymentClient._instance = None
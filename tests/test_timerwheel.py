@@ -0,0 +1,76 @@
+import random
+import pytest
+from app.payments.timerwheel import TimerWheel
+
+
+def test_timers_fire_once_their_deadline_passes():
+    """Test timers fire on the first advance at or after their deadline"""
+    wheel = TimerWheel(tick=1.0, slots=4, levels=2)
+    wheel.schedule("a", 2)
+    wheel.schedule("b", 3.5)
+    wheel.schedule("late", -5)
+
+    assert wheel.advance(1) == ["late"]
+    assert wheel.advance(2) == ["a"]
+    assert wheel.advance(3) == []
+    assert wheel.advance(4) == ["b"]
+    assert len(wheel) == 0
+
+
+def test_cancel_and_reschedule():
+    """Test cancelled timers never fire and rescheduling moves the deadline"""
+    wheel = TimerWheel(tick=1.0, slots=4, levels=2)
+    wheel.schedule("a", 5)
+    wheel.schedule("b", 5)
+    assert wheel.cancel("a")
+    assert not wheel.cancel("a")
+    wheel.schedule("b", 9)
+
+    assert wheel.advance(8) == []
+    assert wheel.advance(9) == ["b"]
+
+
+def test_far_deadlines_cascade_through_levels():
+    """Test timers beyond the wheel's span are re-placed until they are due"""
+    wheel = TimerWheel(tick=1.0, slots=4, levels=2)
+    wheel.schedule("near", 6)
+    wheel.schedule("beyond_span", 40)
+
+    fired = {}
+    for now in range(1, 45):
+        for key in wheel.advance(now):
+            fired[key] = now
+    assert fired == {"near": 6, "beyond_span": 40}
+
+
+def test_wheel_matches_naive_schedule():
+    """Test random schedules, cancels and clock jumps against a plain dict of deadlines"""
+    rng = random.Random(7)
+    wheel = TimerWheel(tick=1.0, slots=4, levels=3)
+    deadlines = {}
+    now = 0.0
+    for _ in range(2000):
+        key = rng.randrange(50)
+        if rng.random() < 0.2:
+            wheel.cancel(key)
+            deadlines.pop(key, None)
+        else:
+            deadline = now + rng.uniform(-2, 150)
+            wheel.schedule(key, deadline)
+            deadlines[key] = deadline
+        now += rng.uniform(0, 3)
+        for key in wheel.advance(now):
+            assert deadlines.pop(key) <= now
+        assert all(d > int(now) for d in deadlines.values())
+        assert len(wheel) == len(deadlines)
+
+
+def test_tick_must_be_positive():
+    with pytest.raises(ValueError):
+        TimerWheel(tick=0)
+
+
+def test_single_level_wheel_rejected():
+    """Test a one-level wheel is refused, since it would fire far deadlines a rotation early"""
+    with pytest.raises(ValueError, match="levels"):
+        TimerWheel(tick=1.0, slots=4, levels=1)
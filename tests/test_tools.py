@@ -2,15 +2,25 @@ import pytest
 from unittest.mock import AsyncMock, MagicMock, patch
 from decimal import Decimal
 from app.mcp.registry import registry
+from app.payments.budgets import BudgetTree
 from app.mcp.tools import (
     CreateAgentWalletTool,
+    CreateAgentWalletsBatchTool,
     PayRecipientTool,
+    PayRecipientsBatchTool,
     SimulatePaymentTool,
     CreatePaymentIntentTool,
     ConfirmPaymentIntentTool,
     CheckBalanceTool,
+    GetServerMetricsTool,
+    GetBudgetStatusTool,
     RemoveRecipientGuardTool,
-    AddRecipientToWhitelistTool
+    AddRecipientToWhitelistTool,
+    ReconcileWalletGuardsTool,
+    ReloadGuardPolicyTool,
+    ListPaymentIntentsTool,
+    ConfirmPaymentIntentsTool,
+    SimulatePaymentsTool
 )
 
 
@@ -63,6 +73,27 @@ async def test_create_agent_wallet_tool_error(mock_client):
     assert "message" in result
 
 
+@pytest.mark.asyncio
+async def test_create_agent_wallets_batch_tool_success(mock_client):
+    """Test batch wallet creation"""
+    mock_client.create_agent_wallets_batch.return_value = {
+        "total": 2,
+        "succeeded": 2,
+        "failed": 0,
+        "results": [
+            {"index": 0, "agent_name": "a", "status": "success", "wallet": {"wallet_id": "w-a"}},
+            {"index": 1, "agent_name": "b", "status": "success", "wallet": {"wallet_id": "w-b"}}
+        ]
+    }
+    
+    tool = CreateAgentWalletsBatchTool()
+    result = await tool.execute(agent_names=["a", "b"], concurrency=5)
+    
+    assert result["status"] == "success"
+    assert result["succeeded"] == 2
+    mock_client.create_agent_wallets_batch.assert_called_once_with(["a", "b"], concurrency=5)
+
+
 @pytest.mark.asyncio
 async def test_pay_recipient_tool_success(mock_orchestrator):
     """Test successful payment"""
@@ -85,6 +116,25 @@ async def test_pay_recipient_tool_success(mock_orchestrator):
     mock_orchestrator.pay.assert_called_once()
 
 
+@pytest.mark.asyncio
+async def test_pay_recipients_batch_tool_success(mock_orchestrator):
+    """Test batch payment"""
+    mock_orchestrator.pay_batch.return_value = {
+        "total": 1,
+        "succeeded": 1,
+        "failed": 0,
+        "results": [{"index": 0, "status": "success", "payment": {"payment_id": "tx-1"}}]
+    }
+    payments = [{"from_wallet_id": "wallet-1", "to_address": "0x123", "amount": "10.0"}]
+    
+    tool = PayRecipientsBatchTool()
+    result = await tool.execute(payments=payments)
+    
+    assert result["status"] == "success"
+    assert result["succeeded"] == 1
+    mock_orchestrator.pay_batch.assert_called_once_with(payments, concurrency=None)
+
+
 @pytest.mark.asyncio
 async def test_simulate_payment_tool_success(mock_client):
     """Test payment simulation"""
@@ -183,7 +233,23 @@ async def test_check_balance_tool_success(mock_client):
     
     assert result["status"] == "success"
     assert result["usdc_balance"] == "100.0"
-    mock_client.get_wallet_usdc_balance.assert_called_once_with("wallet-1")
+    mock_client.get_wallet_usdc_balance.assert_called_once_with("wallet-1", fresh=False)
+
+
+@pytest.mark.asyncio
+async def test_check_balance_tool_fresh(mock_client):
+    """Test balance check bypassing the cache"""
+    mock_client.get_wallet_usdc_balance.return_value = {
+        "wallet_id": "wallet-1",
+        "usdc_balance": "100.0",
+        "currency": "USDC"
+    }
+    
+    tool = CheckBalanceTool()
+    result = await tool.execute(wallet_id="wallet-1", fresh=True)
+    
+    assert result["status"] == "success"
+    mock_client.get_wallet_usdc_balance.assert_called_once_with("wallet-1", fresh=True)
 
 
 @pytest.mark.asyncio
@@ -203,6 +269,44 @@ async def test_check_balance_tool_zero_balance(mock_client):
     assert result["usdc_balance"] == "0"
 
 
+@pytest.mark.asyncio
+async def test_get_server_metrics_tool_success(mock_client):
+    """Test metrics reporting"""
+    mock_client.get_metrics = MagicMock(return_value={"wallet_cache": {"hits": 3}})
+    
+    tool = GetServerMetricsTool()
+    result = await tool.execute()
+    
+    assert result["status"] == "success"
+    assert result["metrics"]["wallet_cache"]["hits"] == 3
+
+
+@pytest.mark.asyncio
+async def test_get_budget_status_tool():
+    """Test budget inspection by node and by wallet"""
+    tree = BudgetTree.from_dict({"nodes": {"acme": {"daily_limit": "100"}}, "wallets": {"wallet-1": "acme"}})
+    engine = MagicMock(budget_tree=tree)
+
+    with patch('app.mcp.tools.get_guard_engine', return_value=engine):
+        tool = GetBudgetStatusTool()
+        by_node = await tool.execute(node_id="acme")
+        by_wallet = await tool.execute(wallet_id="wallet-1")
+        missing = await tool.execute(node_id="unknown")
+
+    assert by_node["status"] == "success"
+    assert by_node["budget"]["path"][0]["daily"]["remaining"] == "100"
+    assert by_wallet["budget"]["wallet_id"] == "wallet-1"
+    assert missing["status"] == "error"
+
+
+@pytest.mark.asyncio
+async def test_get_budget_status_tool_without_tree():
+    """Test a clear error when no hierarchy is configured"""
+    with patch('app.mcp.tools.get_guard_engine', return_value=MagicMock(budget_tree=None)):
+        result = await GetBudgetStatusTool().execute(node_id="acme")
+    assert result["status"] == "error"
+
+
 @pytest.mark.asyncio
 async def test_remove_recipient_guard_tool_success(mock_client):
     """Test removing recipient guard"""
@@ -238,18 +342,115 @@ async def test_add_recipient_to_whitelist_tool_success(mock_client):
     mock_client.add_recipient_to_whitelist.assert_called_once_with("wallet-1", ["0x123", "0x456"])
 
 
+@pytest.mark.asyncio
+async def test_reconcile_wallet_guards_tool(mock_client):
+    """Test starting a reconciliation pass and polling its progress"""
+    mock_client.start_guard_reconciliation = MagicMock(return_value={"started": True, "remaining": 10})
+    mock_client.get_guard_reconciliation_status = MagicMock(return_value={"running": True, "remaining": 4})
+
+    tool = ReconcileWalletGuardsTool()
+    started = await tool.execute(restart=True)
+    status = await tool.execute(status_only=True)
+
+    assert started["reconciliation"]["started"] is True
+    mock_client.start_guard_reconciliation.assert_called_once_with(restart=True)
+    assert status["reconciliation"]["remaining"] == 4
+
+
+@pytest.mark.asyncio
+async def test_reload_guard_policy_tool():
+    """Test reload reports the new policy, and errors surface as tool errors"""
+    engine = MagicMock()
+    engine.reload = AsyncMock(return_value={"version": 2, "last_reload_ms": 1.5})
+    with patch('app.mcp.tools.get_guard_engine', return_value=engine):
+        result = await ReloadGuardPolicyTool().execute()
+    assert result["policy"]["version"] == 2
+
+    engine.reload = AsyncMock(side_effect=ValueError("No guard policy file is configured"))
+    with patch('app.mcp.tools.get_guard_engine', return_value=engine):
+        result = await ReloadGuardPolicyTool().execute()
+    assert result["status"] == "error"
+
+
+@pytest.mark.asyncio
+async def test_list_payment_intents_tool(mock_client):
+    """Test listing intents passes filters through and reports bad cursors as errors"""
+    mock_client.list_payment_intents = MagicMock(
+        return_value={"intents": [{"intent_id": "intent-2"}], "next_cursor": "2"}
+    )
+
+    tool = ListPaymentIntentsTool()
+    result = await tool.execute(wallet_id="wallet-1", limit=1)
+
+    assert result["status"] == "success"
+    assert result["next_cursor"] == "2"
+    mock_client.list_payment_intents.assert_called_once_with(
+        wallet_id="wallet-1", status=None, cursor=None, limit=1
+    )
+
+    mock_client.list_payment_intents = MagicMock(side_effect=ValueError("Invalid cursor: x"))
+    result = await tool.execute(cursor="x")
+    assert result["status"] == "error"
+
+
+@pytest.mark.asyncio
+async def test_confirm_payment_intents_tool(mock_client):
+    """Test batch confirm returns per-intent results"""
+    mock_client.confirm_intents_batch.return_value = {
+        "total": 2, "succeeded": 1, "failed": 1,
+        "results": [
+            {"index": 0, "intent_id": "intent-1", "status": "success"},
+            {"index": 1, "intent_id": "intent-2", "status": "error", "error_type": "not_found"}
+        ]
+    }
+
+    result = await ConfirmPaymentIntentsTool().execute(intent_ids=["intent-1", "intent-2"])
+
+    assert result["status"] == "success"
+    assert result["results"][1]["error_type"] == "not_found"
+    mock_client.confirm_intents_batch.assert_called_once_with(["intent-1", "intent-2"], concurrency=None)
+
+
+@pytest.mark.asyncio
+async def test_simulate_payments_tool(mock_client):
+    """Test batch simulation returns per-item results and reports rejected batches"""
+    payments = [{"from_wallet_id": "wallet-1", "to_address": "0x123", "amount": "10.0"}]
+    mock_client.simulate_payments.return_value = {
+        "total": 1, "passed": 1, "rejected": 0, "failed": 0,
+        "results": [{"index": 0, "status": "success", "validation_passed": True}]
+    }
+
+    result = await SimulatePaymentsTool().execute(payments=payments)
+
+    assert result["status"] == "success"
+    assert result["results"][0]["validation_passed"] is True
+    mock_client.simulate_payments.assert_called_once_with(payments, concurrency=None)
+
+    mock_client.simulate_payments.side_effect = ValueError("payments must not be empty")
+    result = await SimulatePaymentsTool().execute(payments=[])
+    assert result["status"] == "error"
+
+
 @pytest.mark.asyncio
 async def test_tool_input_schemas():
     """Test that all tools have valid input schemas"""
     tools = [
         CreateAgentWalletTool(),
+        CreateAgentWalletsBatchTool(),
         PayRecipientTool(),
+        PayRecipientsBatchTool(),
         SimulatePaymentTool(),
         CreatePaymentIntentTool(),
         ConfirmPaymentIntentTool(),
         CheckBalanceTool(),
+        GetServerMetricsTool(),
         RemoveRecipientGuardTool(),
-        AddRecipientToWhitelistTool()
+        AddRecipientToWhitelistTool(),
+        ReconcileWalletGuardsTool(),
+        ReloadGuardPolicyTool(),
+        ListPaymentIntentsTool(),
+        ConfirmPaymentIntentsTool(),
+        SimulatePaymentsTool()
     ]
     
     for tool in tools:
@@ -265,13 +466,21 @@ async def test_tool_descriptions():
     """Test that all tools have descriptions"""
     tools = [
         CreateAgentWalletTool(),
+        CreateAgentWalletsBatchTool(),
         PayRecipientTool(),
+        PayRecipientsBatchTool(),
         SimulatePaymentTool(),
         CreatePaymentIntentTool(),
         ConfirmPaymentIntentTool(),
         CheckBalanceTool(),
+        GetServerMetricsTool(),
         RemoveRecipientGuardTool(),
-        AddRecipientToWhitelistTool()
+        AddRecipientToWhitelistTool(),
+        ReconcileWalletGuardsTool(),
+        ReloadGuardPolicyTool(),
+        ListPaymentIntentsTool(),
+        ConfirmPaymentIntentsTool(),
+        SimulatePaymentsTool()
     ]
     
     for tool in tools:
@@ -0,0 +1,55 @@
+import pytest
+from unittest.mock import MagicMock, patch
+from app.payments.guards import BudgetGuard, GuardEngine
+from app.webhooks.circle import extract_amount, extract_wallet_id, handle_payment_sent, handle_transaction_failed
+
+
+def test_extract_wallet_id():
+    """Test wallet ID extraction from webhook payloads"""
+    assert extract_wallet_id({"data": {"wallet_id": "wallet-1"}}) == "wallet-1"
+    assert extract_wallet_id({"data": {"walletId": "wallet-2"}}) == "wallet-2"
+    assert extract_wallet_id({"wallet_id": "wallet-3"}) == "wallet-3"
+    assert extract_wallet_id({"type": "payment.sent"}) is None
+
+
+@pytest.mark.asyncio
+async def test_payment_sent_invalidates_balance():
+    """Test that payment.sent drops the cached wallet balance"""
+    mock_client = MagicMock()
+    with patch('app.webhooks.circle.OmniAgentPaymentClient.get_instance', return_value=mock_client):
+        await handle_payment_sent({"type": "payment.sent", "data": {"wallet_id": "wallet-1"}})
+
+    mock_client.invalidate_balance.assert_called_once_with("wallet-1")
+
+
+def test_extract_amount():
+    """Test amount extraction from webhook payloads"""
+    assert extract_amount({"data": {"amount": "12.5"}}) == 12_500_000
+    assert extract_amount({"data": {"amounts": ["3"]}}) == 3_000_000
+    assert extract_amount({"data": {"amount": {"amount": "4", "currency": "USD"}}}) == 4_000_000
+    assert extract_amount({"data": {"amount": "abc"}}) is None
+    assert extract_amount({"data": {}}) is None
+
+
+@pytest.mark.asyncio
+async def test_payment_sent_records_spend_once():
+    """Test that payment.sent feeds the budget ledger, deduplicated by transaction"""
+    engine = GuardEngine([BudgetGuard(daily_limit=100, hourly_limit=100)])
+    payload = {"type": "payment.sent", "data": {"id": "tx-1", "walletId": "wallet-1", "amount": "40"}}
+    with patch('app.webhooks.circle.OmniAgentPaymentClient.get_instance', return_value=MagicMock()), \
+            patch('app.webhooks.circle.get_guard_engine', return_value=engine):
+        await handle_payment_sent(payload)
+        await handle_payment_sent(payload)
+
+    assert engine.guards[0].ledger.hourly("wallet-1") == 40_000_000
+    assert engine.stats()["duplicates"] == 1
+
+
+@pytest.mark.asyncio
+async def test_transaction_failed_settles_intent():
+    """Test that webhook outcomes are applied to the intent through its transaction"""
+    mock_client = MagicMock()
+    with patch('app.webhooks.circle.OmniAgentPaymentClient.get_instance', return_value=mock_client):
+        await handle_transaction_failed({"type": "transaction.failed", "data": {"id": "tx-1", "walletId": "wallet-1"}})
+
+    mock_client.settle_intent.assert_called_once_with("failed", intent_id=None, transaction_id="tx-1")
@@ -0,0 +1,86 @@
+import pytest
+from app.payments.guards import RecipientWhitelistGuard
+from app.payments.whitelist import WhitelistIndex, parse_entry
+from app.utils.exceptions import UnauthorizedRecipientError
+
+CHECKSUMMED = "0x52908400098527886E0F7030069857D2E4169EE7"
+
+
+def test_index_membership_is_case_insensitive():
+    """Test checksummed and lowercase spellings of an EVM address match"""
+    index = WhitelistIndex([CHECKSUMMED])
+    assert CHECKSUMMED.lower() in index
+    assert index.contains(f"  {CHECKSUMMED}  ")
+    assert not index.contains("0x0000000000000000000000000000000000000000")
+    assert not index.contains(None)
+
+
+def test_index_chain_scoping():
+    """Test chain-scoped entries only match their chain"""
+    index = WhitelistIndex([f"ARC-TESTNET:{CHECKSUMMED}", "0xabc"])
+    assert index.contains(CHECKSUMMED, chain="arc-testnet")
+    assert not index.contains(CHECKSUMMED, chain="ETH")
+    assert index.contains(CHECKSUMMED)
+    assert index.contains("0xABC", chain="ETH")
+
+
+def test_index_incremental_add_remove():
+    """Test entries can be added and revoked one at a time"""
+    index = WhitelistIndex()
+    assert index.add("0xabc", chain="ETH") is True
+    assert index.add("0xABC", chain="eth") is False
+    index.add("0xabc", chain="ARC-TESTNET")
+
+    assert index.remove("0xabc", chain="ETH") is True
+    assert not index.contains("0xabc", chain="ETH")
+    assert index.contains("0xabc", chain="ARC-TESTNET")
+    assert index.remove("0xabc") is True
+    assert len(index) == 0
+    assert index.remove("0xabc") is False
+
+
+def test_index_interns_chain_scopes():
+    """Test entries sharing a chain scope share one set"""
+    index = WhitelistIndex(f"0x{i:040x}" for i in range(100))
+    assert index.stats() == {"size": 100, "scopes": 1}
+
+
+def test_parse_entry_skips_comments():
+    """Test file lines support blanks and comments"""
+    assert parse_entry("# approved vendors") is None
+    assert parse_entry("   ") is None
+    assert parse_entry("eth:0xABC  # vendor") == ("ETH", "0xabc")
+
+
+def test_load_file(tmp_path):
+    """Test loading a whitelist file"""
+    path = tmp_path / "whitelist.txt"
+    path.write_text(f"# vendors\n{CHECKSUMMED}\nETH:0xdef\n0xdef\n")
+
+    index = WhitelistIndex()
+    assert index.load_file(str(path)) == 3
+    assert len(index) == 2
+
+
+@pytest.mark.asyncio
+async def test_guard_loads_file_and_normalizes(tmp_path):
+    """Test the recipient guard combines configured and file addresses"""
+    path = tmp_path / "whitelist.txt"
+    path.write_text(f"{CHECKSUMMED}\n")
+    guard = RecipientWhitelistGuard(["0xABC"], whitelist_file=str(path))
+
+    await guard.validate(1, "wallet-1", CHECKSUMMED.lower())
+    await guard.validate(1, "wallet-1", "0xabc")
+    with pytest.raises(UnauthorizedRecipientError):
+        await guard.validate(1, "wallet-1", "0xdef")
+    assert sorted(guard.to_dict()["addresses"]) == sorted(["0xabc", CHECKSUMMED.lower()])
+
+
+def test_guard_rejects_chain_scoped_entries(tmp_path):
+    """Test CHAIN:address entries fail loading instead of approving the address on every chain"""
+    path = tmp_path / "whitelist.txt"
+    path.write_text("0xabc\nETH:0xdef\n")
+    with pytest.raises(ValueError, match="Chain-scoped"):
+        RecipientWhitelistGuard([], whitelist_file=str(path))
+    with pytest.raises(ValueError, match="Chain-scoped"):
+        RecipientWhitelistGuard(["ETH:0xdef"], whitelist_file="")